@@ -0,0 +1,90 @@
+"""
+Handler latency and event loop lag under concurrent synthetic load.
+
+Every synthetic update reads the balance and level, pays and refunds one coin. `sync` runs the same statements
+through blocking sessions inside the coroutines like the handlers used to, `async` awaits the aiosqlite-backed CRUD.
+A heartbeat task sleeps 1 ms in a loop and records how late it wakes up.
+
+Run from the repository root: python -m benchmarks.bench_async_db
+"""
+import asyncio
+import statistics
+import time
+
+from benchmarks.common import temp_database, remove_database
+from db import ledger
+from db.async_crud import AsyncUserCRUD, AsyncUserLevelCRUD
+from db.crud_common import ledger_rows
+from db.database import Session
+from db.hot_queries import USER_BALANCE, LEVEL_BY_USER, DEBIT_COINS, APPEND_COINS
+
+USERS = 100
+UPDATES = 500
+CONCURRENCY = 50
+
+
+async def sync_update(user_id: int):
+    with Session() as session:
+        session.execute(USER_BALANCE, {'user_id': user_id}).one()
+    with Session() as session:
+        session.scalar(LEVEL_BY_USER, {'user_id': user_id})
+    with Session() as session, session.begin():
+        session.execute(DEBIT_COINS, {'user_id': user_id, 'n': 1, 'reason': ledger.BET, 'now': int(time.time())})
+    with Session() as session, session.begin():
+        session.execute(APPEND_COINS, ledger_rows([(user_id, 1, ledger.BET_PAYOUT)]))
+
+
+async def async_update(user_id: int):
+    await AsyncUserCRUD.get_user_balance(user_id)
+    await AsyncUserLevelCRUD.get_level(user_id)
+    await AsyncUserCRUD.debit_coins(user_id, 1, ledger.BET)
+    await AsyncUserCRUD.add_coins(user_id, 1, ledger.BET_PAYOUT)
+
+
+async def heartbeat(lags: list, done: asyncio.Event):
+    while not done.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start - 0.001)
+
+
+async def run_load(update):
+    latencies, lags = [], []
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    done = asyncio.Event()
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await update(i % USERS + 1)
+            latencies.append(time.perf_counter() - start)
+
+    beat = asyncio.create_task(heartbeat(lags, done))
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(UPDATES)))
+    total = time.perf_counter() - start
+    done.set()
+    await beat
+    return total, latencies, lags
+
+
+def report(name: str, total: float, latencies: list, lags: list):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:5} {UPDATES / total:8.0f} updates/s  latency p50 {statistics.median(latencies) * 1000:7.2f} ms  "
+          f"p95 {p95 * 1000:7.2f} ms  loop lag max {max(lags, default=0) * 1000:7.2f} ms  "
+          f"heartbeats {len(lags)}")
+
+
+def main():
+    print(f"updates: {UPDATES}, concurrency: {CONCURRENCY}, users: {USERS}")
+    for name, update in (("sync", sync_update), ("async", async_update)):
+        path = temp_database(USERS)
+        try:
+            report(name, *asyncio.run(run_load(update)))
+        finally:
+            remove_database(path)
+
+
+if __name__ == '__main__':
+    main()
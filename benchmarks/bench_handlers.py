@@ -0,0 +1,72 @@
+"""
+Handler throughput on the SQLAlchemy and the in-memory backend.
+
+Synthetic updates go straight to the handlers: every user sends text messages and asks for /balance and /level.
+Rewards are flushed once at the end. Each update runs in its own unit of work like it does in the application.
+
+Run from the repository root: python -m benchmarks.bench_handlers
+"""
+import time
+from types import SimpleNamespace
+
+import methods
+from benchmarks.common import temp_database, remove_database
+from config import logger
+from db.cooldowns import CooldownEngine
+from db.members import members
+from db.memory import MemoryStore
+from db.repository import repo
+from db.unit_of_work import unit_of_work
+from main import TelegramBot
+
+USERS = 100
+UPDATES = 3000
+CHAT_ID = -100
+
+
+class Message:
+    def __init__(self, user_id: int):
+        self.from_user = SimpleNamespace(id=user_id, username=f"user{user_id}", first_name=f"User {user_id}",
+                                         last_name=None)
+        self.chat_id = CHAT_ID
+
+    async def reply_text(self, text=None, **kwargs):
+        return self
+
+
+def update(user_id: int):
+    return SimpleNamespace(message=Message(user_id), callback_query=None,
+                           effective_chat=SimpleNamespace(type="supergroup", id=CHAT_ID))
+
+
+async def run(bot: TelegramBot) -> float:
+    context = SimpleNamespace(args=[], user_data={}, job_queue=SimpleNamespace(run_once=lambda *args, **kwargs: None))
+    handlers = [bot.text_handler, bot.text_handler, bot.balance_handler, bot.level_handler]
+    start = time.perf_counter()
+    for i in range(UPDATES):
+        async with unit_of_work():
+            await handlers[i % len(handlers)](update(i % USERS + 1), context)
+    await bot.rewards.flush()
+    return time.perf_counter() - start
+
+
+def main():
+    logger.remove()
+    bot = TelegramBot("123:abc", CHAT_ID)
+    path = temp_database(0)
+    try:
+        for backend in ("sqlalchemy", "memory"):
+            if backend == "memory":
+                repo.use_memory(MemoryStore())
+            else:
+                repo.use_sqlalchemy()
+            members.load([])
+            methods.cooldowns = CooldownEngine()
+            elapsed = bot.loop.run_until_complete(run(bot))
+            print(f"{backend:>10}: {UPDATES / elapsed:8.0f} updates/s")
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
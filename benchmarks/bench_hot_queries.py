@@ -0,0 +1,59 @@
+"""
+Per-call overhead of the hot lookups: `session.query(...).filter_by(...)` rebuilt on every call versus the
+prebuilt statements of db/hot_queries.py. All calls share one session so only statement construction,
+compilation cache lookup and execution are measured.
+
+Run from the repository root: python -m benchmarks.bench_hot_queries
+"""
+import time
+
+from benchmarks.common import temp_database, remove_database
+from db.database import Session
+from db.hot_queries import USER_BY_ID, USER_BALANCE, LEVEL_BY_USER, LAST_ACTION, ACTION_COOLDOWN
+from db.models import User, UserLevel, UserAction, ActionCooldown
+
+USERS = 100
+CALLS = 5000
+
+LOOKUPS = {
+    "user": (
+        lambda session, user_id: session.query(User).filter_by(user_id=user_id).first(),
+        lambda session, user_id: session.scalar(USER_BY_ID, {'user_id': user_id})),
+    "balance": (
+        lambda session, user_id: session.query(User.user_coins, User.coins_per_min_bonus, User.income_settled_at)
+        .filter_by(user_id=user_id).one(),
+        lambda session, user_id: session.execute(USER_BALANCE, {'user_id': user_id}).one()),
+    "level": (
+        lambda session, user_id: session.query(UserLevel).filter_by(user_id=user_id).first(),
+        lambda session, user_id: session.scalar(LEVEL_BY_USER, {'user_id': user_id})),
+    "last action": (
+        lambda session, user_id: session.query(UserAction.last_time).filter_by(user=user_id, action=1).scalar(),
+        lambda session, user_id: session.scalar(LAST_ACTION, {'user_id': user_id, 'action_id': 1})),
+    "cooldown": (
+        lambda session, user_id: session.query(ActionCooldown).filter_by(id=1).first().cooldown,
+        lambda session, user_id: session.scalar(ACTION_COOLDOWN, {'action_id': 1})),
+}
+
+
+def per_call(session, lookup) -> float:
+    for i in range(USERS):
+        lookup(session, i + 1)
+    start = time.perf_counter()
+    for i in range(CALLS):
+        lookup(session, i % USERS + 1)
+    return (time.perf_counter() - start) / CALLS * 1e6
+
+
+def main():
+    path = temp_database(USERS)
+    try:
+        with Session() as session:
+            for name, (legacy, prebuilt) in LOOKUPS.items():
+                before, after = per_call(session, legacy), per_call(session, prebuilt)
+                print(f"{name:>12}: {before:6.0f} -> {after:6.0f} us/call ({before / after:.1f}x)")
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+/rating and /rank lookups: the SQL leaderboard query against the in-memory order-statistic boards.
+
+The boards are rebuilt from the seeded database first, then every round asks for the top 20 and one user's rank.
+The SQL rank is a COUNT of the users with more XP.
+
+Run from the repository root: python -m benchmarks.bench_leaderboards
+"""
+import asyncio
+import random
+import time
+
+from sqlalchemy import select, func
+
+from benchmarks.common import temp_database, remove_database
+from db.async_crud import AsyncUserLevelCRUD
+from db.database import Session
+from db.leaderboards import leaderboards
+from db.models import User, UserLevel
+
+USERS = 10000
+ROUNDS = 500
+
+
+def sql_top() -> list:
+    with Session() as session:
+        return session.query(UserLevel.user_id, User.user_nickname, UserLevel.level, UserLevel.xp).join(
+            User, User.user_id == UserLevel.user_id).order_by(UserLevel.total_xp.desc()).limit(20).all()
+
+
+def sql_rank(user_id: int) -> int:
+    with Session() as session:
+        total_xp = session.scalar(select(UserLevel.total_xp).where(UserLevel.user_id == user_id))
+        return session.scalar(select(func.count()).where(UserLevel.total_xp > total_xp)) + 1
+
+
+def main():
+    path = temp_database(USERS)
+    try:
+        asyncio.run(AsyncUserLevelCRUD.grant_xp({user_id: random.randrange(100000)
+                                                 for user_id in range(1, USERS + 1)}))
+
+        start = time.perf_counter()
+        asyncio.run(leaderboards.rebuild())
+        print(f"rebuild: {(time.perf_counter() - start) * 1000:.0f} ms for {USERS} users")
+
+        user_ids = [random.randrange(1, USERS + 1) for _ in range(ROUNDS)]
+        start = time.perf_counter()
+        for user_id in user_ids:
+            sql_top()
+            sql_rank(user_id)
+        sql = (time.perf_counter() - start) / ROUNDS * 1e6
+
+        start = time.perf_counter()
+        for user_id in user_ids:
+            board = leaderboards.board('level')
+            board.page(20)
+            board.rank(user_id)
+        memory = (time.perf_counter() - start) / ROUNDS * 1e6
+        print(f"top 20 + rank: sql {sql:8.0f} us, boards {memory:6.0f} us ({sql / memory:.0f}x)")
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
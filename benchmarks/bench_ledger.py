@@ -0,0 +1,50 @@
+"""
+Coin ledger: appending a coin change, reading a balance with a growing number of entries pending since the last
+snapshot, and compacting them into the snapshot.
+
+Run from the repository root: python -m benchmarks.bench_ledger
+"""
+import asyncio
+import time
+
+from benchmarks.common import temp_database, remove_database
+from config import logger
+from db import ledger
+from db.repository import repo
+
+USERS = 100
+ROUNDS = 2000
+
+
+async def per_call(call) -> float:
+    start = time.perf_counter()
+    for i in range(ROUNDS):
+        await call(i % USERS + 1)
+    return (time.perf_counter() - start) / ROUNDS * 1e6
+
+
+async def run():
+    append = await per_call(lambda user_id: repo.users.add_coins(user_id, 1, ledger.MESSAGE))
+    print(f"      append: {append:6.0f} us/change")
+
+    pending = await per_call(repo.users.get_user_balance)
+    start = time.perf_counter()
+    compacted = await repo.users.compact_ledger()
+    compact = (time.perf_counter() - start) * 1e3
+    snapshot = await per_call(repo.users.get_user_balance)
+    print(f"     balance: {pending:6.0f} us with {ROUNDS // USERS} pending entries, "
+          f"{snapshot:6.0f} us after compaction")
+    print(f"  compaction: {compact:6.1f} ms for {ROUNDS} entries of {compacted} users")
+
+
+def main():
+    logger.remove()
+    path = temp_database(USERS)
+    try:
+        asyncio.run(run())
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Leaderboard and profile reads as ORM entities versus column rows turned into records.
+
+`orm` loads UserLevel entities with their joined User like the read paths used to, `records` selects only the
+needed columns into the __slots__ records of db/records.py. Memory is the peak traced while one result is built.
+
+Run from the repository root: python -m benchmarks.bench_read_models
+"""
+import time
+import tracemalloc
+
+from sqlalchemy.orm import joinedload
+
+from benchmarks.common import temp_database, remove_database
+from db.database import Session
+from db.hot_queries import USER_PROFILE
+from db.models import User, UserLevel
+from db.records import LeaderboardEntry, UserProfile
+
+USERS = 1000
+ROUNDS = 300
+
+
+def orm_leaderboard():
+    with Session() as session:
+        return session.query(UserLevel).options(joinedload(UserLevel.user)).order_by(
+            UserLevel.level.desc(), UserLevel.xp.desc()).limit(20).all()
+
+
+def orm_profile(user_id: int):
+    with Session() as session:
+        return session.query(User).filter_by(user_id=user_id).first()
+
+
+def records_leaderboard():
+    with Session() as session:
+        rows = session.query(UserLevel.user_id, User.user_nickname, UserLevel.level, UserLevel.xp).join(
+            User, User.user_id == UserLevel.user_id).order_by(UserLevel.total_xp.desc()).limit(20)
+        return [LeaderboardEntry(*row) for row in rows]
+
+
+def records_profile(user_id: int):
+    with Session() as session:
+        row = session.execute(USER_PROFILE, {'user_id': user_id}).first()
+        return UserProfile(*row) if row else None
+
+
+def measure(name: str, func, *args):
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{name:>20}: {elapsed / ROUNDS * 1e6:8.0f} us/call {peak / 1024:8.1f} KiB peak")
+
+
+def main():
+    path = temp_database(USERS)
+    try:
+        measure("orm leaderboard", orm_leaderboard)
+        measure("records leaderboard", records_leaderboard)
+        measure("orm profile", orm_profile, USERS // 2)
+        measure("records profile", records_profile, USERS // 2)
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
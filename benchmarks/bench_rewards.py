@@ -0,0 +1,68 @@
+"""
+Messages/sec of the per-message reward path.
+
+before: cooldown check and action time update in the database, then the rewards of every message applied on their
+        own with the same `apply_message_rewards` the pipeline flushes with
+after:  in-memory cooldown check, RewardPipeline.put per message and one batched flush every `flush_size` events
+
+Run from the repository root: python -m benchmarks.bench_rewards
+"""
+import asyncio
+import time
+
+from benchmarks.common import temp_database, remove_database, timed
+from db.cooldowns import CooldownEngine
+from db.async_crud import AsyncUserCRUD, AsyncUserActionCRUD
+from db.database import Session
+from db.hot_queries import ACTION_COOLDOWN
+from db.rewards import RewardPipeline
+
+USERS = 100
+MESSAGES = 2000
+
+
+async def unbatched_path(messages: int):
+    with Session() as session:
+        cooldown = session.scalar(ACTION_COOLDOWN, {'action_id': 1})
+    for i in range(messages):
+        user_id = i % USERS + 1
+        last_action_time = await AsyncUserActionCRUD.get_last_action(user_id, 1)
+        if not last_action_time or last_action_time + cooldown - time.time() < 0:
+            await AsyncUserActionCRUD.update_action_time(user_id=user_id, action_id=1)
+            await AsyncUserCRUD.apply_message_rewards([(user_id, time.time())])
+
+
+async def pipeline_path(messages: int, flush_size: int = 100):
+    pipeline = RewardPipeline(flush_size=flush_size)
+    engine = CooldownEngine(cooldowns={1: 0})
+    for i in range(messages):
+        user_id = i % USERS + 1
+        if await engine.check(user_id, 1) is True:
+            engine.touch(user_id, 1)
+            pipeline.put(user_id)
+        if pipeline.pending() >= flush_size:
+            await pipeline.flush()
+    await pipeline.flush()
+    await engine.flush()
+
+
+def main():
+    path = temp_database(USERS)
+    try:
+        before = timed(asyncio.run, unbatched_path(MESSAGES))
+    finally:
+        remove_database(path)
+
+    path = temp_database(USERS)
+    try:
+        after = timed(asyncio.run, pipeline_path(MESSAGES))
+    finally:
+        remove_database(path)
+
+    print(f"messages: {MESSAGES}, users: {USERS}")
+    print(f"before: {MESSAGES / before:10.0f} msg/s")
+    print(f"after:  {MESSAGES / after:10.0f} msg/s  ({before / after:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+File size and point lookups of the association tables in the v1 and v2 layouts.
+
+v1 is the layout before migration 4: surrogate ids, unique indexes on the natural keys and
+user_action.last_time as a datetime string. v2 is the same data after running migration 4 as the converter.
+A lookup reads one row by its natural key, as the cooldown, booster and participation checks do.
+
+Run from the repository root: python -m benchmarks.bench_schema
+"""
+import datetime
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+
+from benchmarks.common import remove_database
+from db.migrations import v004_compact_key_tables
+
+USERS = 5000
+ACTIONS = 8
+BOOSTERS = 4
+GIVEAWAYS = 10
+PARTICIPANTS = 2000
+LOOKUPS = 20000
+
+V1_SCHEMA = [
+    'CREATE TABLE user_action (id INTEGER PRIMARY KEY, action INTEGER, "user" INTEGER, '
+    'last_time DATETIME NOT NULL, UNIQUE (action, "user"))',
+    'CREATE INDEX ix_user_action_user ON user_action ("user")',
+    'CREATE TABLE users_boosters (id INTEGER PRIMARY KEY, user_id INTEGER, booster_id INTEGER, amount INTEGER)',
+    'CREATE UNIQUE INDEX ix_users_boosters_user_booster ON users_boosters (user_id, booster_id)',
+    'CREATE TABLE giveaway_participants (id INTEGER PRIMARY KEY, user_id INTEGER, giveaway_id INTEGER)',
+    'CREATE UNIQUE INDEX ix_giveaway_participants_giveaway_user ON giveaway_participants (giveaway_id, user_id)',
+]
+
+LOOKUP_SQL = {
+    "cooldown": 'SELECT last_time FROM user_action WHERE "user" = :user AND action = :action',
+    "booster": "SELECT amount FROM users_boosters WHERE user_id = :user AND booster_id = :booster",
+    "participant": "SELECT 1 FROM giveaway_participants WHERE giveaway_id = :giveaway AND user_id = :user",
+}
+
+
+def create_v1(path: str):
+    engine = create_engine(f"sqlite:///{path}")
+    now = datetime.datetime.now()
+    with engine.begin() as connection:
+        for statement in V1_SCHEMA:
+            connection.execute(text(statement))
+        connection.execute(text('INSERT INTO user_action (action, "user", last_time) VALUES (:action, :user, :time)'),
+                           [{"action": a, "user": u, "time": str(now - datetime.timedelta(seconds=u))}
+                            for u in range(1, USERS + 1) for a in range(1, ACTIONS + 1)])
+        connection.execute(text("INSERT INTO users_boosters (user_id, booster_id, amount) VALUES (:user, :booster, 1)"),
+                           [{"user": u, "booster": b} for u in range(1, USERS + 1) for b in range(1, BOOSTERS + 1)])
+        connection.execute(text("INSERT INTO giveaway_participants (user_id, giveaway_id) VALUES (:user, :giveaway)"),
+                           [{"user": u, "giveaway": g} for g in range(1, GIVEAWAYS + 1)
+                            for u in random.sample(range(1, USERS + 1), PARTICIPANTS)])
+    engine.dispose()
+
+
+def convert_to_v2(path: str):
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as connection:
+        v004_compact_key_tables.upgrade(connection)
+    engine.dispose()
+
+
+def vacuum_size(path: str) -> int:
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.connect() as connection:
+        connection.execute(text("VACUUM"))
+    engine.dispose()
+    return os.path.getsize(path)
+
+
+def lookups(path: str, name: str, parse_datetime: bool) -> float:
+    engine = create_engine(f"sqlite:///{path}")
+    params = [{"user": random.randint(1, USERS), "action": random.randint(1, ACTIONS),
+               "booster": random.randint(1, BOOSTERS), "giveaway": random.randint(1, GIVEAWAYS)}
+              for _ in range(LOOKUPS)]
+    statement = text(LOOKUP_SQL[name])
+    with engine.connect() as connection:
+        start = time.perf_counter()
+        for param in params:
+            value = connection.execute(statement, param).scalar()
+            if parse_datetime:
+                datetime.datetime.fromisoformat(value).timestamp()
+        elapsed = time.perf_counter() - start
+    engine.dispose()
+    return LOOKUPS / elapsed
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    v1, v2 = os.path.join(directory, "v1.db"), os.path.join(directory, "v2.db")
+    try:
+        create_v1(v1)
+        shutil.copy(v1, v2)
+        convert_to_v2(v2)
+        print(f"file size: v1 {vacuum_size(v1) / 1024:8.0f} KiB, v2 {vacuum_size(v2) / 1024:8.0f} KiB")
+        for name in LOOKUP_SQL:
+            old = lookups(v1, name, parse_datetime=name == "cooldown")
+            new = lookups(v2, name, parse_datetime=False)
+            print(f"{name:>11}: v1 {old:8.0f} lookups/s, v2 {new:8.0f} lookups/s")
+    finally:
+        remove_database(v1)
+        remove_database(v2)
+        os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    main()
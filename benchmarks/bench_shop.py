@@ -0,0 +1,69 @@
+"""
+/shop rendering: the per-item lookups (balance, nickname and one booster count per item) against the single
+SHOP_VIEW query, and against the per-user render cache.
+
+Run from the repository root: python -m benchmarks.bench_shop
+"""
+import asyncio
+import time
+
+from benchmarks.common import temp_database, remove_database
+from db.database import Session
+from db.models import Booster, UserBooster
+from db.records import ShopView
+from db.repository import repo
+from db.shop_views import shop_views
+from main import TelegramBot
+from modules.shop import SHOP_ITEMS, load_shop_items
+
+USERS = 100
+ROUNDS = 2000
+BOOSTERS = [Booster(id=i, booster_name=f"Booster {i}", booster_type=i % 2 + 1, bonus_amount=1, base_price=100)
+            for i in range(1, 7)]
+
+
+async def per_item_lookups(user_id: int):
+    balance = await repo.users.get_user_balance(user_id)
+    nickname = (await repo.users.get_user_by_id(user_id)).user_nickname
+    boosters = {item.booster_id: await repo.boosters.get_booster_count(user_id, item.booster_id)
+                for item in SHOP_ITEMS.values()}
+    return TelegramBot.render_shop(ShopView(user_id, nickname, balance, 0, 0, boosters), balance)
+
+
+async def single_query(user_id: int):
+    view = await repo.boosters.get_shop_view(user_id)
+    return TelegramBot.render_shop(view, view.balance())
+
+
+async def cached(user_id: int):
+    return await shop_views.get(user_id, TelegramBot.render_shop)
+
+
+async def per_call(render) -> float:
+    for user_id in range(1, USERS + 1):
+        await render(user_id)
+    start = time.perf_counter()
+    for i in range(ROUNDS):
+        await render(i % USERS + 1)
+    return (time.perf_counter() - start) / ROUNDS * 1e6
+
+
+def main():
+    path = temp_database(USERS)
+    try:
+        load_shop_items(BOOSTERS)
+        with Session() as session, session.begin():
+            session.add_all(BOOSTERS)
+            session.add_all(UserBooster(user_id=user_id, booster_id=booster.id, amount=user_id % 5)
+                            for user_id in range(1, USERS + 1) for booster in BOOSTERS[::2])
+
+        before = asyncio.run(per_call(per_item_lookups))
+        for name, render in (("single query", single_query), ("cached", cached)):
+            after = asyncio.run(per_call(render))
+            print(f"{name:>12}: {before:6.0f} -> {after:6.0f} us/render ({before / after:.1f}x)")
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
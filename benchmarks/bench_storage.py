@@ -0,0 +1,72 @@
+"""
+Write throughput per storage profile with the bot's mix of writers.
+
+`THREADS` threads append ledger entries through the sync engine while the event loop writes and reads through
+the async CRUD like the handlers do. Every write is one small committed transaction.
+Failed writes are the ones that ended in "database is locked".
+
+Run from the repository root: python -m benchmarks.bench_storage
+"""
+import asyncio
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from benchmarks.common import temp_database, remove_database
+from config import STORAGE_PROFILES, logger
+from db import ledger
+from db.async_crud import AsyncUserCRUD
+from db.crud_common import ledger_rows
+from db.database import Session
+from db.hot_queries import APPEND_COINS
+
+USERS = 100
+THREADS = 4
+WRITES = 200
+
+
+def thread_writer(offset: int, failed: list):
+    for i in range(WRITES):
+        try:
+            with Session() as session, session.begin():
+                session.execute(APPEND_COINS, ledger_rows([((offset + i) % USERS + 1, 1, ledger.BET_PAYOUT)]))
+        except OperationalError:
+            failed.append(1)
+
+
+async def loop_writer(failed: list):
+    for i in range(WRITES):
+        try:
+            await AsyncUserCRUD.add_coins(i % USERS + 1, 1, ledger.BET_PAYOUT)
+            await AsyncUserCRUD.get_user_balance(i % USERS + 1)
+        except OperationalError:
+            failed.append(1)
+
+
+def run() -> tuple:
+    failed = []
+    threads = [threading.Thread(target=thread_writer, args=(n * WRITES, failed)) for n in range(THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    asyncio.run(loop_writer(failed))
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, len(failed)
+
+
+def main():
+    logger.remove()
+    writes = (THREADS + 1) * WRITES
+    for name, pragmas in STORAGE_PROFILES.items():
+        path = temp_database(USERS, pragmas=pragmas)
+        try:
+            elapsed, failed = run()
+        finally:
+            remove_database(path)
+        print(f"{name:>8}: {(writes - failed) / elapsed:8.0f} writes/s, {failed} failed of {writes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Sessions and commits per update with and without a request-scoped unit of work.
+
+Every synthetic update makes the CRUD calls of a booster purchase: the auth checks, the balance, the payment,
+the booster increment and the updated booster amounts. `per-call` opens a session per CRUD call like the
+handlers used to, `unit` wraps the update in `unit_of_work()` like UnitOfWorkApplication does.
+
+Run from the repository root: python -m benchmarks.bench_unit_of_work
+"""
+import asyncio
+import time
+
+from benchmarks.common import temp_database, remove_database
+from db import ledger
+from db.async_crud import AsyncUserCRUD, AsyncUserLevelCRUD, AsyncUsersBoostersCRUD
+from db.crud import BoosterCRUD
+from db.models import Booster
+from db.unit_of_work import unit_of_work, stats
+
+USERS = 100
+UPDATES = 500
+
+
+async def purchase(user_id: int):
+    await AsyncUserCRUD.check_user_exists(user_id)
+    await AsyncUserLevelCRUD.get_level(user_id)
+    await AsyncUserCRUD.get_user_balance(user_id)
+    if await AsyncUserCRUD.debit_coins(user_id, 1, ledger.BET) is not None:
+        await AsyncUsersBoostersCRUD.increment_or_create(user_id, 1)
+    await AsyncUserCRUD.get_boosters_amount(user_id)
+
+
+async def purchase_in_unit(user_id: int):
+    async with unit_of_work():
+        await purchase(user_id)
+
+
+async def seed_coins():
+    async with unit_of_work('seed'):
+        for user_id in range(1, USERS + 1):
+            await AsyncUserCRUD.add_coins(user_id, UPDATES, ledger.BET_PAYOUT)
+
+
+async def run(update) -> float:
+    stats.reset()
+    start = time.perf_counter()
+    for i in range(UPDATES):
+        await update(i % USERS + 1)
+    return time.perf_counter() - start
+
+
+def main():
+    path = temp_database(USERS)
+    try:
+        BoosterCRUD.add_boosters([Booster(id=1, booster_name="bench", booster_type=1, bonus_amount=1, base_price=1)])
+        asyncio.run(seed_coins())
+        for name, update in (("per-call", purchase), ("unit", purchase_in_unit)):
+            elapsed = asyncio.run(run(update))
+            print(f"{name:>8}: {stats.sessions / UPDATES:5.1f} sessions/update, "
+                  f"{stats.commits / UPDATES:5.1f} commits/update, {UPDATES / elapsed:8.0f} updates/s")
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Giveaway winner selection at 100k participants: loading, shuffling and picking from every participant row against
+streaming them through a uniform or a level-weighted reservoir.
+
+Run from the repository root: python -m benchmarks.bench_winners
+"""
+import asyncio
+import datetime
+import random
+import time
+import tracemalloc
+
+from sqlalchemy import insert, select
+
+from benchmarks.common import temp_database, remove_database
+from config import logger
+from db.async_crud import AsyncGiveawayCRUD
+from db.database import Session
+from db.models import User, UserLevel, GiveawayParticipant, GiveawayGift
+from db.unit_of_work import session_scope
+
+PARTICIPANTS = 100_000
+WINNERS = 10
+ROUNDS = 3
+
+
+async def load_and_shuffle(giveaway_id: int) -> list:
+    """The selection before the reservoir: every participant row in memory, winners picked from a shuffle."""
+    async with session_scope() as session:
+        participants = list(await session.scalars(select(GiveawayParticipant).filter_by(giveaway_id=giveaway_id)))
+        gifts = list(await session.scalars(select(GiveawayGift).filter_by(giveaway_id=giveaway_id)))
+    random.shuffle(participants)
+    random.shuffle(gifts)
+    winners, used_gifts = [], set()
+    for participant in participants:
+        gift = random.choice(gifts)
+        if gift.id not in used_gifts:
+            winners.append({"winner": participant.user_id, "gift": {"name": gift.gift_name, "amount": gift.amount}})
+            used_gifts.add(gift.id)
+    return winners
+
+
+async def new_giveaway() -> int:
+    giveaway_id = await AsyncGiveawayCRUD.create_giveaway("COINS", "bench", datetime.datetime.now(),
+                                                          [{"name": "coins", "amount": 100}] * WINNERS)
+    with Session() as session, session.begin():
+        session.execute(insert(GiveawayParticipant), [{"giveaway_id": giveaway_id, "user_id": user_id}
+                                                      for user_id in range(1, PARTICIPANTS + 1)])
+    return giveaway_id
+
+
+async def measure(select_winners) -> tuple:
+    """
+    :return: (ms per draw, peak MiB allocated, winners of the last draw)
+    """
+    elapsed, peak, winners = 0.0, 0, []
+    for _ in range(ROUNDS):
+        giveaway_id = await new_giveaway()
+        tracemalloc.start()
+        start = time.perf_counter()
+        winners = await select_winners(giveaway_id)
+        elapsed += time.perf_counter() - start
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        await AsyncGiveawayCRUD.delete_giveaway(giveaway_id)
+    return elapsed / ROUNDS * 1e3, peak / 2 ** 20, winners
+
+
+async def run():
+    before = await measure(load_and_shuffle)
+    print(f"{'load + shuffle':>15}: {before[0]:7.1f} ms, {before[1]:6.1f} MiB peak, {len(before[2])} winners")
+    for name, weighted in (("reservoir", False), ("weighted", True)):
+        after = await measure(lambda giveaway_id: AsyncGiveawayCRUD.select_giveaway_winners(giveaway_id, weighted))
+        print(f"{name:>15}: {after[0]:7.1f} ms, {after[1]:6.1f} MiB peak, {len(after[2])} winners "
+              f"({before[0] / after[0]:.1f}x)")
+
+
+def main():
+    logger.remove()
+    path = temp_database(0)
+    try:
+        with Session() as session, session.begin():
+            session.execute(insert(User), [{"user_id": user_id, "user_nickname": f"User {user_id}", "user_coins": 0}
+                                           for user_id in range(1, PARTICIPANTS + 1)])
+            session.execute(insert(UserLevel), [{"user_id": user_id, "level": 0, "xp": 0, "xp_needed": 100,
+                                                 "total_xp": user_id % 5000} for user_id in range(1, PARTICIPANTS + 1)])
+        asyncio.run(run())
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
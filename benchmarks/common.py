@@ -0,0 +1,44 @@
+import os
+import tempfile
+import time
+
+from db.database import Session, AsyncSession, create_engines
+from db.models import Base, User, UserLevel, ActionCooldown
+
+
+def temp_database(users: int = 100, msg_cooldown: int = 0, pragmas: dict = None):
+    """
+    Bind the session factories to a fresh SQLite file and seed it with users.
+
+    :param users: number of users to create
+    :param msg_cooldown: cooldown of the message action (id=1)
+    :param pragmas: storage pragmas, the configured profile by default
+    :return: path of the database file
+    """
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine, async_engine = create_engines(path, pragmas)
+    Base.metadata.create_all(engine)
+    Session.configure(bind=engine)
+    AsyncSession.configure(bind=async_engine)
+    with Session() as session:
+        with session.begin():
+            session.add(ActionCooldown(id=1, cooldown=msg_cooldown))
+            for user_id in range(1, users + 1):
+                session.add(User(user_id=user_id, user_name=f"user{user_id}", user_nickname=f"User {user_id}",
+                                 user_coins=0))
+                session.add(UserLevel(user_id=user_id, level=0, xp=0, xp_needed=100))
+    return path
+
+
+def remove_database(path: str) -> None:
+    """Remove a database file created by temp_database together with its WAL files."""
+    for file in (path, f"{path}-wal", f"{path}-shm"):
+        if os.path.exists(file):
+            os.remove(file)
+
+
+def timed(func, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
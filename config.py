@@ -31,12 +31,68 @@ if COOLDOWN:
     IMG_CD = COOLDOWN.get("img", 30)
     ANIME_CD = COOLDOWN.get("anime", 30)
     BJ_CD = COOLDOWN.get("bj", 30)
+    ACTION_COOLDOWNS = {
+        1: MSG_CD,  # msg
+        2: WHO_CD,  # who
+        3: BALL8_CD,  # 8ball
+        4: PICK_CD,  # pick
+        5: RATING_CD,  # rating
+        6: ANIME_CD,  # anime
+        7: BJ_CD,  # bj
+        8: IMG_CD,  # image
+    }
+COOLDOWN_CACHE_SIZE = cfg.get("cooldown_cache_size", 10000)
+COOLDOWN_FLUSH_INTERVAL = cfg.get("cooldown_flush_interval", 30)
+PROFILE_CACHE_SIZE = cfg.get("profile_cache_size", 10000)
+SHOP_CACHE_SIZE = cfg.get("shop_cache_size", 1000)
+LEDGER_COMPACT_INTERVAL = cfg.get("ledger_compact_interval", 300)
+# updates handled at once; debits are atomic, so spends stay safe when raised above 1
+CONCURRENT_UPDATES = cfg.get("concurrent_updates", 1)
+GIVEAWAY_EDIT_INTERVAL = cfg.get("giveaway_edit_interval", 5)
+HTTP_TIMEOUT = cfg.get("http_timeout", 30)
+# validators and bodies of the polled feeds, so an unchanged feed costs a 304 even after a restart
+HTTP_CACHE_DIR = cfg.get("http_cache_dir", os.path.join(current_dir, "cache/http"))
 
 xp_range = list(range(15, 26))
 
+STORAGE_PROFILES = {
+    # SQLite defaults: rollback journal, readers and writers block each other, fsync on every commit
+    "default": {},
+    # WAL lets the loop read while a thread writes, NORMAL only fsyncs on checkpoints
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,  # KiB
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,  # ms
+    },
+    # WAL with an fsync on every commit
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+}
+STORAGE = cfg.get("storage", {})
+STORAGE_BACKEND = STORAGE.get("backend", "sqlalchemy")
+STORAGE_PROFILE = STORAGE.get("profile", "wal")
+STORAGE_PRAGMAS = {**STORAGE_PROFILES[STORAGE_PROFILE], **STORAGE.get("pragmas", {})}
+STORAGE_POOL_SIZE = STORAGE.get("pool_size", 5)
+STORAGE_MAX_OVERFLOW = STORAGE.get("max_overflow", 10)
+STORAGE_POOL_TIMEOUT = STORAGE.get("pool_timeout", 30)
+
+REWARD_FLUSH_INTERVAL_MS = cfg.get("reward_flush_interval_ms", 500)
+REWARD_FLUSH_SIZE = cfg.get("reward_flush_size", 100)
+
 min_bet = cfg.get("min_bet", 1000)
 min_giveaway_coins = cfg.get("min_giveaway_coins", 10000)
 max_giveaway_coins = cfg.get("max_giveaway_coins", 100000)
+# draw giveaway winners with a probability proportional to their level + 1 instead of uniformly
+giveaway_weighted_by_level = cfg.get("giveaway_weighted_by_level", False)
 
 anime_path = os.path.join(current_dir, "static/anime_img")
 img_path = os.path.join(current_dir, "static/img")
@@ -0,0 +1,630 @@
+import datetime
+import time
+from typing import List, Tuple, Dict, Optional
+
+from sqlalchemy import select, func, delete, update, insert
+
+from config import logger
+from db.crud_common import PARTICIPANT_BATCH, message_reward, ledger_rows, level_rows, new_reservoir, draw_chunk, \
+    prize_coins, winner_dicts
+from db.hot_queries import USER_BY_ID, USER_PROFILE, USER_BALANCE, USER_BOOSTERS_AMOUNT, LEVEL_BY_USER, LAST_ACTION, \
+    GRANT_XP, SET_LEVEL, COUNT_MESSAGES, SHOP_VIEW, USER_COINS, APPEND_COINS, \
+    DEBIT_COINS, LATEST_SNAPSHOT, ADD_PARTICIPANT, COUNT_PARTICIPANT
+from db.leaderboards import leaderboards, balance_of, epoch_day
+from db.ledger import MESSAGE, INCOME, SHOP, GIVEAWAY
+from db.members import members
+from db.models import User, Booster, UserAction, UserLevel, UserBooster, Giveaway, GiveawayParticipant, GiveawayGift, \
+    UserMessageDay, CoinLedgerEntry, CoinSnapshot, accrued_income
+from db.profiles import profiles
+from db.records import UserProfile, LeaderboardEntry, GiveawayRecord, GiveawayResult, ShopView, LedgerEntry
+from db.repository import UserRepository, UserActionRepository, UserLevelRepository, UsersBoostersRepository, \
+    GiveawayRepository
+from db.shop_views import shop_views
+from db.unit_of_work import session_scope, after_commit
+from modules.level_curve import level_for, total_xp_for
+from modules.winners import pair_gifts
+
+
+async def grant_levels(session, grants: Dict[int, int]) -> Dict[int, int]:
+    """
+    Increment the total XP of every user in `grants` in SQL and store the levels derived from the new totals.
+
+    :return: user_id -> total_xp
+    """
+    totals = {}
+    for user_id, amount in grants.items():
+        _, totals[user_id] = (await session.execute(GRANT_XP, {'b_user_id': user_id, 'b_amount': amount})).one()
+    if totals:
+        await session.execute(SET_LEVEL, level_rows(totals))
+    return totals
+
+
+async def append_coins(session, entries: List[Tuple[int, int, int]], now: int = None) -> None:
+    """
+    Append (user_id, amount, reason) entries to the coin ledger, skipping zero amounts.
+    """
+    rows = ledger_rows(entries, now)
+    if rows:
+        await session.execute(APPEND_COINS, rows)
+
+
+async def draw_winners(session, giveaway_id: int, weighted: bool = False) -> List[Tuple[int, GiveawayGift]]:
+    """
+    Pair every gift of a giveaway with a distinct winner, streaming the participants through a reservoir
+    (see modules/winners.py).
+    """
+    gifts = list(await session.scalars(select(GiveawayGift).filter_by(giveaway_id=giveaway_id)))
+    reservoir = new_reservoir(len(gifts), weighted)
+    query = select(GiveawayParticipant.user_id)
+    if weighted:
+        query = select(GiveawayParticipant.user_id, UserLevel.total_xp).outerjoin(
+            UserLevel, UserLevel.user_id == GiveawayParticipant.user_id)
+    result = await session.stream(query.where(GiveawayParticipant.giveaway_id == giveaway_id)
+                                  .execution_options(yield_per=PARTICIPANT_BATCH))
+    async for chunk in result.partitions():
+        reservoir.extend(draw_chunk(chunk, weighted))
+    return pair_gifts(reservoir.items, gifts)
+
+
+class AsyncUserCRUD(UserRepository):
+    @staticmethod
+    async def create_user(user_id: int, user_name: str = '', user_nickname: str = '') -> None:
+        async with session_scope() as session:
+            existing_user = await session.scalar(USER_BY_ID, {'user_id': user_id})
+
+            if not existing_user:
+                user = User(user_id=user_id, user_name=user_name, user_nickname=user_nickname, user_coins=0,
+                            coins_per_min_bonus=0, income_settled_at=int(time.time()))
+                session.add(user)
+                logger.debug(f"User with ID {user_id} created.")
+                balance = balance_of(user)
+                profile = UserProfile(user_id, user_name, user_nickname)
+
+                def update_caches():
+                    leaderboards.update_coins([balance])
+                    profiles.remember(profile)
+
+                after_commit(update_caches)
+            else:
+                logger.debug(f"User with ID {user_id} already exists in the database. Skipping creation.")
+        after_commit(lambda: members.add(user_id))
+
+    @staticmethod
+    async def delete_user(user_id):
+        async with session_scope() as session:
+            user = await session.scalar(USER_BY_ID, {'user_id': user_id})
+            if user:
+                await session.delete(user)
+                logger.debug(f"User with ID {user_id} and associated data has been deleted.")
+            else:
+                logger.debug(f"User with ID {user_id} not found.")
+
+        def update_caches():
+            members.remove(user_id)
+            leaderboards.remove(user_id)
+            profiles.invalidate(user_id)
+            shop_views.invalidate(user_id)
+
+        after_commit(update_caches)
+
+    @staticmethod
+    async def get_user_by_id(user_id) -> Optional[UserProfile]:
+        async with session_scope() as session:
+            row = (await session.execute(USER_PROFILE, {'user_id': user_id})).first()
+            return UserProfile(*row) if row else None
+
+    @staticmethod
+    async def get_user_id_by_username(user_name):
+        async with session_scope() as session:
+            return await session.scalar(select(User.user_id).filter_by(user_name=user_name))
+
+    @staticmethod
+    async def check_user_exists(user_id: int) -> bool:
+        user = await AsyncUserCRUD.get_user_by_id(user_id)
+        return user is not None
+
+    @staticmethod
+    async def get_all_user_ids() -> List[int]:
+        async with session_scope() as session:
+            return list(await session.scalars(select(User.user_id)))
+
+    @staticmethod
+    async def get_profiles(user_ids: List[int]) -> List[UserProfile]:
+        async with session_scope() as session:
+            return [UserProfile(*row) for row in await session.execute(
+                select(User.user_id, User.user_name, User.user_nickname).where(User.user_id.in_(user_ids)))]
+
+    @staticmethod
+    async def update_user_names(user_id: int, user_name: Optional[str], user_nickname: str) -> bool:
+        """
+        Store new names of a user unless another user already has them.
+
+        :return: True if the names were updated
+        """
+        async with session_scope() as session:
+            same_names = User.user_nickname == user_nickname
+            if user_name:
+                same_names |= User.user_name == user_name
+            taken = await session.scalar(select(User.user_id).where(User.user_id != user_id, same_names).limit(1))
+            if taken is not None:
+                logger.debug(f"Names of user {user_id} are taken by user {taken}, keeping the stored ones")
+                return False
+            user = await session.scalar(USER_BY_ID, {'user_id': user_id})
+            if user is None:
+                return False
+            user.user_name, user.user_nickname = user_name, user_nickname
+
+        def update_caches():
+            profiles.invalidate(user_id)
+            shop_views.invalidate(user_id)
+
+        after_commit(update_caches)
+        return True
+
+    @staticmethod
+    async def get_balances() -> List[Tuple[int, int, int, int]]:
+        async with session_scope() as session:
+            return [tuple(row) for row in await session.execute(
+                select(User.user_id, USER_COINS, User.coins_per_min_bonus, User.income_settled_at))]
+
+    @staticmethod
+    async def get_message_counts(since_day: int) -> List[Tuple[int, int, int]]:
+        async with session_scope() as session:
+            return [tuple(row) for row in await session.execute(
+                select(UserMessageDay.user_id, UserMessageDay.day, UserMessageDay.messages)
+                .where(UserMessageDay.day >= since_day))]
+
+    @staticmethod
+    async def delete_message_counts_before(day: int) -> None:
+        async with session_scope() as session:
+            await session.execute(delete(UserMessageDay).where(UserMessageDay.day < day))
+
+    @staticmethod
+    async def apply_message_rewards(events: List[Tuple[int, float]]) -> int:
+        """
+        Apply a batch of (user_id, timestamp) rewarded message events in one transaction:
+        coins and XP/level-ups for every user in the batch. The coins of a user are one ledger entry per batch.
+
+        :return: number of rewarded messages
+        """
+        user_ids = {user_id for user_id, _ in events}
+        rewarded = []
+        xp_grants = {}
+        coins = {}
+        day_counts = {}
+        async with session_scope() as session:
+            coins_per_msg = dict((await session.execute(
+                select(User.user_id, User.user_coins_per_msg).where(User.user_id.in_(user_ids)))).all())
+
+            for user_id, timestamp in events:
+                if user_id not in coins_per_msg:
+                    continue
+                xp, earned = message_reward(coins_per_msg[user_id])
+                xp_grants[user_id] = xp_grants.get(user_id, 0) + xp
+                coins[user_id] = coins.get(user_id, 0) + earned
+                key = (user_id, epoch_day(timestamp))
+                day_counts[key] = day_counts.get(key, 0) + 1
+                rewarded.append((user_id, timestamp))
+            totals = await grant_levels(session, xp_grants)
+            await append_coins(session, [(user_id, amount, MESSAGE) for user_id, amount in coins.items()])
+            if day_counts:
+                await session.execute(COUNT_MESSAGES, [{'b_user_id': user_id, 'b_day': day, 'b_messages': messages}
+                                                       for (user_id, day), messages in day_counts.items()])
+
+        def update_caches():
+            leaderboards.update_xp(totals)
+            leaderboards.add_coins(coins)
+            leaderboards.count_messages(rewarded)
+            for user_id in coins:
+                shop_views.invalidate(user_id)
+
+        after_commit(update_caches)
+        logger.debug(f"Rewarded {len(rewarded)}/{len(events)} messages for {len(user_ids)} users")
+        return len(rewarded)
+
+    @staticmethod
+    async def get_user_balance(user_id) -> int:
+        async with session_scope() as session:
+            user_coins, coins_per_min, settled_at = (await session.execute(USER_BALANCE, {'user_id': user_id})).one()
+        return user_coins + accrued_income(coins_per_min, settled_at)
+
+    @staticmethod
+    async def add_coins(user_id: int, amount: int, reason: int):
+        async with session_scope() as session:
+            logger.debug(f"{user_id} +{amount}")
+            await append_coins(session, [(user_id, amount, reason)])
+
+        def update_caches():
+            leaderboards.add_coins({user_id: amount})
+            shop_views.invalidate(user_id)
+
+        after_commit(update_caches)
+
+    @staticmethod
+    async def get_boosters_amount(user_id):
+        async with session_scope() as session:
+            return tuple((await session.execute(USER_BOOSTERS_AMOUNT, {'user_id': user_id})).one())
+
+    @staticmethod
+    async def debit_coins(user_id: int, n: int, reason: int) -> Optional[int]:
+        """
+        Spend `n` coins if the balance covers them, checked and appended in one statement.
+
+        :return: new balance, None if the user doesn't have enough coins or doesn't exist
+        """
+        async with session_scope() as session:
+            balance = (await session.execute(DEBIT_COINS, {'user_id': user_id, 'n': n, 'reason': reason,
+                                                           'now': int(time.time())})).scalar()
+        if balance is None:
+            logger.info(f"User {user_id} does not have enough coins")
+            return None
+        logger.info(f"Subtracted {n} coins from user {user_id}. New balance: {balance}")
+
+        def update_caches():
+            leaderboards.add_coins({user_id: -n})
+            shop_views.invalidate(user_id)
+
+        after_commit(update_caches)
+        return balance
+
+    @staticmethod
+    async def get_coin_history(user_id: int, limit: int = 20, before_id: int = None) -> List[LedgerEntry]:
+        """
+        Coin ledger entries of a user, newest first.
+
+        :param before_id: only entries older than this one, to page back from a previous result
+        """
+        query = select(CoinLedgerEntry.id, CoinLedgerEntry.user_id, CoinLedgerEntry.amount, CoinLedgerEntry.reason,
+                       CoinLedgerEntry.created_at).where(CoinLedgerEntry.user_id == user_id)
+        if before_id is not None:
+            query = query.where(CoinLedgerEntry.id < before_id)
+        async with session_scope() as session:
+            return [LedgerEntry(*row) for row in
+                    await session.execute(query.order_by(CoinLedgerEntry.id.desc()).limit(limit))]
+
+    @staticmethod
+    async def get_coin_ledger(since: int, until: int) -> List[LedgerEntry]:
+        """
+        Coin ledger entries of all users created from `since` until before `until` (epoch seconds), oldest first.
+        """
+        async with session_scope() as session:
+            return [LedgerEntry(*row) for row in await session.execute(
+                select(CoinLedgerEntry.id, CoinLedgerEntry.user_id, CoinLedgerEntry.amount, CoinLedgerEntry.reason,
+                       CoinLedgerEntry.created_at)
+                .where(CoinLedgerEntry.created_at >= since, CoinLedgerEntry.created_at < until)
+                .order_by(CoinLedgerEntry.created_at, CoinLedgerEntry.id))]
+
+    @staticmethod
+    async def compact_ledger() -> int:
+        """
+        Fold the coin ledger entries appended since the last snapshot into users.user_coins and record the new
+        snapshot position.
+
+        :return: number of balances updated
+        """
+        async with session_scope() as session:
+            since = await session.scalar(LATEST_SNAPSHOT) or 0
+            until = await session.scalar(select(func.max(CoinLedgerEntry.id)))
+            if until is None or until <= since:
+                return 0
+            new_entries = (CoinLedgerEntry.id > since, CoinLedgerEntry.id <= until)
+            appended = select(func.sum(CoinLedgerEntry.amount)).where(
+                CoinLedgerEntry.user_id == User.user_id, *new_entries).scalar_subquery()
+            result = await session.execute(
+                update(User).where(User.user_id.in_(select(CoinLedgerEntry.user_id).where(*new_entries)))
+                .values(user_coins=User.user_coins + appended).execution_options(synchronize_session=False))
+            session.add(CoinSnapshot(ledger_id=until, users=result.rowcount, created_at=int(time.time())))
+        logger.debug(f"Compacted coin ledger entries {since + 1}-{until} into {result.rowcount} balances")
+        return result.rowcount
+
+
+class AsyncUserActionCRUD(UserActionRepository):
+    @staticmethod
+    async def update_action_time(user_id: int, action_id: int):
+        await AsyncUserActionCRUD.save_last_actions({(user_id, action_id): time.time()})
+
+    @staticmethod
+    async def get_last_action(user_id: int, action_id: int) -> int:
+        """
+        :return: last use as epoch seconds, 0 if never used
+        """
+        async with session_scope() as session:
+            last_time = await session.scalar(LAST_ACTION, {'user_id': user_id, 'action_id': action_id})
+        return last_time if last_time else 0
+
+    @staticmethod
+    async def save_last_actions(last_actions: Dict[Tuple[int, int], float]):
+        """
+        Persist (user_id, action_id) -> timestamp pairs in one transaction.
+        """
+        async with session_scope() as session:
+            user_ids = {user_id for user_id, _ in last_actions}
+            records = {(a.user, a.action): a for a in
+                       await session.scalars(select(UserAction).where(UserAction.user.in_(user_ids)))}
+            for (user_id, action_id), timestamp in last_actions.items():
+                last_time = int(timestamp)
+                action_record = records.get((user_id, action_id))
+                if not action_record:
+                    session.add(UserAction(user=user_id, action=action_id, last_time=last_time))
+                else:
+                    action_record.last_time = last_time
+
+
+class AsyncUserLevelCRUD(UserLevelRepository):
+    @staticmethod
+    async def create_level(user_id):
+        async with session_scope() as session:
+            session.add(UserLevel(user_id=user_id, level=0, xp=0, xp_needed=100, total_xp=0))
+        after_commit(lambda: leaderboards.update_xp({user_id: 0}))
+
+    @staticmethod
+    async def get_level(user_id):
+        async with session_scope() as session:
+            level = await session.scalar(LEVEL_BY_USER, {'user_id': user_id})
+            if not level:
+                level = UserLevel(user_id=user_id, level=0, xp=0, xp_needed=100)
+                session.add(level)
+            return level
+
+    @staticmethod
+    async def update_level(user_id, new_level, new_xp, new_xp_needed):
+        async with session_scope() as session:
+            logger.debug(f"{user_id} {new_level} {new_xp}")
+            level = await session.scalar(LEVEL_BY_USER, {'user_id': user_id})
+            level.level = new_level
+            level.xp = new_xp
+            level.xp_needed = new_xp_needed
+            level.total_xp = total_xp_for(new_level, new_xp)
+            totals = {user_id: level.total_xp}
+        after_commit(lambda: leaderboards.update_xp(totals))
+
+    @staticmethod
+    async def get_total_xp() -> List[Tuple[int, int]]:
+        async with session_scope() as session:
+            return [tuple(row) for row in await session.execute(select(UserLevel.user_id, UserLevel.total_xp))]
+
+    @staticmethod
+    async def grant_xp(grants: Dict[int, int]) -> Dict[int, Tuple[int, int, int]]:
+        """
+        Add XP to any number of users in one transaction, several level-ups at once included.
+
+        :param grants: user_id -> XP to add, negative to take XP away
+        :return: user_id -> (level, xp, xp_needed) after the grant
+        """
+        async with session_scope() as session:
+            totals = await grant_levels(session, grants)
+        after_commit(lambda: leaderboards.update_xp(totals))
+        return {user_id: level_for(total_xp) for user_id, total_xp in totals.items()}
+
+    @staticmethod
+    async def get_top_users() -> List[LeaderboardEntry]:
+        async with session_scope() as session:
+            rows = await session.execute(
+                select(UserLevel.user_id, User.user_nickname, UserLevel.level, UserLevel.xp)
+                .join(User, User.user_id == UserLevel.user_id)
+                .order_by(UserLevel.total_xp.desc()).limit(20))
+            return [LeaderboardEntry(*row) for row in rows]
+
+
+class AsyncUsersBoostersCRUD(UsersBoostersRepository):
+    @staticmethod
+    async def get_booster_count(user_id, booster_id):
+        async with session_scope() as session:
+            amount = await session.scalar(
+                select(UserBooster.amount).filter_by(user_id=user_id, booster_id=booster_id))
+            return amount if amount else 0
+
+    @staticmethod
+    async def increment_or_create(user_id, booster_id):
+        async with session_scope() as session:
+            booster_record = await session.get(UserBooster, (user_id, booster_id))
+
+            if booster_record:
+                booster_record.amount += 1
+            else:
+                session.add(UserBooster(user_id=user_id, booster_id=booster_id, amount=1))
+
+            booster = await session.get(Booster, booster_id)
+            user = await session.scalar(USER_BY_ID, {'user_id': user_id})
+            coins = (await session.execute(USER_BALANCE, {'user_id': user_id})).one()[0]
+            if booster.booster_type == 1:
+                user.coins_per_msg_bonus += booster.bonus_amount
+            elif booster.booster_type == 2:
+                income = user.settle_income()
+                await append_coins(session, [(user_id, income, INCOME)])
+                coins += income
+                user.coins_per_min_bonus += booster.bonus_amount
+            balance = (user_id, coins, user.coins_per_min_bonus, user.income_settled_at)
+
+        def update_caches():
+            leaderboards.update_coins([balance])
+            shop_views.invalidate(user_id)
+
+        after_commit(update_caches)
+
+    @staticmethod
+    async def buy_boosters(user_id: int, item, quantity: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Debit the coins and add the boosters of one purchase in one transaction.
+
+        :param item: ShopItemBooster being bought
+        :param quantity: boosters to buy, as many as the user can afford if None
+        :return: (boosters bought, coins paid), (0, 0) if the user can't afford them
+        """
+        async with session_scope() as session:
+            user = await session.scalar(USER_BY_ID, {'user_id': user_id})
+            if user is None:
+                logger.error(f"No user found with ID {user_id}")
+                return 0, 0
+            booster_record = await session.get(UserBooster, (user_id, item.booster_id))
+            owned = booster_record.amount if booster_record else 0
+
+            now = int(time.time())
+            if quantity is None:
+                coins = (await session.execute(USER_BALANCE, {'user_id': user_id})).one()[0] + user.accrued_coins(now)
+                quantity = item.max_affordable(owned, coins)
+            if quantity <= 0:
+                return 0, 0
+            price = item.total_price(owned, quantity)
+            coins = (await session.execute(DEBIT_COINS, {'user_id': user_id, 'n': price, 'reason': SHOP,
+                                                         'now': now})).scalar()
+            if coins is None:
+                logger.info(f"User {user_id} can't afford {quantity} x {item.name} for {price}")
+                return 0, 0
+
+            # settle the income accrued so far at the current rate, as the purchase may change it
+            await append_coins(session, [(user_id, user.settle_income(now), INCOME)], now)
+            if booster_record:
+                booster_record.amount += quantity
+            else:
+                session.add(UserBooster(user_id=user_id, booster_id=item.booster_id, amount=quantity))
+            if item.booster_type == 1:
+                user.coins_per_msg_bonus += item.bonus_amount * quantity
+            elif item.booster_type == 2:
+                user.coins_per_min_bonus += item.bonus_amount * quantity
+            logger.info(f"User {user_id} bought {quantity} x {item.name} for {price}")
+            balance = (user_id, coins, user.coins_per_min_bonus, user.income_settled_at)
+
+        def update_caches():
+            leaderboards.update_coins([balance])
+            shop_views.invalidate(user_id)
+
+        after_commit(update_caches)
+        return quantity, price
+
+    @staticmethod
+    async def get_shop_view(user_id: int) -> Optional[ShopView]:
+        """
+        Balance, nickname and booster counts of a user in one query.
+        """
+        async with session_scope() as session:
+            rows = (await session.execute(SHOP_VIEW, {'user_id': user_id})).all()
+        if not rows:
+            return None
+        nickname, coins, coins_per_min, settled_at = rows[0][:4]
+        return ShopView(user_id, nickname, coins, coins_per_min, settled_at,
+                        {booster_id: amount for *_, booster_id, amount in rows if booster_id is not None})
+
+
+class AsyncGiveawayCRUD(GiveawayRepository):
+    @staticmethod
+    async def create_giveaway(giveaway_type: str, description: str, end_datetime: datetime.datetime,
+                              gifts: list,
+                              message_id: int = None) -> int:
+        async with session_scope() as session:
+            new_giveaway = Giveaway(type=giveaway_type, message_id=message_id, description=description,
+                                    end_datetime=end_datetime,
+                                    winners=len(gifts))
+            session.add(new_giveaway)
+            await session.flush()
+            rows = [{'giveaway_id': new_giveaway.id, 'gift_name': gift['name'], 'amount': gift['amount']}
+                    for gift in gifts if gift.get('name') and gift.get('amount')]
+            if rows:
+                await session.execute(insert(GiveawayGift), rows)
+            return new_giveaway.id
+
+    @staticmethod
+    async def delete_giveaway(giveaway_id: int):
+        async with session_scope() as session:
+            await session.execute(delete(GiveawayParticipant).filter_by(giveaway_id=giveaway_id))
+            await session.execute(delete(GiveawayGift).filter_by(giveaway_id=giveaway_id))
+            await session.execute(delete(Giveaway).filter_by(id=giveaway_id))
+
+    @staticmethod
+    async def add_participant(user_id: int, giveaway_id: int) -> bool:
+        """
+        :return: whether the user was added, False if they had already joined
+        """
+        params = {'user_id': user_id, 'giveaway_id': giveaway_id}
+        async with session_scope() as session:
+            if not (await session.execute(ADD_PARTICIPANT, params)).rowcount:
+                return False
+            await session.execute(COUNT_PARTICIPANT, params)
+            return True
+
+    @staticmethod
+    async def has_user_participated(user_id: int, giveaway_id: int) -> bool:
+        async with session_scope() as session:
+            existing_participant = await session.scalar(
+                select(GiveawayParticipant.user_id).filter_by(user_id=user_id, giveaway_id=giveaway_id))
+            return existing_participant is not None
+
+    @staticmethod
+    async def get_participant_count(giveaway_id: int):
+        async with session_scope() as session:
+            return await session.scalar(select(Giveaway.participant_count).filter_by(id=giveaway_id))
+
+    @staticmethod
+    async def get_participants(giveaway_id: int) -> List[int]:
+        async with session_scope() as session:
+            return list(await session.scalars(
+                select(GiveawayParticipant.user_id).filter_by(giveaway_id=giveaway_id)))
+
+    @staticmethod
+    async def set_message_id(giveaway_id: int, message_id: int):
+        async with session_scope() as session:
+            giveaway = await session.get(Giveaway, giveaway_id)
+            if giveaway:
+                giveaway.message_id = message_id
+
+    @staticmethod
+    async def get_giveaway_end_datetime(giveaway_id: int) -> int:
+        async with session_scope() as session:
+            end_datetime = await session.scalar(select(Giveaway.end_datetime).filter_by(id=giveaway_id))
+            if end_datetime:
+                return end_datetime.timestamp()
+
+    @staticmethod
+    async def get_giveaway_message_id(giveaway_id: int) -> int:
+        async with session_scope() as session:
+            return await session.scalar(select(Giveaway.message_id).filter_by(id=giveaway_id))
+
+    @staticmethod
+    async def get_all_giveaways() -> List[GiveawayRecord]:
+        async with session_scope() as session:
+            rows = await session.execute(select(Giveaway.id, Giveaway.end_datetime, Giveaway.message_id)
+                                         .where(Giveaway.ended_at.is_(None)))
+            return [GiveawayRecord(*row) for row in rows]
+
+    @staticmethod
+    async def select_giveaway_winners(giveaway_id: int, weighted: bool = False) -> list:
+        """
+        Draw one distinct winner per gift without ending the giveaway.
+
+        :param weighted: draw participants with a probability proportional to their level + 1
+        """
+        async with session_scope() as session:
+            if not await session.get(Giveaway, giveaway_id):
+                return []
+            return winner_dicts(await draw_winners(session, giveaway_id, weighted))
+
+    @staticmethod
+    async def end_giveaway(giveaway_id: int, weighted: bool = False) -> Optional[GiveawayResult]:
+        """
+        Draw the winners, credit the coin prizes and archive the giveaway in one transaction.
+
+        :param weighted: draw participants with a probability proportional to their level + 1
+        :return: None if the giveaway doesn't exist or has already ended
+        """
+        now = int(time.time())
+        async with session_scope() as session:
+            giveaway = await session.get(Giveaway, giveaway_id)
+            if giveaway is None or giveaway.ended_at is not None:
+                return None
+
+            pairs = await draw_winners(session, giveaway_id, weighted)
+            for user_id, gift in pairs:
+                gift.winner_id = user_id
+            coins = prize_coins(giveaway.type, pairs)
+            await append_coins(session, [(user_id, amount, GIVEAWAY) for user_id, amount in coins.items()], now)
+            giveaway.ended_at = now
+            result = GiveawayResult(giveaway.id, giveaway.type, giveaway.message_id, giveaway.participant_count,
+                                    winner_dicts(pairs))
+
+        def update_caches():
+            leaderboards.add_coins(coins)
+            for user_id in coins:
+                shop_views.invalidate(user_id)
+
+        after_commit(update_caches)
+        return result
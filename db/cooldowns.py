@@ -0,0 +1,103 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple, Optional, Union
+
+from config import logger, ACTION_COOLDOWNS, COOLDOWN_CACHE_SIZE, COOLDOWN_FLUSH_INTERVAL
+from db.repository import repo
+
+Key = Tuple[int, int]
+
+
+class CooldownEngine:
+    """
+    In-memory cooldown checks.
+
+    The action -> cooldown map comes from config (the action_cooldown table is only a copy of it).
+    Last use times per (user, action) live in a bounded LRU cache, a miss is loaded from `user_action` once.
+    Touched entries are kept in a dirty map until the next flush, so evicting an entry never loses a write.
+    """
+
+    def __init__(self, cooldowns: Dict[int, int] = None, max_entries: int = COOLDOWN_CACHE_SIZE,
+                 flush_interval: int = COOLDOWN_FLUSH_INTERVAL):
+        self.cooldowns = dict(cooldowns if cooldowns is not None else ACTION_COOLDOWNS)
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self._last: OrderedDict[Key, float] = OrderedDict()
+        self._dirty: Dict[Key, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+    async def _get_last(self, key: Key) -> float:
+        if key in self._dirty:
+            return self._dirty[key]
+        last = self._last.get(key)
+        if last is not None:
+            self._last.move_to_end(key)
+            return last
+        last = await repo.actions.get_last_action(*key)
+        self._remember(key, last)
+        return last
+
+    def _remember(self, key: Key, last: float) -> None:
+        self._last[key] = last
+        self._last.move_to_end(key)
+        while len(self._last) > self.max_entries:
+            self._last.popitem(last=False)
+
+    async def check(self, user_id: int, action_id: int, now: float = None) -> Union[bool, int]:
+        """
+        :return: True if the cooldown has expired, otherwise remaining seconds
+        """
+        now = now if now is not None else time.time()
+        last = await self._get_last((user_id, action_id))
+        if last:
+            remaining_time = last + self.cooldowns[action_id] - now
+            if remaining_time < 0:
+                return True
+            else:
+                return int(remaining_time)
+        else:
+            self.touch(user_id, action_id, now)
+            return True
+
+    def touch(self, user_id: int, action_id: int, now: float = None) -> None:
+        key = (user_id, action_id)
+        now = now if now is not None else time.time()
+        self._dirty[key] = now
+        self._remember(key, now)
+
+    async def flush(self) -> int:
+        if not self._dirty:
+            return 0
+        dirty, self._dirty = self._dirty, {}
+        try:
+            await repo.actions.save_last_actions(dirty)
+        except Exception as e:
+            logger.error(f"Cooldown flush failed: {e}")
+            dirty.update(self._dirty)
+            self._dirty = dirty
+            return 0
+        return len(dirty)
+
+    def start(self) -> None:
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task without interrupting a flush in progress and flush what is left."""
+        if self._task:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                await self.flush()
+
+
+cooldowns = CooldownEngine()
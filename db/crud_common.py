@@ -0,0 +1,68 @@
+"""
+Rules shared by the storage backends.
+
+db/async_crud.py and db/memory.py both implement the repositories of db/repository.py. What a message is worth,
+how giveaway winners are weighted and paid, and how ledger and level rows are built live here once, so the
+backends only differ in where they keep the data.
+"""
+import random
+import time
+from typing import Dict, Iterable, List, Tuple, Union
+
+from config import COINS_PER_MSG, xp_range
+from db.models import GiveawayGift
+from modules.level_curve import level_for
+from modules.winners import Reservoir, WeightedReservoir
+
+PARTICIPANT_BATCH = 1000  # participant rows streamed into the winners reservoir at a time
+
+
+def message_reward(user_coins_per_msg: int) -> Tuple[int, int]:
+    """
+    :param user_coins_per_msg: `User.user_coins_per_msg` of the author
+    :return: (XP, coins) earned by one rewarded message
+    """
+    return random.choice(xp_range), user_coins_per_msg + COINS_PER_MSG
+
+
+def ledger_rows(entries: Iterable[Tuple[int, int, int]], now: int = None) -> List[dict]:
+    """Coin ledger rows of (user_id, amount, reason) entries, skipping zero amounts."""
+    now = now if now is not None else int(time.time())
+    return [{'user_id': user_id, 'amount': amount, 'reason': reason, 'created_at': now}
+            for user_id, amount, reason in entries if amount]
+
+
+def level_rows(totals: Dict[int, int]) -> List[dict]:
+    """SET_LEVEL parameters of the levels derived from user_id -> total_xp."""
+    return [dict(zip(('b_user_id', 'b_level', 'b_xp', 'b_xp_needed'), (user_id, *level_for(total_xp))))
+            for user_id, total_xp in totals.items()]
+
+
+def new_reservoir(gifts: int, weighted: bool) -> Union[Reservoir, WeightedReservoir]:
+    """Reservoir drawing one winner per gift, fed by `draw_chunk`."""
+    return WeightedReservoir(gifts) if weighted else Reservoir(gifts)
+
+
+def draw_chunk(rows: Iterable[Tuple[int, int]], weighted: bool) -> list:
+    """
+    Reservoir input for (user_id, total_xp) participant rows: a weighted draw favours a participant in proportion
+    to their level + 1, a participant with no level counts as level 0.
+    """
+    if weighted:
+        return [(user_id, level_for(total_xp or 0)[0] + 1) for user_id, total_xp in rows]
+    return [user_id for user_id, *_ in rows]
+
+
+def prize_coins(giveaway_type: str, pairs: List[Tuple[int, GiveawayGift]]) -> Dict[int, int]:
+    """
+    :return: user_id -> coins won, empty unless it is a COINS giveaway
+    """
+    coins = {}
+    if giveaway_type == 'COINS':
+        for user_id, gift in pairs:
+            coins[user_id] = coins.get(user_id, 0) + int(gift.amount) * 100
+    return coins
+
+
+def winner_dicts(pairs: List[Tuple[int, GiveawayGift]]) -> list:
+    return [{"winner": user_id, "gift": {"name": gift.gift_name, "amount": gift.amount}} for user_id, gift in pairs]
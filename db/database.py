@@ -1,5 +1,48 @@
-from sqlalchemy import create_engine
+from typing import Dict, Tuple
+
+from sqlalchemy import create_engine, event, Engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+from config import STORAGE_PRAGMAS, STORAGE_POOL_SIZE, STORAGE_MAX_OVERFLOW, STORAGE_POOL_TIMEOUT
+
+DATABASE_PATH = "db/database.db"
+
+
+def set_pragmas(engine: Engine, pragmas: Dict[str, object]) -> None:
+    """
+    Apply PRAGMA statements to every new connection of the engine.
+
+    :param engine: sync engine, or `AsyncEngine.sync_engine`
+    :param pragmas: pragma name -> value
+    """
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def create_engines(path: str, pragmas: Dict[str, object] = None) -> Tuple[Engine, AsyncEngine]:
+    """
+    Create the sync engine (giveaway threads, setup, scripts) and the async engine (event loop) for one
+    SQLite file. Both keep a pool of open connections so the pragmas are applied once per connection.
+
+    :param path: database file
+    :param pragmas: storage pragmas, the configured profile by default
+    :return: sync engine, async engine
+    """
+    pragmas = STORAGE_PRAGMAS if pragmas is None else pragmas
+    pool = dict(pool_size=STORAGE_POOL_SIZE, max_overflow=STORAGE_MAX_OVERFLOW, pool_timeout=STORAGE_POOL_TIMEOUT)
+    sync_engine = create_engine(f"sqlite:///{path}", poolclass=QueuePool, **pool)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=AsyncAdaptedQueuePool, **pool)
+    set_pragmas(sync_engine, pragmas)
+    set_pragmas(async_engine.sync_engine, pragmas)
+    return sync_engine, async_engine
+
 
-engine = create_engine("sqlite:///db/database.db")
+engine, async_engine = create_engines(DATABASE_PATH)
 Session = sessionmaker(engine)
+AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
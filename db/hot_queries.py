@@ -0,0 +1,89 @@
+"""
+Prebuilt statements for the lookups that run on every update.
+
+They are constructed once at import with bound parameters, so SQLAlchemy memoizes their cache key and reuses
+the compiled SQL instead of rebuilding and recompiling a `session.query(...).filter_by(...)` per call.
+Execute them with a parameter dict: `session.scalar(USER_BY_ID, {'user_id': user_id})`.
+
+GRANT_XP adds to the total XP of a user in SQL, creating the level row if needed, and returns the new total.
+SET_LEVEL stores the level derived from it (see modules/level_curve.py). COUNT_MESSAGES adds to the rewarded
+messages of a user on a day. SHOP_VIEW returns the balance, nickname and booster counts of a user in one row per
+booster owned (one row with NULL booster columns if none). ADD_PARTICIPANT relies on the primary key of
+giveaway_participants to ignore a repeated entry, COUNT_PARTICIPANT keeps giveaways.participant_count in step.
+
+Coin balances are a snapshot plus the ledger entries appended after the last compaction (see db/ledger.py):
+USER_COINS is that sum for the user of the enclosing query and APPEND_COINS appends entries. DEBIT_COINS appends
+a debit only if the balance with the accrued income covers it and returns the new balance (no row otherwise), so
+the check and the write are one statement and concurrent spends can't overdraw a balance.
+"""
+from sqlalchemy import select, bindparam, update, func, insert as sql_insert, Integer
+from sqlalchemy.dialects.sqlite import insert
+
+from db.models import User, UserLevel, UserAction, ActionCooldown, UserMessageDay, UserBooster, CoinLedgerEntry, \
+    CoinSnapshot, Giveaway, GiveawayParticipant
+
+users_level = UserLevel.__table__
+user_message_days = UserMessageDay.__table__
+coin_ledger = CoinLedgerEntry.__table__
+giveaway_participants = GiveawayParticipant.__table__
+
+LATEST_SNAPSHOT = select(CoinSnapshot.ledger_id).where(
+    CoinSnapshot.id == select(func.max(CoinSnapshot.id)).scalar_subquery())
+LEDGER_WATERMARK = func.coalesce(LATEST_SNAPSHOT.scalar_subquery(), 0)
+
+USER_COINS = User.user_coins + select(func.coalesce(func.sum(CoinLedgerEntry.amount), 0)).where(
+    CoinLedgerEntry.user_id == User.user_id, CoinLedgerEntry.id > LEDGER_WATERMARK).scalar_subquery()
+
+APPEND_COINS = sql_insert(coin_ledger)
+
+_now = bindparam('now', type_=Integer)
+_debit = bindparam('n', type_=Integer)
+_balance_now = USER_COINS + User.coins_per_min_bonus * func.max((_now - User.income_settled_at) // 60, 0)
+DEBIT_COINS = sql_insert(coin_ledger).from_select(
+    ['user_id', 'amount', 'reason', 'created_at'],
+    select(User.user_id, -_debit, bindparam('reason'), _now).where(
+        User.user_id == bindparam('user_id'), _balance_now >= _debit),
+).returning(select(_balance_now).where(User.user_id == bindparam('user_id')).scalar_subquery())
+
+USER_BY_ID = select(User).where(User.user_id == bindparam('user_id'))
+
+USER_PROFILE = select(User.user_id, User.user_name, User.user_nickname).where(User.user_id == bindparam('user_id'))
+
+USER_BALANCE = select(USER_COINS, User.coins_per_min_bonus, User.income_settled_at).where(
+    User.user_id == bindparam('user_id'))
+
+USER_BOOSTERS_AMOUNT = select(User.user_coins_per_msg, User.user_coins_per_min).where(
+    User.user_id == bindparam('user_id'))
+
+LEVEL_BY_USER = select(UserLevel).where(UserLevel.user_id == bindparam('user_id'))
+
+LAST_ACTION = select(UserAction.last_time).where(UserAction.user == bindparam('user_id'),
+                                                 UserAction.action == bindparam('action_id'))
+
+ACTION_COOLDOWN = select(ActionCooldown.cooldown).where(ActionCooldown.id == bindparam('action_id'))
+
+_new_level = insert(users_level).values(user_id=bindparam('b_user_id'), total_xp=func.max(bindparam('b_amount'), 0),
+                                        level=0, xp=0, xp_needed=100)
+GRANT_XP = _new_level.on_conflict_do_update(
+    index_elements=[users_level.c.user_id],
+    set_={'total_xp': func.max(users_level.c.total_xp + bindparam('b_amount'), 0)},
+).returning(users_level.c.user_id, users_level.c.total_xp)
+
+SET_LEVEL = update(users_level).where(users_level.c.user_id == bindparam('b_user_id')).values(
+    level=bindparam('b_level'), xp=bindparam('b_xp'), xp_needed=bindparam('b_xp_needed'))
+
+_new_day = insert(user_message_days).values(user_id=bindparam('b_user_id'), day=bindparam('b_day'),
+                                            messages=bindparam('b_messages'))
+COUNT_MESSAGES = _new_day.on_conflict_do_update(
+    index_elements=[user_message_days.c.user_id, user_message_days.c.day],
+    set_={'messages': user_message_days.c.messages + _new_day.excluded.messages})
+
+SHOP_VIEW = select(User.user_nickname, USER_COINS, User.coins_per_min_bonus, User.income_settled_at,
+                   UserBooster.booster_id, UserBooster.amount).outerjoin(
+    UserBooster, UserBooster.user_id == User.user_id).where(User.user_id == bindparam('user_id'))
+
+ADD_PARTICIPANT = insert(giveaway_participants).values(
+    giveaway_id=bindparam('giveaway_id'), user_id=bindparam('user_id')).on_conflict_do_nothing()
+
+COUNT_PARTICIPANT = update(Giveaway).where(Giveaway.id == bindparam('giveaway_id')).values(
+    participant_count=Giveaway.participant_count + 1)
@@ -0,0 +1,298 @@
+import random
+import time
+from typing import Dict, List, Tuple, Optional, Iterable
+
+from db.models import accrued_income
+from db.repository import repo
+
+WEEK_DAYS = 7
+BOARDS = ('level', 'coins', 'week')
+
+Key = Tuple[int, int]
+
+
+def epoch_day(timestamp: float) -> int:
+    return int(timestamp // 86400)
+
+
+def balance_of(user) -> Tuple[int, int, int, int]:
+    """(user_id, user_coins, coins_per_min, income_settled_at) of a User as the coin board takes it."""
+    return user.user_id, user.user_coins, user.coins_per_min_bonus, user.income_settled_at
+
+
+class _Node:
+    __slots__ = ('key', 'priority', 'size', 'left', 'right')
+
+    def __init__(self, key: Key):
+        self.key = key
+        self.priority = random.random()
+        self.size = 1
+        self.left: Optional[_Node] = None
+        self.right: Optional[_Node] = None
+
+
+def _size(node: Optional[_Node]) -> int:
+    return node.size if node else 0
+
+
+def _update(node: _Node) -> _Node:
+    node.size = 1 + _size(node.left) + _size(node.right)
+    return node
+
+
+def _split(node: Optional[_Node], key: Key) -> Tuple[Optional[_Node], Optional[_Node]]:
+    """Split into the keys below `key` and the keys from `key` on."""
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        return _update(node), right
+    left, node.left = _split(node.left, key)
+    return left, _update(node)
+
+
+def _merge(left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+    if left is None or right is None:
+        return left or right
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return _update(left)
+    right.left = _merge(left, right.left)
+    return _update(right)
+
+
+def _drop_first(node: _Node) -> Optional[_Node]:
+    if node.left is None:
+        return node.right
+    node.left = _drop_first(node.left)
+    return _update(node)
+
+
+class RankTree:
+    """
+    Order-statistic treap over unique keys.
+
+    Every node knows the size of its subtree, so inserting, removing, the rank of a key and the key at a rank
+    are all O(log n) expected.
+    """
+
+    def __init__(self):
+        self._root: Optional[_Node] = None
+
+    def __len__(self) -> int:
+        return _size(self._root)
+
+    def insert(self, key: Key) -> None:
+        left, right = _split(self._root, key)
+        self._root = _merge(_merge(left, _Node(key)), right)
+
+    def remove(self, key: Key) -> None:
+        left, right = _split(self._root, key)
+        if right is not None:
+            right = _drop_first(right)
+        self._root = _merge(left, right)
+
+    def rank(self, key: Key) -> int:
+        """Number of keys below `key`."""
+        rank, node = 0, self._root
+        while node:
+            if node.key < key:
+                rank += _size(node.left) + 1
+                node = node.right
+            else:
+                node = node.left
+        return rank
+
+    def at(self, index: int) -> Key:
+        node = self._root
+        while node:
+            left = _size(node.left)
+            if index < left:
+                node = node.left
+            elif index == left:
+                return node.key
+            else:
+                index -= left + 1
+                node = node.right
+        raise IndexError(index)
+
+
+class Board:
+    """User scores ranked from the highest, ties broken by the lower user ID."""
+
+    def __init__(self):
+        self.scores: Dict[int, int] = {}
+        self._tree = RankTree()
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def set(self, user_id: int, score: int) -> None:
+        old = self.scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            self._tree.remove((-old, user_id))
+        self.scores[user_id] = score
+        self._tree.insert((-score, user_id))
+
+    def add(self, user_id: int, amount: int) -> None:
+        score = self.scores.get(user_id, 0) + amount
+        if score > 0:
+            self.set(user_id, score)
+        else:
+            self.remove(user_id)
+
+    def remove(self, user_id: int) -> None:
+        score = self.scores.pop(user_id, None)
+        if score is not None:
+            self._tree.remove((-score, user_id))
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """
+        :return: 1-based position of the user, None if the user is not on the board
+        """
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return self._tree.rank((-score, user_id)) + 1
+
+    def page(self, limit: int, offset: int = 0) -> List[Tuple[int, int]]:
+        """
+        :return: (user_id, score) of the users ranked offset + 1 to offset + limit
+        """
+        page = []
+        for index in range(offset, min(offset + limit, len(self))):
+            score, user_id = self._tree.at(index)
+            page.append((user_id, -score))
+        return page
+
+
+class Leaderboards:
+    """
+    In-memory rankings by total XP ('level'), coin balance ('coins') and rewarded messages in the last
+    7 days ('week').
+
+    They are rebuilt from the database at startup and kept up to date by the CRUD layer after every commit that
+    changes XP, coins or message counts; coin ledger entries are applied as deltas. Balances of users with passive
+    income grow without writes, so those users are re-scored at most once a minute when the coin board is read.
+    Weekly counts are kept per day and the days that fall out of the window are subtracted when the board is read.
+    """
+
+    def __init__(self):
+        self.boards: Dict[str, Board] = {}
+        self._income: Dict[int, Tuple[int, int, int]] = {}
+        self._income_minute: Optional[int] = None
+        self._days: Dict[int, Dict[int, int]] = {}
+        self.clear()
+
+    def clear(self) -> None:
+        self.boards = {name: Board() for name in BOARDS}
+        self._income = {}
+        self._income_minute = None
+        self._days = {}
+
+    async def rebuild(self, now: float = None) -> None:
+        now = now if now is not None else time.time()
+        since = epoch_day(now) - WEEK_DAYS + 1
+        await repo.users.delete_message_counts_before(since)
+        self.load(await repo.levels.get_total_xp(), await repo.users.get_balances(),
+                  await repo.users.get_message_counts(since), now)
+
+    def load(self, total_xp: Iterable[Tuple[int, int]], balances: Iterable[Tuple[int, int, int, int]],
+             message_counts: Iterable[Tuple[int, int, int]], now: float = None) -> None:
+        """
+        :param total_xp: (user_id, total_xp)
+        :param balances: (user_id, user_coins, coins_per_min, income_settled_at)
+        :param message_counts: (user_id, day, messages)
+        """
+        self.clear()
+        self.update_xp(dict(total_xp))
+        self.update_coins(balances, now)
+        for user_id, day, messages in message_counts:
+            self._add_messages(user_id, day, messages)
+
+    def update_xp(self, total_xp: Dict[int, int]) -> None:
+        """
+        :param total_xp: user_id -> total_xp
+        """
+        level_board = self.boards['level']
+        for user_id, xp in total_xp.items():
+            level_board.set(user_id, xp)
+
+    def update_coins(self, balances: Iterable[Tuple[int, int, int, int]], now: float = None) -> None:
+        """
+        :param balances: (user_id, user_coins, coins_per_min, income_settled_at)
+        """
+        now = int(now if now is not None else time.time())
+        coins_board = self.boards['coins']
+        for user_id, coins, coins_per_min, settled_at in balances:
+            coins = coins or 0
+            if coins_per_min:
+                self._income[user_id] = (coins, coins_per_min, settled_at)
+            else:
+                self._income.pop(user_id, None)
+            coins_board.set(user_id, coins + accrued_income(coins_per_min, settled_at, now))
+
+    def add_coins(self, amounts: Dict[int, int], now: float = None) -> None:
+        """
+        :param amounts: user_id -> coins credited, negative for debits
+        """
+        now = int(now if now is not None else time.time())
+        coins_board = self.boards['coins']
+        for user_id, amount in amounts.items():
+            income = self._income.get(user_id)
+            if income:
+                coins, coins_per_min, settled_at = income
+                self._income[user_id] = (coins + amount, coins_per_min, settled_at)
+                coins_board.set(user_id, coins + amount + accrued_income(coins_per_min, settled_at, now))
+            else:
+                coins_board.set(user_id, coins_board.scores.get(user_id, 0) + amount)
+
+    def count_messages(self, events: Iterable[Tuple[int, float]]) -> None:
+        """
+        :param events: (user_id, timestamp) of rewarded messages
+        """
+        for user_id, timestamp in events:
+            self._add_messages(user_id, epoch_day(timestamp), 1)
+
+    def _add_messages(self, user_id: int, day: int, messages: int) -> None:
+        counts = self._days.setdefault(day, {})
+        counts[user_id] = counts.get(user_id, 0) + messages
+        self.boards['week'].add(user_id, messages)
+
+    def remove(self, user_id: int) -> None:
+        for board in self.boards.values():
+            board.remove(user_id)
+        self._income.pop(user_id, None)
+        for counts in self._days.values():
+            counts.pop(user_id, None)
+
+    def board(self, name: str, now: float = None) -> Board:
+        """
+        :param name: 'level', 'coins' or 'week'
+        """
+        now = now if now is not None else time.time()
+        if name == 'coins':
+            self._refresh_income(int(now))
+        elif name == 'week':
+            self._expire_days(epoch_day(now) - WEEK_DAYS + 1)
+        return self.boards[name]
+
+    def _refresh_income(self, now: int) -> None:
+        minute = now // 60
+        if minute == self._income_minute:
+            return
+        self._income_minute = minute
+        coins_board = self.boards['coins']
+        for user_id, (coins, coins_per_min, settled_at) in self._income.items():
+            coins_board.set(user_id, coins + accrued_income(coins_per_min, settled_at, now))
+
+    def _expire_days(self, since: int) -> None:
+        week_board = self.boards['week']
+        for day in [day for day in self._days if day < since]:
+            for user_id, messages in self._days.pop(day).items():
+                week_board.add(user_id, -messages)
+
+
+leaderboards = Leaderboards()
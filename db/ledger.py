@@ -0,0 +1,69 @@
+"""
+Coin ledger.
+
+Every change of a balance is appended to `coin_ledger` with a reason code, and `users.user_coins` is only a snapshot
+of the balance as of the last compaction. A balance is that snapshot plus the user's entries appended since, plus
+the passive income accrued since `income_settled_at`.
+
+The compactor folds the new entries into the snapshots in the background and records the ledger position it
+reached in `coin_snapshots`, so reads only sum the few entries of one user after that position.
+"""
+import asyncio
+from typing import Optional
+
+from config import logger, LEDGER_COMPACT_INTERVAL
+from db.repository import repo
+
+# reason codes of coin_ledger entries
+OPENING = 0  # balance carried over when the ledger was introduced
+MESSAGE = 1
+INCOME = 2  # passive income settled before a per-minute bonus changes
+SHOP = 3
+ANIME = 4
+IMAGE = 5
+BET = 6
+BET_PAYOUT = 7
+GIVEAWAY = 8
+
+REASONS = {OPENING: 'opening', MESSAGE: 'message', INCOME: 'income', SHOP: 'shop', ANIME: 'anime', IMAGE: 'image',
+           BET: 'bet', BET_PAYOUT: 'bet payout', GIVEAWAY: 'giveaway'}
+
+
+class LedgerCompactor:
+    """Folds the coin ledger into the balance snapshots every `interval` seconds."""
+
+    def __init__(self, interval: int = LEDGER_COMPACT_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+    async def compact(self) -> int:
+        """
+        :return: number of balances updated
+        """
+        try:
+            return await repo.users.compact_ledger()
+        except Exception as e:
+            logger.error(f"Ledger compaction failed: {e}")
+            return 0
+
+    def start(self) -> None:
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.compact()
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                await self.compact()
+
+
+ledger_compactor = LedgerCompactor()
@@ -0,0 +1,50 @@
+import random
+from typing import Dict, List, Iterable, Optional
+
+
+class MembershipIndex:
+    """
+    Process-wide set of known user IDs.
+
+    IDs are kept in a list plus an id -> position map, so membership checks, inserts, removals
+    (swap with the last element) and picking a random member are all O(1).
+    """
+
+    def __init__(self):
+        self._ids: List[int] = []
+        self._positions: Dict[int, int] = {}
+
+    def load(self, user_ids: Iterable[int]) -> None:
+        self._ids = []
+        self._positions = {}
+        for user_id in user_ids:
+            self.add(user_id)
+
+    def add(self, user_id: int) -> None:
+        if user_id not in self._positions:
+            self._positions[user_id] = len(self._ids)
+            self._ids.append(user_id)
+
+    def remove(self, user_id: int) -> None:
+        position = self._positions.pop(user_id, None)
+        if position is None:
+            return
+        last_id = self._ids.pop()
+        if last_id != user_id:
+            self._ids[position] = last_id
+            self._positions[last_id] = position
+
+    def random_member(self) -> Optional[int]:
+        return random.choice(self._ids) if self._ids else None
+
+    def ids(self) -> List[int]:
+        return list(self._ids)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._positions
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+members = MembershipIndex()
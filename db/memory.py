@@ -0,0 +1,435 @@
+"""
+In-memory storage backend.
+
+Implements the repository interfaces over plain dicts so handler tests, benchmarks and disk-less runs do not
+touch SQLite. Read paths return the same records as the SQLAlchemy backend; mutable state is kept as model
+instances that are never attached to a session.
+
+There are no transactions: every change is applied as soon as it is made. A unit of work that is rolled back only
+drops the after_commit callbacks of its changes, so the caches that follow commits (members, leaderboards, profiles,
+shop views, giveaway participation) can then disagree with the store. Use the SQLAlchemy backend where rollbacks
+matter.
+"""
+import datetime
+import itertools
+import time
+from typing import List, Tuple, Dict, Optional
+
+from config import logger
+from db.crud_common import message_reward, new_reservoir, draw_chunk, prize_coins, winner_dicts
+from db.leaderboards import leaderboards, balance_of, epoch_day
+from db.ledger import MESSAGE, INCOME, SHOP, GIVEAWAY
+from db.members import members
+from db.models import User, Booster, UserLevel, Giveaway, GiveawayGift
+from db.profiles import profiles
+from db.records import UserProfile, LeaderboardEntry, GiveawayRecord, GiveawayResult, ShopView, LedgerEntry
+from db.repository import UserRepository, UserActionRepository, UserLevelRepository, UsersBoostersRepository, \
+    GiveawayRepository
+from db.shop_views import shop_views
+from db.unit_of_work import after_commit
+from modules.level_curve import total_xp_for
+from modules.winners import pair_gifts
+
+
+class MemoryStore:
+    """All data of the in-memory backend, shared by its repositories."""
+
+    def __init__(self, boosters: List[Booster] = None):
+        self.boosters: Dict[int, Booster] = {booster.id: booster for booster in boosters or []}
+        self.users: Dict[int, User] = {}
+        self.levels: Dict[int, UserLevel] = {}
+        self.last_actions: Dict[Tuple[int, int], int] = {}
+        self.user_boosters: Dict[Tuple[int, int], int] = {}
+        self.giveaways: Dict[int, Giveaway] = {}
+        self.gifts: Dict[int, List[GiveawayGift]] = {}
+        self.participants: Dict[int, Dict[int, None]] = {}
+        self.message_days: Dict[Tuple[int, int], int] = {}
+        self.coin_ledger: List[LedgerEntry] = []
+        self.ids = itertools.count(1)
+
+    def new_level(self, user_id: int) -> UserLevel:
+        level = UserLevel(id=next(self.ids), user_id=user_id, level=0, xp=0, xp_needed=100, total_xp=0)
+        level.user = self.users.get(user_id)
+        self.levels[user_id] = level
+        return level
+
+    def append_coins(self, user: User, amount: int, reason: int) -> None:
+        """Record a coin ledger entry. Balances are applied right away, so there is nothing to compact."""
+        if amount:
+            self.coin_ledger.append(LedgerEntry(next(self.ids), user.user_id, amount, reason, int(time.time())))
+            user.user_coins += amount
+
+
+class MemoryUserRepository(UserRepository):
+    def __init__(self, store: MemoryStore):
+        self.store = store
+
+    async def create_user(self, user_id: int, user_name: str = '', user_nickname: str = '') -> None:
+        if user_id not in self.store.users:
+            self.store.users[user_id] = User(user_id=user_id, user_name=user_name, user_nickname=user_nickname,
+                                             user_coins=0, coins_per_msg_bonus=0, coins_per_min_bonus=0,
+                                             income_settled_at=int(time.time()))
+            logger.debug(f"User with ID {user_id} created.")
+            balance = balance_of(self.store.users[user_id])
+            profile = UserProfile(user_id, user_name, user_nickname)
+
+            def update_caches():
+                leaderboards.update_coins([balance])
+                profiles.remember(profile)
+
+            after_commit(update_caches)
+        else:
+            logger.debug(f"User with ID {user_id} already exists in the database. Skipping creation.")
+        after_commit(lambda: members.add(user_id))
+
+    async def delete_user(self, user_id: int) -> None:
+        if self.store.users.pop(user_id, None):
+            self.store.levels.pop(user_id, None)
+            for key in [key for key in self.store.last_actions if key[0] == user_id]:
+                del self.store.last_actions[key]
+            for key in [key for key in self.store.user_boosters if key[0] == user_id]:
+                del self.store.user_boosters[key]
+            for participants in self.store.participants.values():
+                participants.pop(user_id, None)
+            for key in [key for key in self.store.message_days if key[0] == user_id]:
+                del self.store.message_days[key]
+            self.store.coin_ledger = [entry for entry in self.store.coin_ledger if entry.user_id != user_id]
+            logger.debug(f"User with ID {user_id} and associated data has been deleted.")
+        else:
+            logger.debug(f"User with ID {user_id} not found.")
+
+        def update_caches():
+            members.remove(user_id)
+            leaderboards.remove(user_id)
+            profiles.invalidate(user_id)
+            shop_views.invalidate(user_id)
+
+        after_commit(update_caches)
+
+    async def get_user_by_id(self, user_id: int) -> Optional[UserProfile]:
+        user = self.store.users.get(user_id)
+        return UserProfile(user.user_id, user.user_name, user.user_nickname) if user else None
+
+    async def get_user_id_by_username(self, user_name: str) -> Optional[int]:
+        for user in self.store.users.values():
+            if user.user_name == user_name:
+                return user.user_id
+
+    async def check_user_exists(self, user_id: int) -> bool:
+        return user_id in self.store.users
+
+    async def get_all_user_ids(self) -> List[int]:
+        return list(self.store.users)
+
+    async def get_profiles(self, user_ids: List[int]) -> List[UserProfile]:
+        return [UserProfile(user_id, self.store.users[user_id].user_name, self.store.users[user_id].user_nickname)
+                for user_id in user_ids if user_id in self.store.users]
+
+    async def update_user_names(self, user_id: int, user_name: Optional[str], user_nickname: str) -> bool:
+        user = self.store.users.get(user_id)
+        taken = any(other.user_id != user_id and (other.user_nickname == user_nickname or
+                                                  (user_name and other.user_name == user_name))
+                    for other in self.store.users.values())
+        if user is None or taken:
+            return False
+        user.user_name, user.user_nickname = user_name, user_nickname
+
+        def update_caches():
+            profiles.invalidate(user_id)
+            shop_views.invalidate(user_id)
+
+        after_commit(update_caches)
+        return True
+
+    async def get_balances(self) -> List[Tuple[int, int, int, int]]:
+        return [balance_of(user) for user in self.store.users.values()]
+
+    async def get_message_counts(self, since_day: int) -> List[Tuple[int, int, int]]:
+        return [(user_id, day, messages) for (user_id, day), messages in self.store.message_days.items()
+                if day >= since_day]
+
+    async def delete_message_counts_before(self, day: int) -> None:
+        for key in [key for key in self.store.message_days if key[1] < day]:
+            del self.store.message_days[key]
+
+    async def apply_message_rewards(self, events: List[Tuple[int, float]]) -> int:
+        rewarded = []
+        coins = {}
+        for user_id, timestamp in events:
+            user = self.store.users.get(user_id)
+            if user is None:
+                continue
+            level = self.store.levels.get(user_id) or self.store.new_level(user_id)
+            xp, earned = message_reward(user.user_coins_per_msg)
+            level.add_xp(xp)
+            coins[user_id] = coins.get(user_id, 0) + earned
+            key = (user_id, epoch_day(timestamp))
+            self.store.message_days[key] = self.store.message_days.get(key, 0) + 1
+            rewarded.append((user_id, timestamp))
+        for user_id, amount in coins.items():
+            self.store.append_coins(self.store.users[user_id], amount, MESSAGE)
+        totals = {user_id: self.store.levels[user_id].total_xp for user_id in coins}
+
+        def update_caches():
+            leaderboards.update_xp(totals)
+            leaderboards.add_coins(coins)
+            leaderboards.count_messages(rewarded)
+            for user_id in coins:
+                shop_views.invalidate(user_id)
+
+        after_commit(update_caches)
+        return len(rewarded)
+
+    async def get_user_balance(self, user_id: int) -> int:
+        return self.store.users[user_id].balance()
+
+    async def add_coins(self, user_id: int, amount: int, reason: int) -> None:
+        self.store.append_coins(self.store.users[user_id], amount, reason)
+
+        def update_caches():
+            leaderboards.add_coins({user_id: amount})
+            shop_views.invalidate(user_id)
+
+        after_commit(update_caches)
+
+    async def get_boosters_amount(self, user_id: int) -> Tuple[int, int]:
+        user = self.store.users[user_id]
+        return user.user_coins_per_msg, user.user_coins_per_min
+
+    async def debit_coins(self, user_id: int, n: int, reason: int) -> Optional[int]:
+        user = self.store.users.get(user_id)
+        if user is None:
+            logger.error(f"No user found with ID {user_id}")
+            return None
+        if user.balance() < n:
+            return None
+        self.store.append_coins(user, -n, reason)
+
+        def update_caches():
+            leaderboards.add_coins({user_id: -n})
+            shop_views.invalidate(user_id)
+
+        after_commit(update_caches)
+        return user.balance()
+
+    async def get_coin_history(self, user_id: int, limit: int = 20, before_id: int = None) -> List[LedgerEntry]:
+        entries = [entry for entry in reversed(self.store.coin_ledger)
+                   if entry.user_id == user_id and (before_id is None or entry.id < before_id)]
+        return entries[:limit]
+
+    async def get_coin_ledger(self, since: int, until: int) -> List[LedgerEntry]:
+        return [entry for entry in self.store.coin_ledger if since <= entry.created_at < until]
+
+    async def compact_ledger(self) -> int:
+        return 0
+
+
+class MemoryUserActionRepository(UserActionRepository):
+    def __init__(self, store: MemoryStore):
+        self.store = store
+
+    async def update_action_time(self, user_id: int, action_id: int) -> None:
+        self.store.last_actions[(user_id, action_id)] = int(time.time())
+
+    async def get_last_action(self, user_id: int, action_id: int) -> int:
+        return self.store.last_actions.get((user_id, action_id), 0)
+
+    async def save_last_actions(self, last_actions: Dict[Tuple[int, int], float]) -> None:
+        for key, timestamp in last_actions.items():
+            self.store.last_actions[key] = int(timestamp)
+
+
+class MemoryUserLevelRepository(UserLevelRepository):
+    def __init__(self, store: MemoryStore):
+        self.store = store
+
+    async def create_level(self, user_id: int) -> None:
+        self.store.new_level(user_id)
+        after_commit(lambda: leaderboards.update_xp({user_id: 0}))
+
+    async def get_level(self, user_id: int) -> UserLevel:
+        return self.store.levels.get(user_id) or self.store.new_level(user_id)
+
+    async def update_level(self, user_id: int, new_level: int, new_xp: int, new_xp_needed: int) -> None:
+        level = self.store.levels[user_id]
+        level.level, level.xp, level.xp_needed = new_level, new_xp, new_xp_needed
+        level.total_xp = total_xp_for(new_level, new_xp)
+        totals = {user_id: level.total_xp}
+        after_commit(lambda: leaderboards.update_xp(totals))
+
+    async def get_total_xp(self) -> List[Tuple[int, int]]:
+        return [(user_id, level.total_xp) for user_id, level in self.store.levels.items()]
+
+    async def grant_xp(self, grants: Dict[int, int]) -> Dict[int, Tuple[int, int, int]]:
+        levels, totals = {}, {}
+        for user_id, amount in grants.items():
+            level = self.store.levels.get(user_id) or self.store.new_level(user_id)
+            level.add_xp(amount)
+            levels[user_id] = level.level, level.xp, level.xp_needed
+            totals[user_id] = level.total_xp
+        after_commit(lambda: leaderboards.update_xp(totals))
+        return levels
+
+    async def get_top_users(self) -> List[LeaderboardEntry]:
+        levels = sorted(self.store.levels.values(), key=lambda level: level.total_xp, reverse=True)[:20]
+        return [LeaderboardEntry(level.user_id, self.store.users[level.user_id].user_nickname, level.level, level.xp)
+                for level in levels if level.user_id in self.store.users]
+
+
+class MemoryUsersBoostersRepository(UsersBoostersRepository):
+    def __init__(self, store: MemoryStore):
+        self.store = store
+
+    async def get_booster_count(self, user_id: int, booster_id: int) -> int:
+        return self.store.user_boosters.get((user_id, booster_id), 0)
+
+    async def increment_or_create(self, user_id: int, booster_id: int) -> None:
+        key = (user_id, booster_id)
+        self.store.user_boosters[key] = self.store.user_boosters.get(key, 0) + 1
+        booster = self.store.boosters[booster_id]
+        user = self.store.users[user_id]
+        if booster.booster_type == 1:
+            user.coins_per_msg_bonus += booster.bonus_amount
+        elif booster.booster_type == 2:
+            self.store.append_coins(user, user.settle_income(), INCOME)
+            user.coins_per_min_bonus += booster.bonus_amount
+        balance = balance_of(user)
+
+        def update_caches():
+            leaderboards.update_coins([balance])
+            shop_views.invalidate(user_id)
+
+        after_commit(update_caches)
+
+    async def buy_boosters(self, user_id: int, item, quantity: Optional[int] = None) -> Tuple[int, int]:
+        user = self.store.users.get(user_id)
+        if user is None:
+            logger.error(f"No user found with ID {user_id}")
+            return 0, 0
+        key = (user_id, item.booster_id)
+        owned = self.store.user_boosters.get(key, 0)
+        coins = user.balance()
+        if quantity is None:
+            quantity = item.max_affordable(owned, coins)
+        price = item.total_price(owned, quantity)
+        if quantity <= 0 or price > coins:
+            return 0, 0
+        self.store.append_coins(user, user.settle_income(), INCOME)
+        self.store.append_coins(user, -price, SHOP)
+        self.store.user_boosters[key] = owned + quantity
+        if item.booster_type == 1:
+            user.coins_per_msg_bonus += item.bonus_amount * quantity
+        elif item.booster_type == 2:
+            user.coins_per_min_bonus += item.bonus_amount * quantity
+        balance = balance_of(user)
+
+        def update_caches():
+            leaderboards.update_coins([balance])
+            shop_views.invalidate(user_id)
+
+        after_commit(update_caches)
+        return quantity, price
+
+    async def get_shop_view(self, user_id: int) -> Optional[ShopView]:
+        user = self.store.users.get(user_id)
+        if user is None:
+            return None
+        return ShopView(user_id, user.user_nickname, user.user_coins, user.coins_per_min_bonus, user.income_settled_at,
+                        {booster_id: amount for (owner, booster_id), amount in self.store.user_boosters.items()
+                         if owner == user_id})
+
+
+class MemoryGiveawayRepository(GiveawayRepository):
+    def __init__(self, store: MemoryStore):
+        self.store = store
+
+    async def create_giveaway(self, giveaway_type: str, description: str, end_datetime: datetime.datetime,
+                              gifts: list, message_id: int = None) -> int:
+        giveaway_id = next(self.store.ids)
+        self.store.giveaways[giveaway_id] = Giveaway(id=giveaway_id, type=giveaway_type, message_id=message_id,
+                                                     description=description, end_datetime=end_datetime,
+                                                     winners=len(gifts), participant_count=0)
+        self.store.gifts[giveaway_id] = [
+            GiveawayGift(id=next(self.store.ids), giveaway_id=giveaway_id, gift_name=gift['name'],
+                         amount=gift['amount'])
+            for gift in gifts if gift.get('name') and gift.get('amount')]
+        self.store.participants[giveaway_id] = {}
+        return giveaway_id
+
+    async def delete_giveaway(self, giveaway_id: int) -> None:
+        self.store.giveaways.pop(giveaway_id, None)
+        self.store.gifts.pop(giveaway_id, None)
+        self.store.participants.pop(giveaway_id, None)
+
+    async def add_participant(self, user_id: int, giveaway_id: int) -> bool:
+        participants = self.store.participants.setdefault(giveaway_id, {})
+        if user_id in participants:
+            return False
+        participants[user_id] = None
+        giveaway = self.store.giveaways.get(giveaway_id)
+        if giveaway:
+            giveaway.participant_count += 1
+        return True
+
+    async def has_user_participated(self, user_id: int, giveaway_id: int) -> bool:
+        return user_id in self.store.participants.get(giveaway_id, {})
+
+    async def get_participant_count(self, giveaway_id: int) -> int:
+        giveaway = self.store.giveaways.get(giveaway_id)
+        return giveaway.participant_count if giveaway else 0
+
+    async def get_participants(self, giveaway_id: int) -> List[int]:
+        return list(self.store.participants.get(giveaway_id, {}))
+
+    async def set_message_id(self, giveaway_id: int, message_id: int) -> None:
+        giveaway = self.store.giveaways.get(giveaway_id)
+        if giveaway:
+            giveaway.message_id = message_id
+
+    async def get_giveaway_end_datetime(self, giveaway_id: int) -> Optional[float]:
+        giveaway = self.store.giveaways.get(giveaway_id)
+        if giveaway:
+            return giveaway.end_datetime.timestamp()
+
+    async def get_giveaway_message_id(self, giveaway_id: int) -> Optional[int]:
+        giveaway = self.store.giveaways.get(giveaway_id)
+        return giveaway.message_id if giveaway else None
+
+    async def get_all_giveaways(self) -> List[GiveawayRecord]:
+        return [GiveawayRecord(giveaway.id, giveaway.end_datetime, giveaway.message_id)
+                for giveaway in self.store.giveaways.values() if giveaway.ended_at is None]
+
+    def _draw(self, giveaway_id: int, weighted: bool) -> List[Tuple[int, GiveawayGift]]:
+        gifts = self.store.gifts.get(giveaway_id, [])
+        levels = self.store.levels
+        rows = [(user_id, levels[user_id].total_xp if user_id in levels else None)
+                for user_id in self.store.participants.get(giveaway_id, {})]
+        reservoir = new_reservoir(len(gifts), weighted)
+        reservoir.extend(draw_chunk(rows, weighted))
+        return pair_gifts(reservoir.items, gifts)
+
+    async def select_giveaway_winners(self, giveaway_id: int, weighted: bool = False) -> list:
+        if giveaway_id not in self.store.giveaways:
+            return []
+        return winner_dicts(self._draw(giveaway_id, weighted))
+
+    async def end_giveaway(self, giveaway_id: int, weighted: bool = False) -> Optional[GiveawayResult]:
+        giveaway = self.store.giveaways.get(giveaway_id)
+        if giveaway is None or giveaway.ended_at is not None:
+            return None
+        pairs = self._draw(giveaway_id, weighted)
+        for user_id, gift in pairs:
+            gift.winner_id = user_id
+        coins = prize_coins(giveaway.type, pairs)
+        for user_id, amount in coins.items():
+            self.store.append_coins(self.store.users[user_id], amount, GIVEAWAY)
+        giveaway.ended_at = int(time.time())
+
+        def update_caches():
+            leaderboards.add_coins(coins)
+            for user_id in coins:
+                shop_views.invalidate(user_id)
+
+        after_commit(update_caches)
+        return GiveawayResult(giveaway.id, giveaway.type, giveaway.message_id, giveaway.participant_count,
+                              winner_dicts(pairs))
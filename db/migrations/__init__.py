@@ -0,0 +1,99 @@
+"""
+Versioned schema migrations.
+
+Every migration is a module of this package named `vNNN_<description>.py` with an `upgrade(connection)`
+function. The schema version is kept in the `schema_version` table and pending migrations run in order,
+each in its own transaction together with the version bump.
+
+A new database gets the current models and is stamped with the latest version. A database created before
+versioning (tables created by the models at import time) starts at version 0 and runs every migration.
+"""
+import importlib
+import pkgutil
+from types import ModuleType
+from typing import List, Tuple, Optional
+
+from sqlalchemy import inspect, text, Engine, Connection
+
+from config import logger
+
+BONUS_SUM_SQL = "COALESCE((SELECT SUM(ub.amount * b.bonus_amount) FROM users_boosters ub " \
+                "JOIN boosters b ON b.id = ub.booster_id " \
+                "WHERE ub.user_id = users.user_id AND b.booster_type = {booster_type}), 0)"
+
+
+def backfill_bonus_columns(connection: Connection):
+    """Recompute the stored per-message and per-minute bonuses from the boosters every user owns."""
+    connection.execute(text(
+        f"UPDATE users SET coins_per_msg_bonus = {BONUS_SUM_SQL.format(booster_type=1)}, "
+        f"coins_per_min_bonus = {BONUS_SUM_SQL.format(booster_type=2)}"))
+
+
+def load_migrations() -> List[Tuple[int, ModuleType]]:
+    """
+    :return: (version, module) of every migration, ordered by version
+    """
+    migrations = []
+    for module in pkgutil.iter_modules(__path__):
+        if module.name[:1] == 'v' and module.name[1:4].isdigit():
+            migrations.append((int(module.name[1:4]), importlib.import_module(f"{__name__}.{module.name}")))
+    return sorted(migrations, key=lambda migration: migration[0])
+
+
+def get_version(connection: Connection) -> Optional[int]:
+    """
+    :return: schema version, None if the database is not versioned yet
+    """
+    if not inspect(connection).has_table('schema_version'):
+        return None
+    return connection.execute(text("SELECT version FROM schema_version")).scalar()
+
+
+def set_version(connection: Connection, version: int):
+    connection.execute(text("DELETE FROM schema_version"))
+    connection.execute(text("INSERT INTO schema_version (version) VALUES (:version)"), {"version": version})
+
+
+def begin_immediate(connection: Connection):
+    """
+    Start the transaction explicitly. pysqlite does not open one before DDL on its own, and IMMEDIATE takes the
+    write lock up front, so a second process starting at the same time waits instead of migrating twice.
+    """
+    connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def migrate(engine: Engine) -> int:
+    """
+    Bring the database schema to the latest version.
+
+    :return: schema version after migrating
+    """
+    from db.models import Base
+
+    migrations = load_migrations()
+    head = migrations[-1][0] if migrations else 0
+
+    with engine.begin() as connection:
+        begin_immediate(connection)
+        version = get_version(connection)
+        if version is None:
+            fresh = not inspect(connection).has_table('users')
+            connection.execute(text("CREATE TABLE schema_version (version INTEGER NOT NULL)"))
+            # missing tables were created at import time before versioning, keep doing that for the baseline
+            Base.metadata.create_all(connection)
+            version = head if fresh else 0
+            set_version(connection, version)
+            logger.info(f"Database schema stamped at version {version}")
+
+    for migration_version, module in migrations:
+        if migration_version <= version:
+            continue
+        with engine.begin() as connection:
+            begin_immediate(connection)
+            if get_version(connection) >= migration_version:
+                continue
+            module.upgrade(connection)
+            set_version(connection, migration_version)
+        version = migration_version
+        logger.info(f"Migrated database schema to version {version}: {module.__name__.rsplit('.', 1)[-1]}")
+    return version
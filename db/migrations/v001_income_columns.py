@@ -0,0 +1,24 @@
+"""
+Add the passive income columns to the users table.
+
+coins_per_min_bonus is backfilled from the per-minute boosters every user owns and
+income_settled_at starts now, so balances continue from where the minutely job stopped.
+"""
+import time
+
+from sqlalchemy import inspect, text, Connection
+
+from db.migrations import BONUS_SUM_SQL
+
+
+def upgrade(connection: Connection):
+    columns = {column['name'] for column in inspect(connection).get_columns('users')}
+    if {'coins_per_min_bonus', 'income_settled_at'} <= columns:
+        return
+    if 'coins_per_min_bonus' not in columns:
+        connection.execute(text("ALTER TABLE users ADD COLUMN coins_per_min_bonus INTEGER NOT NULL DEFAULT 0"))
+    if 'income_settled_at' not in columns:
+        connection.execute(text("ALTER TABLE users ADD COLUMN income_settled_at INTEGER NOT NULL DEFAULT 0"))
+    connection.execute(text(
+        f"UPDATE users SET coins_per_min_bonus = {BONUS_SUM_SQL.format(booster_type=2)}, "
+        f"income_settled_at = :now"), {"now": int(time.time())})
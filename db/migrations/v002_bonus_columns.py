@@ -0,0 +1,12 @@
+"""Add coins_per_msg_bonus to the users table and backfill both bonus columns."""
+from sqlalchemy import inspect, text, Connection
+
+from db.migrations import backfill_bonus_columns
+
+
+def upgrade(connection: Connection):
+    columns = {column['name'] for column in inspect(connection).get_columns('users')}
+    if 'coins_per_msg_bonus' in columns:
+        return
+    connection.execute(text("ALTER TABLE users ADD COLUMN coins_per_msg_bonus INTEGER NOT NULL DEFAULT 0"))
+    backfill_bonus_columns(connection)
@@ -0,0 +1,34 @@
+"""
+Indexes for the hot queries.
+
+One level row, one row per (user, booster) and one participation per (giveaway, user) become unique.
+Duplicates left by earlier versions are merged first: the oldest row is kept and booster amounts are summed.
+"""
+from sqlalchemy import text, Connection
+
+from db.migrations import backfill_bonus_columns
+
+
+def upgrade(connection: Connection):
+    connection.execute(text(
+        "DELETE FROM users_level WHERE id NOT IN (SELECT MIN(id) FROM users_level GROUP BY user_id)"))
+    connection.execute(text(
+        "UPDATE users_boosters SET amount = (SELECT SUM(d.amount) FROM users_boosters d "
+        "WHERE d.user_id = users_boosters.user_id AND d.booster_id = users_boosters.booster_id) "
+        "WHERE id IN (SELECT MIN(id) FROM users_boosters GROUP BY user_id, booster_id HAVING COUNT(*) > 1)"))
+    connection.execute(text(
+        "DELETE FROM users_boosters WHERE id NOT IN (SELECT MIN(id) FROM users_boosters GROUP BY user_id, booster_id)"))
+    connection.execute(text(
+        "DELETE FROM giveaway_participants WHERE id NOT IN "
+        "(SELECT MIN(id) FROM giveaway_participants GROUP BY giveaway_id, user_id)"))
+    backfill_bonus_columns(connection)
+
+    connection.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_users_level_user_id ON users_level (user_id)"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_users_level_level_xp ON users_level (level, xp)"))
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_boosters_user_booster ON users_boosters (user_id, booster_id)"))
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_giveaway_participants_giveaway_user "
+        "ON giveaway_participants (giveaway_id, user_id)"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_giveaway_gifts_giveaway_id ON giveaway_gifts (giveaway_id)"))
+    connection.execute(text('CREATE INDEX IF NOT EXISTS ix_user_action_user ON user_action ("user")'))
@@ -0,0 +1,53 @@
+"""
+v2 layout of the association tables.
+
+user_action, users_boosters and giveaway_participants lose their surrogate id and become WITHOUT ROWID
+tables keyed by their natural composite key, so a lookup is a single B-tree search. user_action.last_time
+becomes integer epoch seconds instead of a datetime string in local time.
+"""
+from sqlalchemy import inspect, text, Connection
+
+TABLES = {
+    'user_action': (
+        'CREATE TABLE user_action_v2 ('
+        '"user" INTEGER NOT NULL REFERENCES users (user_id), '
+        'action INTEGER NOT NULL REFERENCES action_cooldown (id), '
+        'last_time INTEGER NOT NULL, '
+        'PRIMARY KEY ("user", action)) WITHOUT ROWID',
+        'INSERT INTO user_action_v2 ("user", action, last_time) '
+        'SELECT "user", action, MAX(CAST(strftime(\'%s\', last_time, \'utc\') AS INTEGER)) FROM user_action '
+        'WHERE "user" IS NOT NULL AND action IS NOT NULL GROUP BY "user", action',
+    ),
+    'users_boosters': (
+        'CREATE TABLE users_boosters_v2 ('
+        'user_id INTEGER NOT NULL REFERENCES users (user_id), '
+        'booster_id INTEGER NOT NULL REFERENCES boosters (id), '
+        'amount INTEGER, '
+        'PRIMARY KEY (user_id, booster_id)) WITHOUT ROWID',
+        'INSERT INTO users_boosters_v2 (user_id, booster_id, amount) '
+        'SELECT user_id, booster_id, SUM(amount) FROM users_boosters '
+        'WHERE user_id IS NOT NULL AND booster_id IS NOT NULL GROUP BY user_id, booster_id',
+    ),
+    'giveaway_participants': (
+        'CREATE TABLE giveaway_participants_v2 ('
+        'giveaway_id INTEGER NOT NULL REFERENCES giveaways (id), '
+        'user_id INTEGER NOT NULL REFERENCES users (user_id), '
+        'PRIMARY KEY (giveaway_id, user_id)) WITHOUT ROWID',
+        'INSERT INTO giveaway_participants_v2 (giveaway_id, user_id) '
+        'SELECT DISTINCT giveaway_id, user_id FROM giveaway_participants '
+        'WHERE giveaway_id IS NOT NULL AND user_id IS NOT NULL',
+    ),
+}
+
+
+def upgrade(connection: Connection):
+    for table, (create, copy) in TABLES.items():
+        columns = {column['name'] for column in inspect(connection).get_columns(table)}
+        if 'id' not in columns:
+            continue
+        connection.execute(text(create))
+        connection.execute(text(copy))
+        connection.execute(text(f"DROP TABLE {table}"))
+        connection.execute(text(f"ALTER TABLE {table}_v2 RENAME TO {table}"))
+    # the primary key starts with "user" now
+    connection.execute(text("DROP INDEX IF EXISTS ix_user_action_user"))
@@ -0,0 +1,19 @@
+"""
+Store the total XP of every user.
+
+Levels are derived from it by the level curve, so a grant of any size is a single increment. Existing rows are
+backfilled from level and xp with the closed form of the curve's cumulative thresholds.
+"""
+from sqlalchemy import inspect, text, Connection
+
+THRESHOLD_SQL = "(5 * (level - 1) * level * (2 * level - 1) / 6 + 25 * level * (level - 1) + 100 * level)"
+
+
+def upgrade(connection: Connection):
+    columns = {column['name'] for column in inspect(connection).get_columns('users_level')}
+    if 'total_xp' not in columns:
+        connection.execute(text("ALTER TABLE users_level ADD COLUMN total_xp INTEGER NOT NULL DEFAULT 0"))
+    connection.execute(text("UPDATE users_level SET level = COALESCE(level, 0), xp = COALESCE(xp, 0)"))
+    connection.execute(text(f"UPDATE users_level SET total_xp = {THRESHOLD_SQL} + xp"))
+    connection.execute(text("DROP INDEX IF EXISTS ix_users_level_level_xp"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_users_level_total_xp ON users_level (total_xp)"))
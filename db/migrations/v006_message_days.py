@@ -0,0 +1,11 @@
+"""Rewarded messages per user and day, the source of the weekly leaderboard."""
+from sqlalchemy import text, Connection
+
+
+def upgrade(connection: Connection):
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS user_message_days ("
+        "user_id INTEGER NOT NULL REFERENCES users (user_id), "
+        "day INTEGER NOT NULL, "
+        "messages INTEGER NOT NULL, "
+        "PRIMARY KEY (user_id, day)) WITHOUT ROWID"))
@@ -0,0 +1,36 @@
+"""
+Append-only coin ledger with balance snapshots.
+
+users.user_coins becomes the balance as of the last compaction. The current balances are carried over as one
+opening entry per user, and the first snapshot marks them as already included.
+"""
+import time
+
+from sqlalchemy import text, Connection
+
+
+def upgrade(connection: Connection):
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS coin_ledger ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "user_id INTEGER NOT NULL REFERENCES users (user_id), "
+        "amount INTEGER NOT NULL, "
+        "reason INTEGER NOT NULL, "
+        "created_at INTEGER NOT NULL)"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_coin_ledger_user_id_id ON coin_ledger (user_id, id)"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_coin_ledger_created_at ON coin_ledger (created_at)"))
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS coin_snapshots ("
+        "id INTEGER NOT NULL PRIMARY KEY, "
+        "ledger_id INTEGER NOT NULL, "
+        "users INTEGER NOT NULL, "
+        "created_at INTEGER NOT NULL)"))
+
+    now = int(time.time())
+    connection.execute(text("UPDATE users SET user_coins = COALESCE(user_coins, 0)"))
+    connection.execute(text(
+        "INSERT INTO coin_ledger (user_id, amount, reason, created_at) "
+        "SELECT user_id, user_coins, 0, :now FROM users WHERE user_coins != 0"), {"now": now})
+    connection.execute(text(
+        "INSERT INTO coin_snapshots (ledger_id, users, created_at) "
+        "SELECT COALESCE(MAX(id), 0), COUNT(*), :now FROM coin_ledger"), {"now": now})
@@ -0,0 +1,12 @@
+"""Store the participant count of every giveaway on the giveaway itself."""
+from sqlalchemy import inspect, text, Connection
+
+
+def upgrade(connection: Connection):
+    columns = {column['name'] for column in inspect(connection).get_columns('giveaways')}
+    if 'participant_count' in columns:
+        return
+    connection.execute(text("ALTER TABLE giveaways ADD COLUMN participant_count INTEGER NOT NULL DEFAULT 0"))
+    connection.execute(text(
+        "UPDATE giveaways SET participant_count = "
+        "(SELECT COUNT(*) FROM giveaway_participants p WHERE p.giveaway_id = giveaways.id)"))
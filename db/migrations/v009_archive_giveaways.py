@@ -0,0 +1,15 @@
+"""
+Keep ended giveaways as archive: the end time on the giveaway and the winner on every gift, instead of deleting them.
+"""
+from sqlalchemy import inspect, text, Connection
+
+
+def upgrade(connection: Connection):
+    columns = {column['name'] for column in inspect(connection).get_columns('giveaways')}
+    if 'ended_at' not in columns:
+        connection.execute(text("ALTER TABLE giveaways ADD COLUMN ended_at INTEGER"))
+    columns = {column['name'] for column in inspect(connection).get_columns('giveaway_gifts')}
+    if 'winner_id' not in columns:
+        connection.execute(text("ALTER TABLE giveaway_gifts ADD COLUMN winner_id INTEGER REFERENCES users (user_id)"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_giveaways_active ON giveaways (id) WHERE ended_at IS NULL"))
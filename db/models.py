@@ -1,39 +1,62 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint
+import time
+
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import declarative_base, relationship
 from config import COINS_PER_MSG
-
-from db.database import engine
+from modules.level_curve import level_for
 
 Base = declarative_base()
 
 
+def accrued_income(coins_per_min: int, settled_at: int, now: int = None) -> int:
+    """Passive income earned since `settled_at`, in whole minutes."""
+    now = now if now is not None else int(time.time())
+    return coins_per_min * max((now - settled_at) // 60, 0)
+
+
 class User(Base):
     __tablename__ = "users"
 
     user_id = Column(Integer, primary_key=True)
     user_name = Column(String, unique=True, nullable=True)
     user_nickname = Column(String, unique=True, nullable=False)
-    user_coins = Column(Integer, default=0)
+    user_coins = Column(Integer, default=0)  # balance as of the last coin ledger compaction, see db/ledger.py
+    coins_per_msg_bonus = Column(Integer, default=0, nullable=False)
+    coins_per_min_bonus = Column(Integer, default=0, nullable=False)
+    income_settled_at = Column(Integer, default=lambda: int(time.time()), nullable=False)
 
     boosters = relationship("UserBooster", back_populates="user",cascade="all, delete-orphan")
     user_level = relationship("UserLevel", back_populates="user", cascade="all, delete-orphan")
     giveaway_participants = relationship("GiveawayParticipant", backref="user", cascade="all, delete-orphan")
+    message_days = relationship("UserMessageDay", cascade="all, delete-orphan")
+    coin_ledger = relationship("CoinLedgerEntry", cascade="all, delete-orphan")
 
-    @property
+    @hybrid_property
     def user_coins_per_msg(self):
-        amount = COINS_PER_MSG
-        for booster in self.boosters:
-            if booster.booster_id in (1, 2):
-                amount += booster.total_bonus
-        return amount
+        return COINS_PER_MSG + self.coins_per_msg_bonus
 
-    @property
+    @hybrid_property
     def user_coins_per_min(self):
-        amount = 0
-        for booster in self.boosters:
-            if booster.booster_id in (3, 4, 5):
-                amount += booster.total_bonus
-        return amount
+        return self.coins_per_min_bonus
+
+    def accrued_coins(self, now: int = None) -> int:
+        """Passive income earned since the last settlement, in whole minutes."""
+        return accrued_income(self.coins_per_min_bonus, self.income_settled_at, now)
+
+    def balance(self, now: int = None) -> int:
+        return self.user_coins + self.accrued_coins(now)
+
+    def settle_income(self, now: int = None) -> int:
+        """
+        Close the whole minutes of passive income accrued so far.
+
+        :return: coins accrued, for the caller to credit to the coin ledger
+        """
+        now = now if now is not None else int(time.time())
+        minutes = max((now - self.income_settled_at) // 60, 0)
+        self.income_settled_at += minutes * 60
+        return self.coins_per_min_bonus * minutes
 
 
 class Booster(Base):
@@ -49,14 +72,15 @@ class Booster(Base):
 class UserBooster(Base):
     __tablename__ = "users_boosters"
 
-    id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('users.user_id'))
-    booster_id = Column(Integer, ForeignKey('boosters.id'))
+    user_id = Column(Integer, ForeignKey('users.user_id'), primary_key=True)
+    booster_id = Column(Integer, ForeignKey('boosters.id'), primary_key=True)
     amount = Column(Integer)
 
     booster = relationship("Booster")
     user = relationship("User", back_populates="boosters")
 
+    __table_args__ = {'sqlite_with_rowid': False}
+
     @property
     def total_bonus(self):
         return self.amount * self.booster.bonus_amount
@@ -70,12 +94,22 @@ class UserLevel(Base):
     level = Column(Integer, default=0)
     xp = Column(Integer, default=0)
     xp_needed = Column(Integer, default=100)
+    total_xp = Column(Integer, default=0, nullable=False)
     user = relationship("User", back_populates="user_level")
 
+    __table_args__ = (
+        Index('ix_users_level_user_id', 'user_id', unique=True),
+        Index('ix_users_level_total_xp', 'total_xp'),
+    )
+
     @property
     def total_bonus(self):
         return self.amount * self.booster.bonus_amount
 
+    def add_xp(self, amount):
+        self.total_xp = max((self.total_xp or 0) + amount, 0)
+        self.level, self.xp, self.xp_needed = level_for(self.total_xp)
+
 
 class ActionCooldown(Base):
     __tablename__ = "action_cooldown"
@@ -87,12 +121,46 @@ class ActionCooldown(Base):
 class UserAction(Base):
     __tablename__ = "user_action"
 
+    user = Column(Integer, ForeignKey('users.user_id'), primary_key=True)
+    action = Column(Integer, ForeignKey('action_cooldown.id'), primary_key=True)
+    last_time = Column(Integer, nullable=False)  # epoch seconds
+
+    __table_args__ = {'sqlite_with_rowid': False}
+
+
+class UserMessageDay(Base):
+    __tablename__ = "user_message_days"
+
+    user_id = Column(Integer, ForeignKey('users.user_id'), primary_key=True)
+    day = Column(Integer, primary_key=True)  # days since the epoch, UTC
+    messages = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = {'sqlite_with_rowid': False}
+
+
+class CoinLedgerEntry(Base):
+    __tablename__ = "coin_ledger"
+
     id = Column(Integer, primary_key=True)
-    action = Column(Integer, ForeignKey('action_cooldown.id'))
-    user = Column(Integer, ForeignKey('users.user_id'))
-    last_time = Column(DateTime, nullable=False)
+    user_id = Column(Integer, ForeignKey('users.user_id'), nullable=False)
+    amount = Column(Integer, nullable=False)  # credits are positive, debits negative
+    reason = Column(Integer, nullable=False)  # see db/ledger.py
+    created_at = Column(Integer, nullable=False)  # epoch seconds
+
+    __table_args__ = (
+        Index('ix_coin_ledger_user_id_id', 'user_id', 'id'),
+        Index('ix_coin_ledger_created_at', 'created_at'),
+        {'sqlite_autoincrement': True},
+    )
 
-    __table_args__ = (UniqueConstraint('action', 'user'),)
+
+class CoinSnapshot(Base):
+    __tablename__ = "coin_snapshots"
+
+    id = Column(Integer, primary_key=True)
+    ledger_id = Column(Integer, nullable=False)  # last coin_ledger entry included in users.user_coins
+    users = Column(Integer, nullable=False)  # balances updated by the compaction
+    created_at = Column(Integer, nullable=False)
 
 
 class Notification(Base):
@@ -113,15 +181,19 @@ class Giveaway(Base):
     end_datetime = Column(DateTime)
     winners = Column(Integer)
     message_id = Column(Integer, nullable=True)
+    participant_count = Column(Integer, default=0, nullable=False)
+    ended_at = Column(Integer, nullable=True)  # set when the winners are drawn, ended giveaways are kept as archive
     gifts = relationship("GiveawayGift", back_populates="giveaway")
 
+    __table_args__ = (Index('ix_giveaways_active', 'id', sqlite_where=ended_at.is_(None)),)
+
 
 class GiveawayParticipant(Base):
     __tablename__ = 'giveaway_participants'
-    id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('users.user_id'))
+    giveaway_id = Column(Integer, ForeignKey('giveaways.id'), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.user_id'), primary_key=True)
 
-    giveaway_id = Column(Integer, ForeignKey('giveaways.id'))
+    __table_args__ = {'sqlite_with_rowid': False}
 
 
 class GiveawayGift(Base):
@@ -130,7 +202,7 @@ class GiveawayGift(Base):
     giveaway_id = Column(Integer, ForeignKey('giveaways.id'))
     gift_name = Column(String)
     amount = Column(Integer)
+    winner_id = Column(Integer, ForeignKey('users.user_id'), nullable=True)
     giveaway = relationship("Giveaway", back_populates="gifts")
 
-
-Base.metadata.create_all(engine)
+    __table_args__ = (Index('ix_giveaway_gifts_giveaway_id', 'giveaway_id'),)
@@ -0,0 +1,105 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from config import logger, GIVEAWAY_EDIT_INTERVAL
+from db.repository import repo
+from db.unit_of_work import after_commit
+
+
+class ActiveGiveaway:
+    __slots__ = ('end', 'participants', 'edit', 'edit_task', 'edited_at')
+
+    def __init__(self, end: float, participants: Set[int]):
+        self.end = end
+        self.participants = participants
+        self.edit: Optional[Callable[[int], Awaitable]] = None
+        self.edit_task: Optional[asyncio.Task] = None
+        self.edited_at = float('-inf')
+
+
+class GiveawayParticipation:
+    """
+    Participants of the running giveaways, kept in memory.
+
+    A giveaway is loaded on its first "Participate" tap, so a repeated tap or a tap after the end is answered
+    without a query and a new participant costs one insert. A participant is only remembered once that insert is
+    committed, so an update that is rolled back doesn't leave them counted but missing from the draw.
+
+    The participant counter on the giveaway message is edited at most once every `edit_interval` seconds: the first
+    tap after a quiet period edits right away, the taps that follow within the interval are coalesced into one edit
+    showing the count at the end of it.
+    """
+
+    def __init__(self, edit_interval: float = GIVEAWAY_EDIT_INTERVAL, clock: Callable[[], float] = time.monotonic):
+        self.edit_interval = edit_interval
+        self.clock = clock
+        self._giveaways: Dict[int, ActiveGiveaway] = {}
+
+    def __contains__(self, giveaway_id: int) -> bool:
+        return giveaway_id in self._giveaways
+
+    async def _get(self, giveaway_id: int) -> Optional[ActiveGiveaway]:
+        active = self._giveaways.get(giveaway_id)
+        if active is not None:
+            return active
+        end = await repo.giveaways.get_giveaway_end_datetime(giveaway_id)
+        if end is None:
+            return None
+        participants = set(await repo.giveaways.get_participants(giveaway_id))
+        # a concurrent tap may have loaded it in the meantime
+        return self._giveaways.setdefault(giveaway_id, ActiveGiveaway(end, participants))
+
+    def count(self, giveaway_id: int) -> int:
+        active = self._giveaways.get(giveaway_id)
+        return len(active.participants) if active else 0
+
+    async def join(self, user_id: int, giveaway_id: int, now: float = None) -> Optional[bool]:
+        """
+        :param now: epoch seconds, to compare with the end of the giveaway
+        :return: whether the user joined now (False if they had already), None if the giveaway has ended or
+            doesn't exist
+        """
+        active = await self._get(giveaway_id)
+        now = now if now is not None else time.time()
+        if active is None or now > active.end:
+            return None
+        if user_id in active.participants:
+            return False
+        # False if a concurrent tap of the same user has stored them already
+        joined = await repo.giveaways.add_participant(user_id, giveaway_id)
+        after_commit(lambda: active.participants.add(user_id))
+        return joined
+
+    def request_edit(self, giveaway_id: int, edit: Callable[[int], Awaitable]) -> None:
+        """Show the participant count with `edit(count)` once the edit interval of the giveaway allows."""
+        active = self._giveaways.get(giveaway_id)
+        if active is None:
+            return
+        active.edit = edit
+        if active.edit_task is None:
+            active.edit_task = asyncio.create_task(self._edit(active))
+
+    async def _edit(self, active: ActiveGiveaway) -> None:
+        delay = active.edited_at + self.edit_interval - self.clock()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        active.edited_at = self.clock()
+        active.edit_task = None
+        try:
+            await active.edit(len(active.participants))
+        except Exception as e:
+            logger.error(f"Failed to edit the participant count: {e}")
+
+    def forget(self, giveaway_id: int) -> None:
+        """Drop an ended giveaway together with its pending counter edit."""
+        active = self._giveaways.pop(giveaway_id, None)
+        if active is not None and active.edit_task is not None:
+            active.edit_task.cancel()
+
+    def clear(self) -> None:
+        for giveaway_id in list(self._giveaways):
+            self.forget(giveaway_id)
+
+
+participation = GiveawayParticipation()
@@ -0,0 +1,110 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from telegram.helpers import mention_html, mention_markdown
+
+from config import PROFILE_CACHE_SIZE
+from db.records import Record, UserProfile
+from db.repository import repo
+
+
+class CachedProfile(Record):
+    __slots__ = ('user_id', 'user_name', 'user_nickname', 'mention_html', 'mention_markdown')
+
+    user_id: int
+    user_name: Optional[str]
+    user_nickname: str
+    mention_html: str
+    mention_markdown: str  # MarkdownV2
+
+
+class ProfileCache:
+    """
+    Bounded LRU cache of user names with their mentions rendered once.
+
+    A miss loads the profile from the repository. Usernames are indexed for the cached profiles, so resolving
+    an @username only goes to the database for users that are not cached.
+    """
+
+    def __init__(self, max_entries: int = PROFILE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._profiles: OrderedDict[int, CachedProfile] = OrderedDict()
+        self._ids_by_username: Dict[str, int] = {}
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._profiles
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def remember(self, profile: UserProfile) -> CachedProfile:
+        self.invalidate(profile.user_id)
+        cached = CachedProfile(profile.user_id, profile.user_name, profile.user_nickname,
+                               mention_html(profile.user_id, profile.user_nickname),
+                               mention_markdown(profile.user_id, profile.user_nickname, version=2))
+        self._profiles[profile.user_id] = cached
+        if profile.user_name:
+            self._ids_by_username[profile.user_name] = profile.user_id
+        while len(self._profiles) > self.max_entries:
+            self._forget(self._profiles.popitem(last=False)[1])
+        return cached
+
+    def invalidate(self, user_id: int) -> None:
+        cached = self._profiles.pop(user_id, None)
+        if cached:
+            self._forget(cached)
+
+    def clear(self) -> None:
+        self._profiles.clear()
+        self._ids_by_username.clear()
+
+    def _forget(self, cached: CachedProfile) -> None:
+        if cached.user_name and self._ids_by_username.get(cached.user_name) == cached.user_id:
+            del self._ids_by_username[cached.user_name]
+
+    async def get(self, user_id: int) -> Optional[CachedProfile]:
+        cached = self._profiles.get(user_id)
+        if cached is not None:
+            self._profiles.move_to_end(user_id)
+            return cached
+        profile = await repo.users.get_user_by_id(user_id)
+        return self.remember(profile) if profile else None
+
+    async def get_many(self, user_ids: Iterable[int]) -> Dict[int, CachedProfile]:
+        """Profiles of the users that exist, with the misses loaded in one query."""
+        found, missing = {}, []
+        for user_id in user_ids:
+            cached = self._profiles.get(user_id)
+            if cached is not None:
+                self._profiles.move_to_end(user_id)
+                found[user_id] = cached
+            else:
+                missing.append(user_id)
+        if missing:
+            for profile in await repo.users.get_profiles(missing):
+                found[profile.user_id] = self.remember(profile)
+        return found
+
+    async def get_user_id_by_username(self, user_name: str) -> Optional[int]:
+        user_id = self._ids_by_username.get(user_name)
+        if user_id is not None:
+            self._profiles.move_to_end(user_id)
+            return user_id
+        user_id = await repo.users.get_user_id_by_username(user_name)
+        if user_id is not None:
+            await self.get(user_id)
+        return user_id
+
+    async def refresh(self, user_id: int, user_name: Optional[str], user_nickname: str) -> None:
+        """
+        Store the names Telegram currently reports for a cached user if they have changed since.
+        Users that are not cached are loaded with their stored names on their next lookup anyway.
+        """
+        cached = self._profiles.get(user_id)
+        if cached is None or (cached.user_name, cached.user_nickname) == (user_name, user_nickname):
+            return
+        self.invalidate(user_id)
+        await repo.users.update_user_names(user_id, user_name, user_nickname)
+
+
+profiles = ProfileCache()
@@ -0,0 +1,85 @@
+"""
+Read-only records returned by the read paths.
+
+They hold only the columns a caller needs, are built straight from column-level query rows and have no session,
+identity map or lazy relationships behind them.
+"""
+import datetime
+from typing import Optional, Dict, List
+
+from db.models import accrued_income
+
+
+class Record:
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, name) == getattr(other, name)
+                                                 for name in self.__slots__)
+
+    def __repr__(self):
+        values = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+
+class UserProfile(Record):
+    __slots__ = ('user_id', 'user_name', 'user_nickname')
+
+    user_id: int
+    user_name: Optional[str]
+    user_nickname: str
+
+
+class LeaderboardEntry(Record):
+    __slots__ = ('user_id', 'user_nickname', 'level', 'xp')
+
+    user_id: int
+    user_nickname: str
+    level: int
+    xp: int
+
+
+class GiveawayRecord(Record):
+    __slots__ = ('id', 'end_datetime', 'message_id')
+
+    id: int
+    end_datetime: datetime.datetime
+    message_id: Optional[int]
+
+
+class GiveawayResult(Record):
+    __slots__ = ('id', 'type', 'message_id', 'participant_count', 'winners')
+
+    id: int
+    type: str
+    message_id: Optional[int]
+    participant_count: int
+    winners: List[Dict]  # {"winner": user_id, "gift": {"name": ..., "amount": ...}} per gift handed out
+
+
+class ShopView(Record):
+    __slots__ = ('user_id', 'user_nickname', 'user_coins', 'coins_per_min', 'income_settled_at', 'boosters')
+
+    user_id: int
+    user_nickname: str
+    user_coins: int
+    coins_per_min: int
+    income_settled_at: int
+    boosters: Dict[int, int]  # booster_id -> amount owned
+
+    def balance(self, now: int = None) -> int:
+        return self.user_coins + accrued_income(self.coins_per_min, self.income_settled_at, now)
+
+
+class LedgerEntry(Record):
+    __slots__ = ('id', 'user_id', 'amount', 'reason', 'created_at')
+
+    id: int
+    user_id: int
+    amount: int
+    reason: int
+    created_at: int
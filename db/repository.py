@@ -0,0 +1,220 @@
+"""
+Storage-agnostic repository interfaces.
+
+Handlers, background tasks and giveaway threads go through the `repo` registry instead of a concrete backend.
+The SQLAlchemy backend is the async CRUD layer in db/async_crud.py, the in-memory backend lives in db/memory.py.
+The backend is picked at startup with `repo.use()`.
+"""
+import datetime
+from abc import ABC, abstractmethod
+from typing import List, Tuple, Dict, Optional
+
+from db.records import UserProfile, LeaderboardEntry, GiveawayRecord, GiveawayResult, ShopView, LedgerEntry
+
+
+class UserRepository(ABC):
+    @abstractmethod
+    async def create_user(self, user_id: int, user_name: str = '', user_nickname: str = '') -> None: ...
+
+    @abstractmethod
+    async def delete_user(self, user_id: int) -> None: ...
+
+    @abstractmethod
+    async def get_user_by_id(self, user_id: int) -> Optional[UserProfile]: ...
+
+    @abstractmethod
+    async def get_user_id_by_username(self, user_name: str) -> Optional[int]: ...
+
+    @abstractmethod
+    async def check_user_exists(self, user_id: int) -> bool: ...
+
+    @abstractmethod
+    async def get_all_user_ids(self) -> List[int]: ...
+
+    @abstractmethod
+    async def get_profiles(self, user_ids: List[int]) -> List[UserProfile]: ...
+
+    @abstractmethod
+    async def update_user_names(self, user_id: int, user_name: Optional[str], user_nickname: str) -> bool: ...
+
+    @abstractmethod
+    async def get_balances(self) -> List[Tuple[int, int, int, int]]: ...
+
+    @abstractmethod
+    async def get_message_counts(self, since_day: int) -> List[Tuple[int, int, int]]: ...
+
+    @abstractmethod
+    async def delete_message_counts_before(self, day: int) -> None: ...
+
+    @abstractmethod
+    async def apply_message_rewards(self, events: List[Tuple[int, float]]) -> int: ...
+
+    @abstractmethod
+    async def get_user_balance(self, user_id: int) -> int: ...
+
+    @abstractmethod
+    async def add_coins(self, user_id: int, amount: int, reason: int) -> None: ...
+
+    @abstractmethod
+    async def get_boosters_amount(self, user_id: int) -> Tuple[int, int]: ...
+
+    @abstractmethod
+    async def debit_coins(self, user_id: int, n: int, reason: int) -> Optional[int]: ...
+
+    @abstractmethod
+    async def get_coin_history(self, user_id: int, limit: int = 20, before_id: int = None) -> List[LedgerEntry]: ...
+
+    @abstractmethod
+    async def get_coin_ledger(self, since: int, until: int) -> List[LedgerEntry]: ...
+
+    @abstractmethod
+    async def compact_ledger(self) -> int: ...
+
+
+class UserActionRepository(ABC):
+    @abstractmethod
+    async def update_action_time(self, user_id: int, action_id: int) -> None: ...
+
+    @abstractmethod
+    async def get_last_action(self, user_id: int, action_id: int) -> int: ...
+
+    @abstractmethod
+    async def save_last_actions(self, last_actions: Dict[Tuple[int, int], float]) -> None: ...
+
+
+class UserLevelRepository(ABC):
+    @abstractmethod
+    async def create_level(self, user_id: int) -> None: ...
+
+    @abstractmethod
+    async def get_level(self, user_id: int): ...
+
+    @abstractmethod
+    async def update_level(self, user_id: int, new_level: int, new_xp: int, new_xp_needed: int) -> None: ...
+
+    @abstractmethod
+    async def get_total_xp(self) -> List[Tuple[int, int]]: ...
+
+    @abstractmethod
+    async def grant_xp(self, grants: Dict[int, int]) -> Dict[int, Tuple[int, int, int]]: ...
+
+    @abstractmethod
+    async def get_top_users(self) -> List[LeaderboardEntry]: ...
+
+
+class UsersBoostersRepository(ABC):
+    @abstractmethod
+    async def get_booster_count(self, user_id: int, booster_id: int) -> int: ...
+
+    @abstractmethod
+    async def increment_or_create(self, user_id: int, booster_id: int) -> None: ...
+
+    @abstractmethod
+    async def buy_boosters(self, user_id: int, item, quantity: Optional[int] = None) -> Tuple[int, int]: ...
+
+    @abstractmethod
+    async def get_shop_view(self, user_id: int) -> Optional[ShopView]: ...
+
+
+class GiveawayRepository(ABC):
+    @abstractmethod
+    async def create_giveaway(self, giveaway_type: str, description: str, end_datetime: datetime.datetime,
+                              gifts: list, message_id: int = None) -> int: ...
+
+    @abstractmethod
+    async def delete_giveaway(self, giveaway_id: int) -> None: ...
+
+    @abstractmethod
+    async def add_participant(self, user_id: int, giveaway_id: int) -> bool: ...
+
+    @abstractmethod
+    async def has_user_participated(self, user_id: int, giveaway_id: int) -> bool: ...
+
+    @abstractmethod
+    async def get_participant_count(self, giveaway_id: int) -> int: ...
+
+    @abstractmethod
+    async def get_participants(self, giveaway_id: int) -> List[int]: ...
+
+    @abstractmethod
+    async def set_message_id(self, giveaway_id: int, message_id: int) -> None: ...
+
+    @abstractmethod
+    async def get_giveaway_end_datetime(self, giveaway_id: int) -> Optional[float]: ...
+
+    @abstractmethod
+    async def get_giveaway_message_id(self, giveaway_id: int) -> Optional[int]: ...
+
+    @abstractmethod
+    async def get_all_giveaways(self) -> List[GiveawayRecord]: ...
+
+    @abstractmethod
+    async def select_giveaway_winners(self, giveaway_id: int, weighted: bool = False) -> list: ...
+
+    @abstractmethod
+    async def end_giveaway(self, giveaway_id: int, weighted: bool = False) -> Optional[GiveawayResult]: ...
+
+
+class Repositories:
+    """Registry of the active backend. The SQLAlchemy backend is bound on first use if none was selected."""
+
+    users: UserRepository
+    actions: UserActionRepository
+    levels: UserLevelRepository
+    boosters: UsersBoostersRepository
+    giveaways: GiveawayRepository
+
+    def __init__(self):
+        self.backend = None
+
+    def __getattr__(self, name):
+        if name in ('users', 'actions', 'levels', 'boosters', 'giveaways') and self.backend is None:
+            self.use_sqlalchemy()
+            return getattr(self, name)
+        raise AttributeError(name)
+
+    def use_sqlalchemy(self) -> None:
+        from db.async_crud import AsyncUserCRUD, AsyncUserActionCRUD, AsyncUserLevelCRUD, AsyncUsersBoostersCRUD, \
+            AsyncGiveawayCRUD
+
+        self.backend = 'sqlalchemy'
+        self.users = AsyncUserCRUD()
+        self.actions = AsyncUserActionCRUD()
+        self.levels = AsyncUserLevelCRUD()
+        self.boosters = AsyncUsersBoostersCRUD()
+        self.giveaways = AsyncGiveawayCRUD()
+
+    def use_memory(self, store=None) -> None:
+        """
+        :param store: MemoryStore to serve, a new empty one by default
+        """
+        from db.memory import MemoryStore, MemoryUserRepository, MemoryUserActionRepository, \
+            MemoryUserLevelRepository, MemoryUsersBoostersRepository, MemoryGiveawayRepository
+
+        store = store if store is not None else MemoryStore()
+        self.backend = 'memory'
+        self.users = MemoryUserRepository(store)
+        self.actions = MemoryUserActionRepository(store)
+        self.levels = MemoryUserLevelRepository(store)
+        self.boosters = MemoryUsersBoostersRepository(store)
+        self.giveaways = MemoryGiveawayRepository(store)
+
+    def use(self, backend: str, boosters: list = None) -> None:
+        """
+        Select and prepare a backend.
+
+        :param backend: 'sqlalchemy' (migrates the database) or 'memory'
+        :param boosters: booster catalogue
+        """
+        if backend == 'memory':
+            from db.memory import MemoryStore
+            self.use_memory(MemoryStore(boosters))
+        elif backend == 'sqlalchemy':
+            from db.crud import setup_database
+            setup_database(boosters)
+            self.use_sqlalchemy()
+        else:
+            raise ValueError(f"Unknown storage backend: {backend}")
+
+
+repo = Repositories()
@@ -0,0 +1,72 @@
+import asyncio
+import time
+from typing import List, Tuple, Optional
+
+from config import logger, REWARD_FLUSH_INTERVAL_MS, REWARD_FLUSH_SIZE
+from db.repository import repo
+
+
+class RewardPipeline:
+    """
+    Write-behind buffer for per-message rewards.
+
+    Handlers only enqueue (user_id, timestamp) events. A background task applies coins and XP/level-ups
+    for all pending users in one transaction every `flush_interval_ms` or as soon as `flush_size` events
+    are pending.
+    """
+
+    def __init__(self, flush_interval_ms: int = REWARD_FLUSH_INTERVAL_MS, flush_size: int = REWARD_FLUSH_SIZE):
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_size = flush_size
+        self._events: List[Tuple[int, float]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+
+    def put(self, user_id: int, timestamp: float = None) -> None:
+        self._events.append((user_id, timestamp if timestamp is not None else time.time()))
+        if len(self._events) >= self.flush_size and self._wakeup:
+            self._wakeup.set()
+
+    def pending(self) -> int:
+        return len(self._events)
+
+    async def flush(self) -> int:
+        """
+        Apply all pending events. Events are put back on failure so no reward is lost.
+
+        :return: number of flushed events
+        """
+        if not self._events:
+            return 0
+        events, self._events = self._events, []
+        try:
+            await repo.users.apply_message_rewards(events)
+        except Exception as e:
+            logger.error(f"Reward flush failed: {e}")
+            self._events = events + self._events
+            return 0
+        return len(events)
+
+    def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._running = True
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task without interrupting a flush in progress and flush what is left."""
+        if self._task:
+            self._running = False
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while self._running:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
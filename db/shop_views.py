@@ -0,0 +1,66 @@
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple, TypeVar
+
+from config import SHOP_CACHE_SIZE
+from db.records import ShopView
+from db.repository import repo
+
+T = TypeVar('T')
+
+
+class ShopViewCache:
+    """
+    Bounded LRU cache of the rendered shop of every user.
+
+    An entry keeps the view it was rendered from and the balance it shows. The CRUD layer drops the entry of a user
+    after every commit that changes their coins, boosters or names. Passive income grows the balance without writes,
+    so an entry showing an outdated balance is rendered again from its stored view, without a query.
+    """
+
+    def __init__(self, max_entries: int = SHOP_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[int, Tuple[ShopView, int, object]] = OrderedDict()
+        self._invalidations = 0
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def invalidate(self, user_id: int) -> None:
+        self._entries.pop(user_id, None)
+        self._invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._invalidations += 1
+
+    async def get(self, user_id: int, render: Callable[[ShopView, int], T], now: int = None) -> Optional[T]:
+        """
+        :param render: builds the shop from a view and the current balance
+        :return: the rendered shop, None if the user does not exist
+        """
+        entry = self._entries.get(user_id)
+        invalidations = self._invalidations
+        if entry is not None:
+            self._entries.move_to_end(user_id)
+            view, shown_balance, rendered = entry
+        else:
+            view = await repo.boosters.get_shop_view(user_id)
+            if view is None:
+                return None
+
+        balance = view.balance(now)
+        if entry is not None and balance == shown_balance:
+            return rendered
+        rendered = render(view, balance)
+        # a commit made while the view was loading may have outdated it already
+        if invalidations == self._invalidations:
+            self._entries[user_id] = (view, balance, rendered)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return rendered
+
+
+shop_views = ShopViewCache()
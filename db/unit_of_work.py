@@ -0,0 +1,132 @@
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional, AsyncIterator, Callable, List
+
+from sqlalchemy.ext.asyncio import AsyncSession as AsyncSessionType
+
+from config import logger
+from db.database import AsyncSession
+
+
+class UnitOfWork:
+    """
+    One session shared by every CRUD call made while handling an update. Its transaction is committed before the
+    update waits on the network (see `commit()`) and at the end of the update, so SQLite's write lock is never held
+    across a Bot API round-trip.
+    """
+
+    def __init__(self, session: AsyncSessionType):
+        self.session = session
+        self.calls = 0
+        self.after_commit: List[Callable[[], None]] = []
+
+    async def commit(self) -> None:
+        """Commit what the update has done so far and run its after_commit callbacks."""
+        if self.session.in_transaction():
+            await self.session.commit()
+            stats.commits += 1
+        callbacks, self.after_commit = self.after_commit, []
+        for callback in callbacks:
+            callback()
+
+    async def rollback(self) -> None:
+        """Drop what the update has done since its last commit, along with its after_commit callbacks."""
+        await self.session.rollback()
+        self.after_commit = []
+
+
+class UnitOfWorkStats:
+    """Process-wide counters of database sessions and commits."""
+
+    def __init__(self):
+        self.units = 0
+        self.sessions = 0
+        self.commits = 0
+
+    def reset(self) -> None:
+        self.units = self.sessions = self.commits = 0
+
+
+current_unit: ContextVar[Optional[UnitOfWork]] = ContextVar('current_unit', default=None)
+stats = UnitOfWorkStats()
+
+
+@asynccontextmanager
+async def unit_of_work(name: str = 'update') -> AsyncIterator[UnitOfWork]:
+    """
+    Open a session for everything awaited inside the block and commit at the end. If the block raises, the
+    uncommitted changes are rolled back and their after_commit callbacks dropped. Nested units reuse the outer one.
+    """
+    unit = current_unit.get()
+    if unit is not None:
+        yield unit
+        return
+
+    sessions, commits = stats.sessions, stats.commits
+    async with AsyncSession() as session:
+        unit = UnitOfWork(session)
+        token = current_unit.set(unit)
+        stats.units += 1
+        stats.sessions += 1
+        try:
+            yield unit
+            await unit.commit()
+        except BaseException:
+            await unit.rollback()
+            raise
+        finally:
+            current_unit.reset(token)
+    if unit.calls:
+        logger.debug(f"{name}: {unit.calls} CRUD calls, {stats.sessions - sessions} sessions, "
+                     f"{stats.commits - commits} commits")
+
+
+@asynccontextmanager
+async def session_scope() -> AsyncIterator[AsyncSessionType]:
+    """
+    Session for one CRUD call: the current unit of work, or a short-lived session and transaction
+    when the call is made outside of an update (startup, background tasks, scripts).
+    """
+    unit = current_unit.get()
+    if unit is not None:
+        unit.calls += 1
+        yield unit.session
+        return
+
+    async with AsyncSession() as session:
+        stats.sessions += 1
+        async with session.begin():
+            yield session
+        stats.commits += 1
+
+
+async def commit() -> None:
+    """
+    Commit the current unit of work, if any, before waiting on something slow such as the network. Later CRUD
+    calls of the update start a new transaction on the same session.
+    """
+    unit = current_unit.get()
+    if unit is not None:
+        await unit.commit()
+
+
+async def rollback() -> None:
+    """
+    Roll back the current unit of work, if any, where an exception is caught before it can leave the unit (see
+    UnitOfWorkApplication.process_error). Later CRUD calls of the update start a new transaction.
+    """
+    unit = current_unit.get()
+    if unit is not None:
+        await unit.rollback()
+
+
+def after_commit(callback: Callable[[], None]) -> None:
+    """
+    Run `callback` once the data it reflects is committed: at the end of the current unit of work, or right away
+    outside of one. Call it after the session_scope() block that made the change.
+    """
+    unit = current_unit.get()
+    if unit is not None:
+        unit.after_commit.append(callback)
+    else:
+        callback()
@@ -1,12 +1,11 @@
 import asyncio
-import datetime
+import functools
 import random
 import threading
-import time
 
 from typing import Tuple, Optional
 
-from telegram import Update, User, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto, ChatMember, \
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto, ChatMember, \
     ChatMemberUpdated
 from telegram.constants import ParseMode
 from telegram.ext import Application, CommandHandler, CallbackContext, MessageHandler, filters, ConversationHandler, \
@@ -14,16 +13,31 @@ from telegram.ext import Application, CommandHandler, CallbackContext, MessageHa
 from telegram.helpers import escape_markdown
 
 from config import TELEGRAM_TOKEN, TELEGRAM_CHAT, logger, ANIME_PRICE, MSG_CD, WHO_CD, BALL8_CD, PICK_CD, RATING_CD, \
-    ANIME_CD, min_bet, ADMINS, max_giveaway_coins, min_giveaway_coins, IMG_CD, IMG_PRICE
-from db.crud import setup_database, UserCRUD, UserActionCRUD, UserLevelCRUD, UsersBoostersCRUD, GiveawayCRUD
+    ANIME_CD, min_bet, ADMINS, max_giveaway_coins, min_giveaway_coins, IMG_CD, IMG_PRICE, STORAGE_BACKEND, \
+    CONCURRENT_UPDATES, giveaway_weighted_by_level
+from db import ledger
+from db.cooldowns import cooldowns
+from db.ledger import ledger_compactor
+from db.repository import repo
+from db.crud import read_boosters
+from db.leaderboards import leaderboards, BOARDS
+from db.members import members
+from db.participation import participation
+from db.profiles import profiles
+from db.records import ShopView
+from db.rewards import RewardPipeline
+from db.shop_views import shop_views
+from db.unit_of_work import unit_of_work, commit, rollback
 from games.black_jack import sum_hand, deal_hand, deal_card, deck
 from games.magic_8_ball import magic_8_ball_phrase
-from methods import auth_user, chat_only, cooldown_expired, add_coins_per_min, calc_xp, validate_bet, \
+from methods import auth_user, chat_only, cooldown_expired, update_action_time, validate_bet, \
     admin_only, extract_datetime, validate_coins_amount
 from modules.anime import choose_random_anime_image
 from modules.epic_games import EGSFreeGames
 from modules.img import choose_random_image
-from modules.shop import SHOP_ITEMS, ShopItemBoosterMSG, ShopItemBoosterPerMin
+from modules.level_curve import level_for, MAX_XP_GRANT
+from modules.scheduler import TimerScheduler
+from modules.shop import SHOP_ITEMS, BUY_QUANTITIES, ShopItemBooster, load_shop_items
 from modules.slap import choose_random_slap_gif
 from modules.steam_events import SteamEvents
 
@@ -35,6 +49,33 @@ SET_AUC_DESCRIPTION = 0
 CONFIRM_AUC_BET = 0
 
 
+class UnitOfWorkApplication(Application):
+    """
+    Application that handles every update inside one database unit of work. A failing handler's exception is
+    caught by process_update and handed to process_error, never reaching unit_of_work(), so its uncommitted
+    changes are rolled back there.
+    """
+
+    async def process_update(self, update: object) -> None:
+        async with unit_of_work(f"update {getattr(update, 'update_id', '')}"):
+            await super().process_update(update)
+
+    async def process_error(self, update: Optional[object], error: Exception, *args, **kwargs) -> bool:
+        await rollback()
+        return await super().process_error(update, error, *args, **kwargs)
+
+
+class UnitOfWorkRateLimiter(AIORateLimiter):
+    """
+    Rate limiter that commits the unit of work of the update before a Bot API call waits for its turn, so SQLite's
+    write lock is not held through a throttle or the request itself.
+    """
+
+    async def process_request(self, *args, **kwargs):
+        await commit()
+        return await super().process_request(*args, **kwargs)
+
+
 class TelegramBot:
     def __init__(self, token, chat_id):
 
@@ -44,9 +85,9 @@ class TelegramBot:
             self.loop = asyncio.new_event_loop()
             asyncio.set_event_loop(self.loop)
 
-        app_builder = Application.builder()
+        app_builder = Application.builder().application_class(UnitOfWorkApplication)
         app_builder.token(token)
-        rate_limiter = AIORateLimiter(
+        rate_limiter = UnitOfWorkRateLimiter(
             overall_max_rate=30,
             overall_time_period=1,
             group_max_rate=20,
@@ -54,8 +95,11 @@ class TelegramBot:
             max_retries=3,
         )
         app_builder.rate_limiter(rate_limiter)
+        app_builder.concurrent_updates(CONCURRENT_UPDATES)
         self.app = app_builder.build()
         self.chat_id = chat_id
+        self.rewards = RewardPipeline()
+        self.giveaway_timers = TimerScheduler(functools.partial(end_giveaway, self))
         handlers = [
             ChatMemberHandler(self.greet_chat_members, ChatMemberHandler.CHAT_MEMBER),
 
@@ -67,11 +111,13 @@ class TelegramBot:
             CommandHandler('boosters', self.boosters_handler),
             CommandHandler('level', self.level_handler),
             CommandHandler('rating', self.rating_handler),
+            CommandHandler('rank', self.rank_handler),
             CommandHandler('anime', self.anime_handler),
             CommandHandler('img', self.image_handler),
             CommandHandler('slap', self.slap_handler),
             CommandHandler('cd', self.cd_handler),
             CommandHandler('shop', self.shop_handler),
+            CommandHandler('give_xp', self.give_xp_handler),
             CallbackQueryHandler(self.buy_callback, pattern='^buy_'),
             CallbackQueryHandler(self.delete_user_callback, pattern='^DELETE_USER_'),
             ConversationHandler(
@@ -126,6 +172,13 @@ class TelegramBot:
 
         await self.app.initialize()
         await self.app.start()
+        members.load(await repo.users.get_all_user_ids())
+        await leaderboards.rebuild()
+        self.rewards.start()
+        cooldowns.start()
+        ledger_compactor.start()
+        await schedule_giveaways(self)
+        self.giveaway_timers.start()
         if self.app.updater:
             await self.app.updater.start_polling(
                 bootstrap_retries=-1,
@@ -140,6 +193,10 @@ class TelegramBot:
     async def shutdown_telegram(self) -> None:
         if self.app.updater:
             await self.app.updater.stop()
+        await self.rewards.stop()
+        await cooldowns.stop()
+        await ledger_compactor.stop()
+        await self.giveaway_timers.stop()
         await self.app.stop()
         await self.app.shutdown()
 
@@ -154,11 +211,9 @@ class TelegramBot:
         """
         user_id = update.message.from_user.id
         action_id = 1
-        if cooldown_expired(user_id, action_id) is True:
-            UserActionCRUD.update_action_time(user_id=update.message.from_user.id, action_id=action_id)
-
-            calc_xp(user_id)
-            UserCRUD.add_user_coins_per_msg(user_id)
+        if await cooldown_expired(user_id, action_id) is True:
+            update_action_time(user_id=user_id, action_id=action_id)
+            self.rewards.put(user_id)
 
     @auth_user
     async def start_handler(self, update: Update, context: CallbackContext) -> None:
@@ -181,15 +236,13 @@ class TelegramBot:
         """
         user_id = update.message.from_user.id
         action_id = 2
-        cooldown = cooldown_expired(user_id, action_id)
+        cooldown = await cooldown_expired(user_id, action_id)
 
         if cooldown is True:
-            UserActionCRUD.update_action_time(user_id=update.message.from_user.id, action_id=action_id)
+            update_action_time(user_id=update.message.from_user.id, action_id=action_id)
 
-            all_users = UserCRUD.get_all_users()
-            who_choice = random.choice(all_users)
-            who_choice_mention = User(who_choice.user_id, who_choice.user_nickname, False).mention_markdown_v2()
-            bot_message = who_choice_mention
+            who_choice = await profiles.get(members.random_member())
+            bot_message = who_choice.mention_markdown
             await update.message.reply_text(text=bot_message, parse_mode=ParseMode.MARKDOWN_V2)
         else:
             print(f"You should wait {cooldown} seconds.")
@@ -204,9 +257,9 @@ class TelegramBot:
         """
         user_id = update.message.from_user.id
         action_id = 3
-        cooldown = cooldown_expired(user_id, action_id)
+        cooldown = await cooldown_expired(user_id, action_id)
         if cooldown is True:
-            UserActionCRUD.update_action_time(user_id=update.message.from_user.id, action_id=action_id)
+            update_action_time(user_id=update.message.from_user.id, action_id=action_id)
 
             text = magic_8_ball_phrase()
             text = escape_markdown(text, 2)
@@ -225,7 +278,7 @@ class TelegramBot:
         """
 
         user_id = update.message.from_user.id
-        balance = str(UserCRUD.get_user_balance(user_id) / 100)
+        balance = str(await repo.users.get_user_balance(user_id) / 100)
         balance = escape_markdown(balance, 2)
         bot_message = f"Balance: *{balance}*"
         reply = await update.message.reply_text(text=bot_message, parse_mode=ParseMode.MARKDOWN_V2)
@@ -243,7 +296,7 @@ class TelegramBot:
         """
         user_id = update.message.from_user.id
         action_id = 4
-        cooldown = cooldown_expired(user_id, action_id)
+        cooldown = await cooldown_expired(user_id, action_id)
         if cooldown is True:
 
             if context.args:
@@ -255,7 +308,7 @@ class TelegramBot:
                     picked_variant = random.choice(variants)
                     await update.message.reply_text(f"The picked variant is: *{picked_variant}*",
                                                     parse_mode=ParseMode.MARKDOWN_V2)
-                    UserActionCRUD.update_action_time(user_id=update.message.from_user.id, action_id=action_id)
+                    update_action_time(user_id=update.message.from_user.id, action_id=action_id)
 
                 else:
                     reply = update.message.reply_text("No valid variants found.")
@@ -275,7 +328,8 @@ class TelegramBot:
         :param update:
         :param context:
         """
-        user_coins_per_msg, user_coins_per_min = UserCRUD.get_boosters_amount(update.message.from_user.id)
+        user_coins_per_msg, user_coins_per_min = await repo.users.get_boosters_amount(
+            update.message.from_user.id)
         user_coins_per_msg = escape_markdown(str(user_coins_per_msg / 100), 2)
         user_coins_per_min = escape_markdown(str(user_coins_per_min / 100), 2)
         bot_message = f"Coins per MSG: *{user_coins_per_msg}*\nCoins per MIN: *{user_coins_per_min}*"
@@ -291,7 +345,7 @@ class TelegramBot:
         :param context:
         """
         user_id = update.message.from_user.id
-        user_level = UserLevelCRUD.get_level(user_id)
+        user_level = await repo.levels.get_level(user_id)
         percent = user_level.xp * 100 / user_level.xp_needed
         percent -= percent % +10
         percent = int(percent / 10)
@@ -313,13 +367,15 @@ class TelegramBot:
         """
         user_id = update.message.from_user.id
         action_id = 5
-        cooldown = cooldown_expired(user_id, action_id)
+        cooldown = await cooldown_expired(user_id, action_id)
         if cooldown is True:
-            UserActionCRUD.update_action_time(user_id=update.message.from_user.id, action_id=action_id)
+            update_action_time(user_id=update.message.from_user.id, action_id=action_id)
 
-            users = UserLevelCRUD.get_top_users()
+            board_name = context.args[0].lower() if context.args and context.args[0].lower() in BOARDS else 'level'
+            page = leaderboards.board(board_name).page(20)
+            page_profiles = await profiles.get_many([user_id for user_id, _ in page])
             bot_message = ''
-            for i, user in enumerate(users):
+            for i, (user_id, score) in enumerate(page):
                 if i == 0:
                     i = '🥇'
                 elif i == 1:
@@ -328,16 +384,72 @@ class TelegramBot:
                     i = '🥉'
                 else:
                     i = f' {i + 1}\.'
-                user_id = user.user_id
-                user_nickname = user.user.user_nickname
-                user_mention = User(user_id, escape_markdown(user_nickname, 2), False).mention_markdown_v2()
-                bot_message += f"{i} {user_mention} \({user.level} lvl\)\n"
+                profile = page_profiles.get(user_id)
+                user_mention = profile.mention_markdown if profile else str(user_id)
+                bot_message += f"{i} {user_mention} \({escape_markdown(format_score(board_name, score), 2)}\)\n"
+            if not bot_message:
+                bot_message = escape_markdown("Nobody is on this board yet.", 2)
             reply = await update.message.reply_text(text=bot_message, parse_mode=ParseMode.MARKDOWN_V2)
             context.job_queue.run_once(self.delete_messages, 15, data=[update.message, reply])
         else:
             print(f"You should wait {cooldown} seconds.")
             context.job_queue.run_once(self.delete_messages, 1, data=[update.message])
 
+    @auth_user
+    @chat_only
+    async def rank_handler(self, update: Update, context: CallbackContext) -> None:
+        """
+        handler for /rank
+
+        :param update:
+        :param context:
+        """
+        user_id = update.message.from_user.id
+        action_id = 5
+        cooldown = await cooldown_expired(user_id, action_id)
+        if cooldown is True:
+            update_action_time(user_id=user_id, action_id=action_id)
+            text = ''
+            for board_name, title in (('level', 'Level'), ('coins', 'Coins'), ('week', 'Week')):
+                board = leaderboards.board(board_name)
+                rank = board.rank(user_id)
+                if rank:
+                    score = format_score(board_name, board.scores[user_id])
+                    text += f"{title}: #{rank} of {len(board)} ({score})\n"
+                else:
+                    text += f"{title}: not ranked\n"
+            reply = await update.message.reply_text(text=escape_markdown(text, 2), parse_mode=ParseMode.MARKDOWN_V2)
+            context.job_queue.run_once(self.delete_messages, 15, data=[update.message, reply])
+        else:
+            print(f"You should wait {cooldown} seconds.")
+            context.job_queue.run_once(self.delete_messages, 1, data=[update.message])
+
+    @admin_only
+    async def give_xp_handler(self, update: Update, context: CallbackContext) -> None:
+        """
+        handler for /give_xp <amount>, as a reply to a message of the user who gets the XP
+
+        :param update:
+        :param context:
+        """
+        reply_to = update.message.reply_to_message
+        try:
+            amount = int(context.args[0]) if reply_to and context.args else None
+        except ValueError:
+            amount = None
+        if amount is None:
+            await update.message.reply_text(text="Reply to a message with /give_xp <amount>")
+            return
+        if abs(amount) > MAX_XP_GRANT:
+            await update.message.reply_text(text=f"The amount must be between -{MAX_XP_GRANT} and {MAX_XP_GRANT}")
+            return
+        user_id = reply_to.from_user.id
+        if user_id not in members:
+            return
+        level, xp, xp_needed = (await repo.levels.grant_xp({user_id: amount}))[user_id]
+        text = f"{reply_to.from_user.full_name}: {amount:+} XP\nLevel: {level} {xp}/{xp_needed} XP"
+        await update.message.reply_text(text=text)
+
     @auth_user
     async def anime_handler(self, update: Update, context: CallbackContext) -> None:
         """
@@ -348,10 +460,10 @@ class TelegramBot:
         """
         user_id = update.message.from_user.id
         action_id = 6
-        cooldown = cooldown_expired(user_id, action_id)
+        cooldown = await cooldown_expired(user_id, action_id)
         if cooldown is True:
-            if UserCRUD.pay_coins(user_id, ANIME_PRICE):
-                UserActionCRUD.update_action_time(user_id=update.message.from_user.id, action_id=action_id)
+            if await repo.users.debit_coins(user_id, ANIME_PRICE, ledger.ANIME) is not None:
+                update_action_time(user_id=update.message.from_user.id, action_id=action_id)
 
                 await update.message.reply_photo(photo=choose_random_anime_image(), parse_mode=ParseMode.MARKDOWN_V2)
         else:
@@ -368,10 +480,10 @@ class TelegramBot:
         """
         user_id = update.message.from_user.id
         action_id = 8
-        cooldown = cooldown_expired(user_id, action_id)
+        cooldown = await cooldown_expired(user_id, action_id)
         if cooldown is True:
-            if UserCRUD.pay_coins(user_id, IMG_PRICE):
-                UserActionCRUD.update_action_time(user_id=update.message.from_user.id, action_id=action_id)
+            if await repo.users.debit_coins(user_id, IMG_PRICE, ledger.IMAGE) is not None:
+                update_action_time(user_id=update.message.from_user.id, action_id=action_id)
 
                 answer = await update.message.reply_photo(photo=choose_random_image(), has_spoiler=True)
             else:
@@ -393,10 +505,9 @@ class TelegramBot:
         mentioned_user = update.message.parse_entities(types=["mention"])
         if mentioned_user:
             user_name = next(iter(mentioned_user.values()), None)
-            user_id = UserCRUD.get_user_id_by_username(user_name[1:])
+            user_id = await profiles.get_user_id_by_username(user_name[1:])
             if user_id:
-                user_nickname = UserCRUD.get_user_by_id(user_id).user_nickname
-                user_name_mention = User(user_id, user_nickname, False).mention_html()
+                user_name_mention = (await profiles.get(user_id)).mention_html
         if user_name_mention:
             await self.app.bot.send_animation(chat_id=self.chat_id, animation=choose_random_slap_gif(),
                                               caption=user_name_mention,
@@ -446,10 +557,10 @@ class TelegramBot:
             return ConversationHandler.END
         user_id = update.message.from_user.id
         action_id = 7
-        cooldown = cooldown_expired(user_id, action_id)
+        cooldown = await cooldown_expired(user_id, action_id)
         if cooldown is True:
-            if UserCRUD.pay_coins(user_id, bet):
-                UserActionCRUD.update_action_time(user_id=update.message.from_user.id, action_id=action_id)
+            if await repo.users.debit_coins(user_id, bet, ledger.BET) is not None:
+                update_action_time(user_id=update.message.from_user.id, action_id=action_id)
                 player_hand = deal_hand(deck)
                 dealer_hand = deal_hand(deck)
 
@@ -508,7 +619,8 @@ class TelegramBot:
                                                     message_id=context.user_data['message_id'],
                                                     text=f'Your hand: {player_hand}, total: {sum_hand(player_hand)}\n'
                                                          f'Blackjack! You win.')
-                UserCRUD.add_coins(context.user_data['player_id'], context.user_data['bet'] * 2)
+                await repo.users.add_coins(context.user_data['player_id'], context.user_data['bet'] * 2,
+                                           ledger.BET_PAYOUT)
                 return ConversationHandler.END
             else:
                 await context.bot.edit_message_text(chat_id=update.effective_chat.id,
@@ -543,7 +655,8 @@ class TelegramBot:
                                                          f'Dealer\'s hand: {dealer_hand}, '
                                                          f'total: {sum_hand(dealer_hand)}\n'
                                                          f'Dealer busts! You win.')
-                UserCRUD.add_coins(context.user_data['player_id'], context.user_data['bet'] * 2)
+                await repo.users.add_coins(context.user_data['player_id'], context.user_data['bet'] * 2,
+                                           ledger.BET_PAYOUT)
             elif sum_hand(dealer_hand) < sum_hand(player_hand):
                 await context.bot.edit_message_text(chat_id=update.effective_chat.id,
                                                     message_id=context.user_data['message_id'],
@@ -552,7 +665,8 @@ class TelegramBot:
                                                          f'Dealer\'s hand: {dealer_hand}, '
                                                          f'total: {sum_hand(dealer_hand)}\n'
                                                          f'You win!')
-                UserCRUD.add_coins(context.user_data['player_id'], context.user_data['bet'] * 2)
+                await repo.users.add_coins(context.user_data['player_id'], context.user_data['bet'] * 2,
+                                           ledger.BET_PAYOUT)
             elif sum_hand(dealer_hand) > sum_hand(player_hand):
                 await context.bot.edit_message_text(chat_id=update.effective_chat.id,
                                                     message_id=context.user_data['message_id'],
@@ -569,43 +683,38 @@ class TelegramBot:
                                                          f'Dealer\'s hand: {dealer_hand}, '
                                                          f'total: {sum_hand(dealer_hand)}\n'
                                                          f'Push. It\'s a tie.')
-                UserCRUD.add_coins(context.user_data['player_id'], context.user_data['bet'])
+                await repo.users.add_coins(context.user_data['player_id'], context.user_data['bet'], ledger.BET_PAYOUT)
 
             return ConversationHandler.END
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~ SHOP ~~~~~~~~~~~~~~~~~~~~~~~~~~
     @staticmethod
-    async def generate_shop_message(user_id: int) -> tuple[str, InlineKeyboardMarkup]:
-        user_balance = UserCRUD.get_user_balance(user_id)
-
+    def render_shop(view: ShopView, balance: int) -> tuple[str, InlineKeyboardMarkup]:
         keyboard = []
-        user_nickname = UserCRUD.get_user_by_id(user_id).user_nickname
-        shop_text = f'{user_nickname}, welcome to the Shop!\n\n'
-        row = []
-        buttons_per_row = 3
+        shop_text = f'{view.user_nickname}, welcome to the Shop!\n\n'
 
         for i, (item_key, item_details) in enumerate(SHOP_ITEMS.items()):
-            if i % buttons_per_row == 0 and row:
-                keyboard.append(row)
-                row = []
-            if isinstance(item_details, ShopItemBoosterMSG) or isinstance(item_details, ShopItemBoosterPerMin):
-                booster_count = UsersBoostersCRUD.get_booster_count(user_id, item_details.booster_id)
+            if isinstance(item_details, ShopItemBooster):
+                booster_count = view.boosters.get(item_details.booster_id, 0)
                 shop_text += f"{i + 1}. " + \
                              f"{item_details.name} - {item_details.calculate_price(booster_count) / 100} 💵\n" \
                              f"\t\t\t{item_details.display_info(amount=item_details.bonus_amount, count=booster_count)}\n"
             else:
                 shop_text += f"{i + 1}. " + item_details.display_info() + "\n"
 
-            row.append(InlineKeyboardButton(str(i + 1), callback_data=f"buy_{item_key}"))
-
-        if row:
-            keyboard.append(row)
+            keyboard.append([InlineKeyboardButton(f"{i + 1}" if quantity == '1' else f"{i + 1} ×{quantity}",
+                                                  callback_data=f"buy_{item_key}_{quantity}")
+                             for quantity in BUY_QUANTITIES])
 
         reply_markup = InlineKeyboardMarkup(keyboard)
-        shop_text += f"\nYour balance: {user_balance / 100} coins"
+        shop_text += f"\nYour balance: {balance / 100} coins"
 
         return shop_text, reply_markup
 
+    @staticmethod
+    async def generate_shop_message(user_id: int) -> tuple[str, InlineKeyboardMarkup]:
+        return await shop_views.get(user_id, TelegramBot.render_shop)
+
     @auth_user
     async def shop_handler(self, update: Update, context: CallbackContext) -> None:
         """
@@ -628,37 +737,27 @@ class TelegramBot:
         user_id = update.callback_query.from_user.id
         if 'shop_user_id' in context.user_data and \
                 context.user_data['shop_user_id'] == user_id:
-            item_id = update.callback_query.data.split('_')[1]
-            if item_id not in SHOP_ITEMS:
+            _, item_id, *quantity = update.callback_query.data.split('_')
+            quantity = quantity[0] if quantity else '1'
+            item = SHOP_ITEMS.get(item_id)
+            if not isinstance(item, ShopItemBooster) or quantity not in BUY_QUANTITIES:
                 await update.callback_query.answer("Invalid item!")
                 return
 
-            user_balance = UserCRUD.get_user_balance(user_id)
-
-            if isinstance(SHOP_ITEMS[item_id], ShopItemBoosterMSG) or isinstance(SHOP_ITEMS[item_id],
-                                                                                 ShopItemBoosterPerMin):
-                booster_count = UsersBoostersCRUD.get_booster_count(user_id, SHOP_ITEMS[item_id].booster_id)
-                price = SHOP_ITEMS[item_id].calculate_price(booster_count)
-            else:
-                price = SHOP_ITEMS[item_id].calculate_price()
-
-            if user_balance < price:
+            bought, price = await repo.boosters.buy_boosters(user_id, item,
+                                                             None if quantity == 'max' else int(quantity))
+            if not bought:
                 await update.callback_query.answer("You don't have enough coins!")
                 return
+            logger.debug(f"BUY {user_id} {item_id} x{bought} {price}")
 
-            logger.debug(f"BUY {update.callback_query.from_user.id} {item_id} {price}")
-            if UserCRUD.pay_coins(
-                    user_id, price):
-                if isinstance(SHOP_ITEMS[item_id], ShopItemBoosterMSG) or isinstance(SHOP_ITEMS[item_id],
-                                                                                     ShopItemBoosterPerMin):
-                    UsersBoostersCRUD.increment_or_create(user_id, SHOP_ITEMS[item_id].booster_id)
-                else:
-                    pass
-
-            shop_message, reply_markup = await self.generate_shop_message(update.callback_query.from_user.id)
+            shop_message, reply_markup = await self.generate_shop_message(user_id)
             await update.callback_query.edit_message_text(shop_message, reply_markup=reply_markup)
 
-            await update.callback_query.answer(f"You've successfully purchased {SHOP_ITEMS[item_id].name}!")
+            if bought == 1:
+                await update.callback_query.answer(f"You've successfully purchased {item.name}!")
+            else:
+                await update.callback_query.answer(f"You've successfully purchased {bought} × {item.name}!")
         else:
             await update.callback_query.answer("You're not authorized to interact with this menu!")
 
@@ -821,9 +920,10 @@ class TelegramBot:
         end_datetime = context.user_data['end_datetime']
         giveaway_description = context.user_data['description']
 
-        created_giveaway_id = GiveawayCRUD.create_giveaway(giveaway_type=giveaway_type,
-                                                           description=giveaway_description, end_datetime=end_datetime,
-                                                           gifts=gifts)
+        created_giveaway_id = await repo.giveaways.create_giveaway(giveaway_type=giveaway_type,
+                                                                   description=giveaway_description,
+                                                                   end_datetime=end_datetime,
+                                                                   gifts=gifts)
 
         bot_message = context.user_data['bot_message']
         await bot_message.edit_text("Congratulations! Your giveaway has been created and saved.")
@@ -852,11 +952,9 @@ class TelegramBot:
         giveaway_message = await self.app.bot.send_photo(chat_id=self.chat_id,
                                                          photo=context.user_data['giveaway_photo'], caption=text,
                                                          reply_markup=reply_markup, parse_mode=ParseMode.HTML)
-        GiveawayCRUD.set_message_id(giveaway_id=created_giveaway_id, message_id=giveaway_message.message_id)
-        wait_for_giveaway_ending_thread = threading.Thread(target=wait_for_giveaway_ending,
-                                                           args=(created_giveaway_id, self,),
-                                                           daemon=True)
-        wait_for_giveaway_ending_thread.start()
+        await repo.giveaways.set_message_id(giveaway_id=created_giveaway_id,
+                                            message_id=giveaway_message.message_id)
+        self.giveaway_timers.schedule(created_giveaway_id, end_datetime.timestamp())
         return ConversationHandler.END
 
     async def cancel_giveaway_handler(self, update: Update, context):
@@ -870,24 +968,22 @@ class TelegramBot:
         callback_data = update.callback_query.data
         giveaway_id = int(callback_data.split("_")[-1])
 
-        end_datetime = GiveawayCRUD.get_giveaway_end_datetime(giveaway_id)
-        if end_datetime and datetime.datetime.now().timestamp() > end_datetime:
+        joined = await participation.join(user_id, giveaway_id)
+        if joined is None:
             await update.callback_query.answer("Sorry, the giveaway has ended.")
-            return
-
-        if GiveawayCRUD.has_user_participated(user_id, giveaway_id):
+        elif not joined:
             await update.callback_query.answer("You have already participated in this giveaway.")
-
         else:
-            GiveawayCRUD.add_participant(user_id, giveaway_id)
             await update.callback_query.answer("You have successfully participated in the giveaway")
-            participant_count = GiveawayCRUD.get_participant_count(giveaway_id)
-            keyboard = [
-                [InlineKeyboardButton(f"Participate ({participant_count})",
-                                      callback_data=f"GIVEAWAY_PARTICIPATE_{giveaway_id}"), ]]
+            message = update.callback_query.message
 
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await update.callback_query.message.edit_reply_markup(reply_markup)
+            async def show_count(participant_count: int):
+                keyboard = [
+                    [InlineKeyboardButton(f"Participate ({participant_count})",
+                                          callback_data=f"GIVEAWAY_PARTICIPATE_{giveaway_id}"), ]]
+                await message.edit_reply_markup(InlineKeyboardMarkup(keyboard))
+
+            participation.request_edit(giveaway_id, show_count)
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~ ADDITIONAL FUNC ~~~~~~~~~~~~~~~~~~~~~~~~~~
 
@@ -1018,8 +1114,7 @@ class TelegramBot:
             was_member, is_member = result
 
             cause_user_id = update.chat_member.from_user.id
-            user_nickname = UserCRUD.get_user_by_id(cause_user_id).user_nickname
-            cause_user_name = User(cause_user_id, user_nickname, False).mention_html()
+            cause_user_name = (await profiles.get(cause_user_id)).mention_html
 
             member_id = update.chat_member.new_chat_member.user.id
 
@@ -1036,10 +1131,9 @@ class TelegramBot:
                     await update.effective_chat.send_message(
                         f"{member_mention} was added by {cause_user_name}. Welcome!",
                         parse_mode=ParseMode.HTML)
-                UserCRUD.create_user(member_id, member_user_name, member_nickname)
+                await repo.users.create_user(member_id, member_user_name, member_nickname)
             elif was_member and not is_member:
-                user_nickname = UserCRUD.get_user_by_id(member_id).user_nickname
-                member_user_name = User(member_id, user_nickname, False).mention_html()
+                member_user_name = (await profiles.get(member_id)).mention_html
                 if update.chat_member.from_user == update.chat_member.new_chat_member.user:
                     text = f"{member_user_name} has left :("
                 else:
@@ -1056,11 +1150,19 @@ class TelegramBot:
     async def delete_user_callback(self, update: Update, context: CallbackContext):
         callback_data = update.callback_query.data
         user_id = int(callback_data.split("_")[-1])
-        UserCRUD.delete_user(user_id)
+        await repo.users.delete_user(user_id)
         await update.callback_query.message.edit_reply_markup(reply_markup=None)
 
 
-def announce_winners(tg_bot: TelegramBot, winners: list, message_id: int, participants_count: int):
+def format_score(board_name: str, score: int) -> str:
+    if board_name == 'coins':
+        return f"{score / 100} coins"
+    if board_name == 'week':
+        return f"{score} msgs"
+    return f"{level_for(score)[0]} lvl"
+
+
+async def announce_winners(tg_bot: TelegramBot, winners: list, message_id: int, participants_count: int):
     message = "🎉 Giveaway Ended 🎉\n\n"
     winners_message = ''
     if participants_count > 0:
@@ -1068,13 +1170,13 @@ def announce_winners(tg_bot: TelegramBot, winners: list, message_id: int, partic
             message += f"Thank you to all {participants_count} participants for joining our giveaway! 🙌\n\n"
             winners_message += "Winners Announcement 🏆:\n"
 
+            mentions = await profiles.get_many([winner_info['winner'] for winner_info in winners])
             for idx, winner_info in enumerate(winners, start=1):
                 winner_id = winner_info['winner']
                 gift_info = winner_info['gift']
                 gift_name = gift_info['name']
                 gift_amount = gift_info['amount']
-                user = UserCRUD.get_user_by_id(winner_id)
-                user_mention = User(winner_id, user.user_nickname, is_bot=False).mention_html()
+                user_mention = mentions[winner_id].mention_html
                 winners_message += f"{idx}. {user_mention} wins {gift_amount}x {gift_name}\n"
 
             winners_message += "\nCongratulations to our lucky winners! 🎉\n\n"
@@ -1089,39 +1191,33 @@ def announce_winners(tg_bot: TelegramBot, winners: list, message_id: int, partic
         winners_message += "There were no participants in this giveaway. 😢 We'll try again in our next giveaway! 🎁\n\n"
     logger.debug(winners_message)
     message += winners_message
-    tg_bot.loop.create_task(tg_bot.bot_edit_message_caption(tg_bot.chat_id, message_id, message, ParseMode.HTML))
+    await tg_bot.bot_edit_message_caption(tg_bot.chat_id, message_id, message, ParseMode.HTML)
     mention_text = f"Giveaway Results 👀\n"
     mention_text += winners_message
-    tg_bot.loop.create_task(tg_bot.bot_send_message(mention_text, message_id, ParseMode.HTML))
+    await tg_bot.bot_send_message(mention_text, message_id, ParseMode.HTML)
 
 
-def wait_for_giveaway_ending(giveaway_id, tg_bot: TelegramBot):
-    end_datetime = GiveawayCRUD.get_giveaway_end_datetime(giveaway_id)
-    now = datetime.datetime.now().timestamp()
-    remaining_time = end_datetime - now
-    logger.debug(f'waiting for giv {giveaway_id}, remaining_time: {remaining_time}')
-    if remaining_time > 0:
-        time.sleep(remaining_time)
-    message_id = GiveawayCRUD.get_giveaway_message_id(giveaway_id)
-    participants_count = GiveawayCRUD.get_participant_count(giveaway_id)
-    winners = GiveawayCRUD.select_giveaway_winners(giveaway_id)
-    announce_winners(tg_bot, winners, message_id, participants_count)
+async def end_giveaway(tg_bot: TelegramBot, giveaway_id: int):
+    """Called by the giveaway timers once the giveaway has ended."""
+    logger.debug(f'giveaway {giveaway_id} ended')
+    participation.forget(giveaway_id)
+    result = await repo.giveaways.end_giveaway(giveaway_id, weighted=giveaway_weighted_by_level)
+    if result is not None:
+        await announce_winners(tg_bot, result.winners, result.message_id, result.participant_count)
 
 
-def start_giveaway_threads(tg_bot: TelegramBot):
-    giveaways = GiveawayCRUD.get_all_giveaways()
-    for giveaway in giveaways:
-        thread = threading.Thread(target=wait_for_giveaway_ending, args=(giveaway.id, tg_bot,), daemon=True)
-        thread.start()
+async def schedule_giveaways(tg_bot: TelegramBot):
+    """Schedule the end of every stored giveaway, the ones already over end as soon as the timers start."""
+    for giveaway in await repo.giveaways.get_all_giveaways():
+        tg_bot.giveaway_timers.schedule(giveaway.id, giveaway.end_datetime.timestamp())
 
 
 def main():
     tg_bot = TelegramBot(TELEGRAM_TOKEN, TELEGRAM_CHAT)
 
-    setup_database()
-    start_giveaway_threads(tg_bot)
-    bonus_per_min_thread = threading.Thread(target=add_coins_per_min, daemon=True)
-    bonus_per_min_thread.start()
+    boosters = read_boosters()
+    repo.use(STORAGE_BACKEND, boosters)
+    load_shop_items(boosters)
 
     egs_free_games = EGSFreeGames()
     check_epic_thread = threading.Thread(target=egs_free_games.check_epic_free_games_loop, args=(tg_bot,), daemon=True)
@@ -4,9 +4,12 @@ import time
 import datetime
 
 import requests.exceptions
-from epicstore_api import EpicGamesStoreAPI
 from telegram.helpers import escape_markdown
 from config import logger
+from modules.http_client import http_client
+
+FREE_GAMES_URL = "https://store-site-backend-static.ak.epicgames.com/freeGamesPromotions" \
+                 "?locale=en-US&country=US&allowCountries=US"
 
 
 class EGSFreeGames:
@@ -16,24 +19,40 @@ class EGSFreeGames:
         else:
             current_dir = os.path.dirname(os.path.abspath(__file__))
             self.filename = os.path.join(current_dir, "free_games.json")
+        self._free_games = {}  # last parsed promotions, reused while the feed answers 304
 
-    @staticmethod
-    def get_free_games() -> dict:
-        api = EpicGamesStoreAPI()
+    def get_free_games(self) -> dict:
+        """
+        :return: the free games promotions, parsed again only if the feed has changed; empty if they couldn't be
+            fetched
+        """
         try_counter = 0
         while try_counter < 5:
             try:
-                free_games = api.get_free_games()
-                return free_games
+                response = http_client.get(FREE_GAMES_URL)
+                if response.status_code not in (200, 304):
+                    return {}
+                if response.changed or not self._free_games:
+                    free_games = response.json()
+                    if free_games.get('errors'):
+                        logger.error(free_games['errors'])
+                        return {}
+                    self._free_games = free_games
+                return self._free_games
             except requests.exceptions.ConnectionError:
                 time.sleep(10)
                 try_counter += 1
             except Exception as e:
                 logger.error(e)
+                return {}
         return {}
 
     @staticmethod
-    def format_response(free_games) -> dict:
+    def format_response(free_games, now: datetime.datetime = None) -> dict:
+        """
+        :param now: the promotions running at that time are kept, the current time by default
+        """
+        now = now or datetime.datetime.now()
         free_games_data = {"current": [], "future": []}
         for i in free_games['data']['Catalog']['searchStore']['elements']:
             if i['promotions']:
@@ -45,7 +64,7 @@ class EGSFreeGames:
                     end_date = i['expiryDate']
                     if end_date:
                         end_date = datetime.datetime.strptime(end_date, "%Y-%m-%dT%H:%M:%S.%fZ")
-                        if end_date > datetime.datetime.now() > start_date and \
+                        if end_date > now > start_date and \
                                 i['price']['totalPrice']['discountPrice'] == 0:
                             img_url = [img for img in i['keyImages'] if img['type'] == 'DieselStoreFrontWide']
                             game = {'title': i['title'], 'url': url, 'start_date': int(start_date.timestamp()),
@@ -0,0 +1,98 @@
+"""
+HTTP client of the feed pollers.
+
+Every poller shares one `requests.Session`, so polls reuse pooled keep-alive connections instead of opening a new
+TLS connection each time, and every request has a timeout. The ETag and Last-Modified of each response are kept on
+disk next to its body and sent back as If-None-Match and If-Modified-Since: an unchanged feed answers 304 with no
+body, and the poller gets the cached one marked as unchanged so it can skip parsing it.
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import HTTP_TIMEOUT, HTTP_CACHE_DIR
+
+
+class FeedResponse:
+    __slots__ = ('url', 'status_code', 'content', 'changed')
+
+    def __init__(self, url: str, status_code: int, content: bytes, changed: bool):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.changed = changed
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class HttpClient:
+    def __init__(self, cache_dir: str = HTTP_CACHE_DIR, timeout: float = HTTP_TIMEOUT, pool_size: int = 4):
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+
+    def _paths(self, url: str) -> tuple:
+        name = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.cache_dir, name + ".json"), os.path.join(self.cache_dir, name + ".body")
+
+    def _load(self, url: str) -> Optional[dict]:
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                meta["content"] = f.read()
+        except (OSError, ValueError):
+            return None
+        return meta if meta.get("url") == url else None
+
+    def _store(self, url: str, response: requests.Response) -> None:
+        meta = {"url": url, "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified")}
+        if meta["etag"] is None and meta["last_modified"] is None:
+            return
+        meta_path, body_path = self._paths(url)
+        with self._lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # body first, so a metadata file always has the body it validates
+            for path, mode, data in ((body_path, 'wb', response.content), (meta_path, 'w', json.dumps(meta))):
+                with open(path + ".tmp", mode) as f:
+                    f.write(data)
+                os.replace(path + ".tmp", path)
+
+    def get(self, url: str) -> FeedResponse:
+        """
+        Revalidate `url` against the cached copy, if any.
+
+        :return: the cached body with `changed` False if the server answered 304, else the new body
+        :raise requests.RequestException: on connection errors and timeouts
+        """
+        cached = self._load(url)
+        headers = {}
+        if cached is not None:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and cached is not None:
+            return FeedResponse(url, 304, cached["content"], False)
+        if response.status_code == 200:
+            self._store(url, response)
+        return FeedResponse(url, response.status_code, response.content, True)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+http_client = HttpClient()
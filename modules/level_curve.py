@@ -0,0 +1,58 @@
+"""
+Level curve.
+
+Going from level n to n + 1 takes 5n² + 50n + 100 XP. Users store their total XP; the level, the XP into that
+level and the XP needed for the next one are derived from it by a binary search over the cumulative thresholds,
+precomputed for the first PRECOMPUTED_LEVELS levels and computed with `threshold()` above them.
+"""
+from bisect import bisect_right
+from typing import List, Tuple
+
+PRECOMPUTED_LEVELS = 1000
+
+
+def xp_needed(level: int) -> int:
+    """XP needed to go from `level` to the next one."""
+    return 5 * level ** 2 + 50 * level + 100
+
+
+def threshold(level: int) -> int:
+    """Total XP at which `level` is reached, the closed form of the sum of xp_needed below it."""
+    return 5 * (level - 1) * level * (2 * level - 1) // 6 + 25 * level * (level - 1) + 100 * level
+
+
+THRESHOLDS: List[int] = [threshold(level) for level in range(PRECOMPUTED_LEVELS + 1)]
+
+MAX_XP_GRANT = THRESHOLDS[-1]  # largest XP amount an admin can give or take at once
+
+
+def _level_above_thresholds(total_xp: int) -> int:
+    """Level of a total XP past the precomputed thresholds."""
+    low, high = PRECOMPUTED_LEVELS, PRECOMPUTED_LEVELS * 2
+    while threshold(high) <= total_xp:
+        low, high = high, high * 2
+    while high - low > 1:
+        middle = (low + high) // 2
+        if threshold(middle) <= total_xp:
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+def level_for(total_xp: int) -> Tuple[int, int, int]:
+    """
+    :param total_xp: XP earned in total
+    :return: (level, XP into the level, XP needed for the next level)
+    """
+    total_xp = max(total_xp, 0)
+    if total_xp < THRESHOLDS[-1]:
+        level = bisect_right(THRESHOLDS, total_xp) - 1
+    else:
+        level = _level_above_thresholds(total_xp)
+    return level, total_xp - threshold(level), xp_needed(level)
+
+
+def total_xp_for(level: int, xp: int = 0) -> int:
+    """Total XP of a user at `level` with `xp` into it."""
+    return threshold(level) + xp
@@ -0,0 +1,117 @@
+"""
+Timer scheduler.
+
+Deadlines live in one heap served by a single asyncio task that sleeps until the earliest one, instead of a
+sleeping thread per timer. Rescheduling pushes a new heap entry and cancelling forgets the key; stale entries are
+dropped when they reach the top. Due callbacks run as their own tasks on the bot's loop, so a slow one doesn't
+hold back the others.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from config import logger
+
+
+class TimerScheduler:
+    """Calls `callback(key)` once the deadline of `key` (epoch seconds of `clock`) has passed."""
+
+    def __init__(self, callback: Callable[[Hashable], Awaitable], clock: Callable[[], float] = time.time):
+        self.callback = callback
+        self.clock = clock
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._deadlines: Dict[Hashable, Tuple[float, int]] = {}
+        self._order = itertools.count()
+        self._running: Set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._changed: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._deadlines
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def schedule(self, key: Hashable, when: float) -> None:
+        """Set the deadline of `key`, replacing the previous one if it was already scheduled."""
+        entry = (when, next(self._order))
+        self._deadlines[key] = entry
+        heapq.heappush(self._heap, (*entry, key))
+        self._wake()
+
+    def cancel(self, key: Hashable) -> bool:
+        """
+        :return: whether `key` was scheduled
+        """
+        found = self._deadlines.pop(key, None) is not None
+        if found:
+            self._wake()
+        return found
+
+    def deadline(self, key: Hashable) -> Optional[float]:
+        entry = self._deadlines.get(key)
+        return entry[0] if entry else None
+
+    def next_deadline(self) -> Optional[float]:
+        while self._heap and self._deadlines.get(self._heap[0][2]) != self._heap[0][:2]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self) -> List[Hashable]:
+        """Forget and return the keys whose deadline has passed, earliest first."""
+        now, due = self.clock(), []
+        while (deadline := self.next_deadline()) is not None and deadline <= now:
+            key = heapq.heappop(self._heap)[2]
+            del self._deadlines[key]
+            due.append(key)
+        return due
+
+    async def run_due(self) -> List[Hashable]:
+        """Call back every key that is due, waiting for the callbacks to finish."""
+        due = self.pop_due()
+        await asyncio.gather(*(self._fire(key) for key in due))
+        return due
+
+    async def _fire(self, key: Hashable) -> None:
+        try:
+            await self.callback(key)
+        except Exception as e:
+            logger.error(f"Timer {key} failed: {e}")
+
+    def _wake(self) -> None:
+        if self._changed is not None:
+            self._changed.set()
+
+    def start(self) -> None:
+        self._stopping = False
+        self._changed = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Fire the timers that are due, stop waiting for the others and let the running callbacks finish."""
+        if self._task:
+            self._stopping = True
+            self._wake()
+            await self._task
+            self._task = None
+        if self._running:
+            await asyncio.gather(*self._running)
+
+    async def _run(self) -> None:
+        while True:
+            for key in self.pop_due():
+                task = asyncio.create_task(self._fire(key))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+            if self._stopping:
+                break
+            deadline = self.next_deadline()
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(),
+                                       timeout=None if deadline is None else max(deadline - self.clock(), 0))
+            except asyncio.TimeoutError:
+                pass
@@ -1,7 +1,5 @@
 from typing import List, Union
 
-from db.crud import BoosterCRUD
-
 
 class ShopItem:
     def __init__(self, name, base_price):
@@ -18,22 +16,51 @@ class ShopItem:
 
 
 class ShopItemBooster(ShopItem):
+    """
+    Booster whose price grows with every one owned: the n-th costs
+    base_price + first_increment * n + increment_step * n * (n - 1) / 2 (counting from 0).
+    """
+    first_increment = 20
+    increment_step = 0
+
     def __init__(self, booster_id, name, base_price, booster_type, bonus_amount):
         super().__init__(name, base_price)
         self.booster_id = booster_id
         self.booster_type = booster_type
         self.bonus_amount = bonus_amount
 
+    def calculate_price(self, owned_boosters_count=0):
+        """Price of the next booster for a user owning `owned_boosters_count`."""
+        n = owned_boosters_count
+        return self.base_price + self.first_increment * n + self.increment_step * (n * (n - 1) // 2)
+
+    def _cumulative_price(self, n):
+        """Price of the first n boosters together."""
+        return self.base_price * n + self.first_increment * (n * (n - 1) // 2) + \
+            self.increment_step * (n * (n - 1) * (n - 2) // 6)
+
+    def total_price(self, owned_boosters_count=0, quantity=1):
+        """Price of the next `quantity` boosters for a user owning `owned_boosters_count`."""
+        return self._cumulative_price(owned_boosters_count + quantity) - self._cumulative_price(owned_boosters_count)
+
+    def max_affordable(self, owned_boosters_count=0, balance=0):
+        """Most boosters a user owning `owned_boosters_count` can buy with `balance` coins."""
+        if self.calculate_price(owned_boosters_count) > balance:
+            return 0
+        low, high = 1, 2
+        while self.total_price(owned_boosters_count, high) <= balance:
+            low, high = high, high * 2
+        while high - low > 1:
+            middle = (low + high) // 2
+            if self.total_price(owned_boosters_count, middle) <= balance:
+                low = middle
+            else:
+                high = middle
+        return low
+
 
 class ShopItemBoosterMSG(ShopItemBooster):
-    def calculate_price(self, owned_boosters_count=0):
-        """Custom logic to calculate the price for message boosters."""
-        price = self.base_price
-        increment = 20
-        for _ in range(owned_boosters_count):
-            price += increment
-            increment += 10
-        return price
+    increment_step = 10
 
     def display_info(self, amount=0, count=0):
         """Display information about the item."""
@@ -41,31 +68,23 @@ class ShopItemBoosterMSG(ShopItemBooster):
 
 
 class ShopItemBoosterPerMin(ShopItemBooster):
-    def calculate_price(self, owned_boosters_count=0):
-        """Custom logic to calculate the price for per-minute boosters."""
-        price = self.base_price
-        increment = 20
-        for _ in range(owned_boosters_count):
-            price += increment
-            increment += 25
-        return price
+    increment_step = 25
 
     def display_info(self, amount=0, count=0):
         """Display information about the item."""
         return f"{amount/100}/MIN. ({count})"
 
 
-def get_items_for_sale() -> dict:
+def get_items_for_sale(boosters: list) -> dict:
     items_for_sale = list()
-    items_for_sale += get_boosters_for_sale()
+    items_for_sale += get_boosters_for_sale(boosters)
     shop_items = {}
     for i, item in enumerate(items_for_sale):
         shop_items[f'item{i}'] = item
     return shop_items
 
 
-def get_boosters_for_sale() -> List[Union[ShopItemBoosterMSG, ShopItemBoosterPerMin]]:
-    boosters = BoosterCRUD.get_all_boosters()
+def get_boosters_for_sale(boosters: list) -> List[Union[ShopItemBoosterMSG, ShopItemBoosterPerMin]]:
     boosters_for_sale = list()
     for b in boosters:
         if b.booster_type == 1:
@@ -80,4 +99,11 @@ def get_boosters_for_sale() -> List[Union[ShopItemBoosterMSG, ShopItemBoosterPer
     return boosters_for_sale
 
 
-SHOP_ITEMS = get_items_for_sale()
+def load_shop_items(boosters: list) -> None:
+    """Fill SHOP_ITEMS from the booster catalogue at startup."""
+    SHOP_ITEMS.clear()
+    SHOP_ITEMS.update(get_items_for_sale(boosters))
+
+
+SHOP_ITEMS = {}
+BUY_QUANTITIES = ('1', '10', 'max')
@@ -3,9 +3,13 @@ import xml.etree.ElementTree as ET
 import time
 import json
 import os
+from typing import Optional
 from config import logger
+from modules.http_client import http_client
 from telegram.helpers import escape_markdown
 
+STEAM_EVENTS_URL = "https://www.steamcardexchange.net/include/rss/events.xml"
+
 
 class SteamEvents:
     def __init__(self, filename=None):
@@ -16,10 +20,16 @@ class SteamEvents:
             self.filename = os.path.join(current_dir, "steam_events.json")
 
     @staticmethod
-    def get_last_events() -> bytes:
-        url = "https://www.steamcardexchange.net/include/rss/events.xml"
-        response = requests.get(url)
-        if response.status_code == 200:
+    def get_last_events() -> Optional[bytes]:
+        """
+        :return: the feed, None if it hasn't changed since the last poll or couldn't be fetched
+        """
+        try:
+            response = http_client.get(STEAM_EVENTS_URL)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to fetch the Steam events: {e}")
+            return None
+        if response.status_code == 200 and response.changed:
             return response.content
 
     @staticmethod
@@ -67,13 +77,14 @@ class SteamEvents:
         logger.debug('Steam events loop started')
         while True:
             response_content = self.get_last_events()
-            fetched_events = self.format_response(response_content)
-            saved_events = self.read_from_file()
-            if fetched_events != saved_events:
-                new_events = self.get_new_events(fetched_events, saved_events)
-                print(new_events)
-                self.print_new_events(new_events, tg_bot)
-                self.save_to_file(new_events)
+            if response_content is not None:
+                fetched_events = self.format_response(response_content)
+                saved_events = self.read_from_file()
+                if fetched_events != saved_events:
+                    new_events = self.get_new_events(fetched_events, saved_events)
+                    print(new_events)
+                    self.print_new_events(new_events, tg_bot)
+                    self.save_to_file(new_events)
 
             logger.debug('Steam events loop sleeping')
             time.sleep(3600)
@@ -0,0 +1,99 @@
+"""
+Giveaway winner selection.
+
+Participants are streamed through a reservoir of k slots, so drawing k winners out of n participants takes one
+pass in O(n) time and O(k) memory whatever n is. Uniform draws use Li's Algorithm L, which jumps straight to the
+next participant that enters the reservoir instead of rolling for every one of them. Weighted draws use the
+Efraimidis-Spirakis A-Res reservoir: each participant gets the key u ** (1 / weight), the k largest keys win.
+Either way the reservoir holds min(k, n) distinct participants, and every gift goes to exactly one of them.
+"""
+import heapq
+import itertools
+import math
+import random
+from typing import Generic, Iterable, List, Sequence, Tuple, TypeVar
+
+T = TypeVar('T')
+G = TypeVar('G')
+
+
+def _open_uniform(rng: random.Random) -> float:
+    """Uniform in (0, 1), safe to take the log of."""
+    u = rng.random()
+    while u == 0.0:
+        u = rng.random()
+    return u
+
+
+class Reservoir(Generic[T]):
+    """Uniform random sample of `k` items of a stream of unknown length."""
+
+    def __init__(self, k: int, rng: random.Random = random):
+        self.k = k
+        self.rng = rng
+        self.items: List[T] = []
+        self.seen = 0
+        self._w = 1.0
+        self._next = k - 1  # stream position of the next item that replaces a sampled one
+
+    def _advance(self) -> None:
+        self._w *= math.exp(math.log(_open_uniform(self.rng)) / self.k)
+        self._next += math.floor(math.log(_open_uniform(self.rng)) / math.log1p(-self._w)) + 1
+
+    def extend(self, chunk: Sequence[T]) -> None:
+        """Feed the next items of the stream."""
+        start, end = self.seen, self.seen + len(chunk)
+        fill = min(max(self.k - len(self.items), 0), len(chunk))
+        if fill:
+            self.items.extend(chunk[:fill])
+            if len(self.items) == self.k:
+                self._advance()
+        while self.k and len(self.items) == self.k and self._next < end:
+            self.items[self.rng.randrange(self.k)] = chunk[self._next - start]
+            self._advance()
+        self.seen = end
+
+
+class WeightedReservoir(Generic[T]):
+    """Random sample of `k` items of a stream, each drawn with a probability proportional to its weight."""
+
+    def __init__(self, k: int, rng: random.Random = random):
+        self.k = k
+        self.rng = rng
+        self.seen = 0
+        self._heap: List[Tuple[float, int, T]] = []  # (log key, stream position, item), smallest key on top
+
+    @property
+    def items(self) -> List[T]:
+        return [item for *_, item in self._heap]
+
+    def extend(self, chunk: Iterable[Tuple[T, float]]) -> None:
+        """Feed the next (item, weight) pairs of the stream. Items with no positive weight are never drawn."""
+        heap, k = self._heap, self.k
+        for position, (item, weight) in enumerate(chunk, self.seen):
+            self.seen = position + 1
+            if weight <= 0 or not k:
+                continue
+            key = math.log(_open_uniform(self.rng)) / weight
+            if len(heap) < k:
+                heapq.heappush(heap, (key, position, item))
+            elif key > heap[0][0]:
+                heapq.heapreplace(heap, (key, position, item))
+
+
+def pair_gifts(winners: List[T], gifts: Sequence[G], rng: random.Random = random) -> List[Tuple[T, G]]:
+    """Hand out the gifts to the sampled winners in random order, one gift each."""
+    gifts = list(gifts)
+    rng.shuffle(gifts)
+    winners = list(winners)
+    rng.shuffle(winners)
+    return list(zip(winners, gifts))
+
+
+def draw(participants: Iterable[T], k: int, rng: random.Random = random) -> List[T]:
+    """Uniform sample of min(k, n) of `participants` in one pass."""
+    reservoir = Reservoir(k, rng)
+    iterator = iter(participants)
+    while chunk := list(itertools.islice(iterator, 1024)):
+        reservoir.extend(chunk)
+    return reservoir.items
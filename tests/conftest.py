@@ -0,0 +1,31 @@
+import pytest
+
+from db.database import Session, AsyncSession, create_engines, engine, async_engine
+from db.memory import MemoryStore
+from db.migrations import migrate
+from db.repository import repo
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Bind the sessions to a migrated database of its own for one test, then back to the configured one."""
+    test_engine, test_async_engine = create_engines(str(tmp_path / "test.db"))
+    migrate(test_engine)
+    Session.configure(bind=test_engine)
+    AsyncSession.configure(bind=test_async_engine)
+    try:
+        yield test_engine, test_async_engine
+    finally:
+        Session.configure(bind=engine)
+        AsyncSession.configure(bind=async_engine)
+
+
+@pytest.fixture
+def store():
+    """Serve the repositories from an empty in-memory store for one test, then from SQLAlchemy again."""
+    store = MemoryStore()
+    repo.use_memory(store)
+    try:
+        yield store
+    finally:
+        repo.use_sqlalchemy()
@@ -0,0 +1,27 @@
+import asyncio
+
+from sqlalchemy import text
+
+from db.async_crud import AsyncUserCRUD, AsyncUsersBoostersCRUD
+from db.crud import BoosterCRUD, UsersBoostersCRUD
+from db.models import Booster
+from modules.shop import ShopItemBoosterMSG, ShopItemBoosterPerMin
+
+
+def test_bonus_checker_reports_only_out_of_date_bonus_columns(database):
+    test_engine, _ = database
+    BoosterCRUD.add_boosters([Booster(id=1, booster_name="Keyboard", booster_type=1, bonus_amount=2, base_price=0),
+                              Booster(id=2, booster_name="Miner", booster_type=2, bonus_amount=3, base_price=0)])
+
+    async def run():
+        for user_id in (1, 2):
+            await AsyncUserCRUD.create_user(user_id, f"user{user_id}", f"User {user_id}")
+        await AsyncUsersBoostersCRUD.buy_boosters(1, ShopItemBoosterMSG(1, "Keyboard", 0, 1, 2), 2)
+        await AsyncUsersBoostersCRUD.buy_boosters(1, ShopItemBoosterPerMin(2, "Miner", 0, 2, 3), 1)
+
+    asyncio.run(run())
+    assert UsersBoostersCRUD.get_bonus_mismatches() == []
+
+    with test_engine.begin() as connection:
+        connection.execute(text("INSERT INTO users_boosters (user_id, booster_id, amount) VALUES (2, 2, 4)"))
+    assert UsersBoostersCRUD.get_bonus_mismatches() == [(2, 0, 0, 0, 12)]
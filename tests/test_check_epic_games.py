@@ -1,13 +1,15 @@
 import datetime
+import json
 import time
 
 import pytest
 import requests
-from epicstore_api import EpicGamesStoreAPI
 from telegram.helpers import escape_markdown
 
 from config import message_queue
+from modules import epic_games
 from modules.epic_games import EGSFreeGames
+from modules.http_client import FeedResponse
 
 test_free_games_data = {
     "current": [
@@ -130,10 +132,10 @@ class MockEpicGamesStoreAPI:
 
 
 def test_get_free_games_success(monkeypatch):
-    def mock_get_free_games(*args, **kwargs):
-        return test_free_games_data
+    def mock_get_free_games(url):
+        return FeedResponse(url, 200, json.dumps(test_free_games_data).encode(), True)
 
-    monkeypatch.setattr(EpicGamesStoreAPI, "get_free_games", mock_get_free_games)
+    monkeypatch.setattr(epic_games.http_client, "get", mock_get_free_games)
     egs = EGSFreeGames()
     result = egs.get_free_games()
     assert result == test_free_games_data
@@ -143,7 +145,7 @@ def test_get_free_games_fail(monkeypatch):
     def mock_raise_connection_error(*args, **kwargs):
         raise requests.exceptions.ConnectionError("Test connection error")
 
-    monkeypatch.setattr(EpicGamesStoreAPI, "get_free_games", mock_raise_connection_error)
+    monkeypatch.setattr(epic_games.http_client, "get", mock_raise_connection_error)
     egs = EGSFreeGames()
     result = egs.get_free_games()
     assert result == {}
@@ -1,8 +1,9 @@
 import time
 
 from telegram.helpers import escape_markdown
+from modules import steam_events
+from modules.http_client import FeedResponse
 from modules.steam_events import SteamEvents
-import requests
 
 test_response_content = """<rss xmlns:sy="http://purl.org/rss/1.0/modules/syndication/" xmlns:media="http://search.yahoo.com/mrss/" version="2.0">
 <channel>
@@ -75,17 +76,11 @@ test_response_content = """<rss xmlns:sy="http://purl.org/rss/1.0/modules/syndic
 </rss>"""
 
 
-class MockResponse:
-    def __init__(self, content, status_code):
-        self.content = content
-        self.status_code = status_code
-
-
 def test_get_last_events_success(monkeypatch):
-    def mock_get(*args, **kwargs):
-        return MockResponse(test_response_content, 200)
+    def mock_get(url):
+        return FeedResponse(url, 200, test_response_content, True)
 
-    monkeypatch.setattr(requests, "get", mock_get)
+    monkeypatch.setattr(steam_events.http_client, "get", mock_get)
     se = SteamEvents()
     result = se.get_last_events()
     assert result == test_response_content
@@ -0,0 +1,43 @@
+import asyncio
+
+from db.cooldowns import CooldownEngine
+from db.repository import repo
+
+
+def test_least_recently_used_entry_is_evicted_and_reloaded(store):
+    engine = CooldownEngine(cooldowns={1: 60}, max_entries=2)
+    store.last_actions.update({(1, 1): 1000, (2, 1): 1000, (3, 1): 1000})
+    loads = []
+    get_last_action = repo.actions.get_last_action
+
+    async def counted(user_id, action_id):
+        loads.append(user_id)
+        return await get_last_action(user_id, action_id)
+
+    repo.actions.get_last_action = counted
+
+    async def run():
+        checks = [await engine.check(user_id, 1, now=1030) for user_id in (1, 2, 1, 3)]
+        cached = list(engine._last)
+        checks.append(await engine.check(2, 1, now=1030))
+        checks.append(await engine.check(1, 1, now=1070))
+        return checks, cached
+
+    checks, cached = asyncio.run(run())
+    assert checks == [30, 30, 30, 30, 30, True]
+    assert cached == [(1, 1), (3, 1)]
+    assert loads == [1, 2, 3, 2, 1]
+
+
+def test_evicted_entry_keeps_its_unflushed_touch(store):
+    engine = CooldownEngine(cooldowns={1: 60}, max_entries=1)
+
+    async def run():
+        engine.touch(1, 1, now=1000)
+        engine.touch(2, 1, now=1000)
+        evicted = await engine.check(1, 1, now=1030)
+        flushed = await engine.flush()
+        return evicted, flushed
+
+    assert asyncio.run(run()) == (30, 2)
+    assert store.last_actions == {(1, 1): 1000, (2, 1): 1000}
@@ -0,0 +1,32 @@
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+from config import STORAGE_POOL_SIZE, STORAGE_MAX_OVERFLOW, STORAGE_POOL_TIMEOUT
+from db.database import create_engines
+
+
+def test_both_engines_pool_connections_with_the_pragmas_applied(tmp_path):
+    sync_engine, async_engine = create_engines(str(tmp_path / "test.db"),
+                                               {'journal_mode': 'WAL', 'busy_timeout': 1234})
+    pools = (sync_engine.pool, async_engine.sync_engine.pool)
+    assert (type(pools[0]), type(pools[1])) == (QueuePool, AsyncAdaptedQueuePool)
+    for pool in pools:
+        assert (pool.size(), pool._max_overflow, pool._timeout) == \
+               (STORAGE_POOL_SIZE, STORAGE_MAX_OVERFLOW, STORAGE_POOL_TIMEOUT)
+
+    def pragmas(connection):
+        return [connection.execute(text(f"PRAGMA {name}")).scalar() for name in ('journal_mode', 'busy_timeout')]
+
+    for _ in range(2):
+        with sync_engine.connect() as connection:
+            assert pragmas(connection) == ['wal', 1234]
+
+    async def run():
+        async with async_engine.connect() as connection:
+            return await connection.run_sync(pragmas)
+
+    assert asyncio.run(run()) == ['wal', 1234]
+    assert (pools[0].checkedin(), pools[1].checkedin()) == (1, 1)
+    sync_engine.dispose()
@@ -0,0 +1,297 @@
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+import pytest
+from telegram.helpers import escape_markdown
+
+import main
+import methods
+from config import COINS_PER_MSG
+from db import ledger
+from db.cooldowns import CooldownEngine
+from db.leaderboards import leaderboards
+from db.members import members
+from db.participation import participation
+from db.models import Booster
+from db.repository import repo
+from db.shop_views import shop_views
+from modules.level_curve import MAX_XP_GRANT
+from modules.shop import load_shop_items, SHOP_ITEMS
+
+CHAT_ID = -100
+HOUR = datetime.timedelta(hours=1)
+BOOSTERS = [Booster(id=1, booster_name="Keyboard", booster_type=1, bonus_amount=1, base_price=100),
+            Booster(id=2, booster_name="Miner", booster_type=2, bonus_amount=1, base_price=500)]
+
+
+class FakeMessage:
+    def __init__(self, user_id: int, text: str = "hi"):
+        self.from_user = SimpleNamespace(id=user_id, username=f"user{user_id}", first_name=f"User {user_id}",
+                                         last_name=None, full_name=f"User {user_id}")
+        self.chat_id = CHAT_ID
+        self.chat = SimpleNamespace(id=CHAT_ID)
+        self.text = text
+        self.replies = []
+
+    async def reply_text(self, text=None, **kwargs):
+        self.replies.append(text)
+        return self
+
+    async def delete(self):
+        pass
+
+    async def edit_reply_markup(self, reply_markup=None, **kwargs):
+        self.replies.append(reply_markup.inline_keyboard[0][0].text)
+
+
+class FakeCallbackQuery:
+    def __init__(self, user_id: int, data: str):
+        self.from_user = SimpleNamespace(id=user_id)
+        self.message = FakeMessage(user_id)
+        self.data = data
+        self.answers = []
+        self.edits = []
+
+    async def answer(self, text=None, **kwargs):
+        self.answers.append(text)
+
+    async def edit_message_text(self, text, **kwargs):
+        self.edits.append(text)
+
+
+def message_update(user_id: int, text: str = "hi"):
+    return SimpleNamespace(message=FakeMessage(user_id, text), callback_query=None,
+                           effective_chat=SimpleNamespace(type="supergroup", id=CHAT_ID),
+                           effective_user=SimpleNamespace(id=user_id))
+
+
+def callback_update(user_id: int, data: str):
+    return SimpleNamespace(message=None, callback_query=FakeCallbackQuery(user_id, data),
+                           effective_chat=SimpleNamespace(type="supergroup", id=CHAT_ID),
+                           effective_user=SimpleNamespace(id=user_id))
+
+
+def context():
+    return SimpleNamespace(args=[], user_data={}, job_queue=SimpleNamespace(run_once=lambda *args, **kwargs: None))
+
+
+@pytest.fixture
+def bot(store, monkeypatch):
+    store.boosters.update((booster.id, booster) for booster in BOOSTERS)
+    members.load([])
+    leaderboards.clear()
+    shop_views.clear()
+    participation.clear()
+    load_shop_items(BOOSTERS)
+    monkeypatch.setattr(methods, "cooldowns", CooldownEngine())
+    yield main.TelegramBot("123:abc", CHAT_ID)
+    SHOP_ITEMS.clear()
+
+
+def test_messages_are_rewarded_once_per_cooldown(bot):
+    async def run():
+        for _ in range(3):
+            await bot.text_handler(message_update(1), context())
+        await bot.text_handler(message_update(2), context())
+        await bot.rewards.flush()
+        return await repo.users.get_user_balance(1), await repo.users.get_user_balance(2)
+
+    assert asyncio.run(run()) == (2 * COINS_PER_MSG, 2 * COINS_PER_MSG)
+    assert sorted(members.ids()) == [1, 2]
+
+
+def test_balance_and_level_replies(bot):
+    async def run():
+        await bot.text_handler(message_update(1), context())
+        await bot.rewards.flush()
+        balance, level = message_update(1), message_update(1)
+        await bot.balance_handler(balance, context())
+        await bot.level_handler(level, context())
+        return balance.message.replies, level.message.replies
+
+    balance_replies, level_replies = asyncio.run(run())
+    assert balance_replies == [f"Balance: *{escape_markdown(str(2 * COINS_PER_MSG / 100), 2)}*"]
+    assert level_replies[0].startswith("Level: 0")
+
+
+def test_shop_purchase_pays_and_adds_booster(bot):
+    async def run():
+        ctx = context()
+        await bot.shop_handler(message_update(1), ctx)
+        await repo.users.add_coins(1, 1000, ledger.GIVEAWAY)
+        query = callback_update(1, "buy_item0")
+        await bot.buy_callback(query, ctx)
+        return query.callback_query.answers, await repo.users.get_user_balance(1), \
+            await repo.boosters.get_booster_count(1, 1), await repo.users.get_boosters_amount(1)
+
+    answers, balance, count, (per_msg, per_min) = asyncio.run(run())
+    assert answers == ["You've successfully purchased Keyboard!"]
+    assert balance == 900
+    assert count == 1
+    assert (per_msg, per_min) == (COINS_PER_MSG + 1, 0)
+
+
+def test_shop_is_rendered_once_until_a_purchase(bot, monkeypatch):
+    async def run():
+        ctx = context()
+        await repo.users.create_user(1, "user1", "User 1")
+        await repo.users.add_coins(1, 1000, ledger.GIVEAWAY)
+        first = message_update(1)
+        await bot.shop_handler(first, ctx)
+        monkeypatch.setattr(repo.boosters, "get_shop_view", None)
+        again = message_update(1)
+        await bot.shop_handler(again, ctx)
+        monkeypatch.undo()
+        query = callback_update(1, "buy_item0")
+        await bot.buy_callback(query, ctx)
+        return first.message.replies, again.message.replies, query.callback_query.edits
+
+    first, again, edits = asyncio.run(run())
+    assert again == first
+    assert first[0].endswith("Keyboard - 1.0 💵\n\t\t\t0.01/MSG. (0)\n2. Miner - 5.0 💵\n\t\t\t0.01/MIN. (0)\n\n"
+                             "Your balance: 10.0 coins")
+    assert "Keyboard - 1.2 💵\n\t\t\t0.01/MSG. (1)" in edits[0] and edits[0].endswith("Your balance: 9.0 coins")
+
+
+def test_bulk_purchases_buy_ten_and_as_many_as_affordable(bot):
+    item = SHOP_ITEMS["item1"]
+
+    async def run():
+        ctx = context()
+        await bot.shop_handler(message_update(1), ctx)
+        await repo.users.add_coins(1, item.total_price(0, 10) + item.total_price(10, 3) + 1, ledger.GIVEAWAY)
+        ten, most = callback_update(1, "buy_item1_10"), callback_update(1, "buy_item1_max")
+        await bot.buy_callback(ten, ctx)
+        await bot.buy_callback(most, ctx)
+        return ten.callback_query.answers + most.callback_query.answers, await repo.users.get_user_balance(1), \
+            await repo.boosters.get_booster_count(1, 2), await repo.users.get_boosters_amount(1)
+
+    answers, balance, count, (_, per_min) = asyncio.run(run())
+    assert answers == ["You've successfully purchased 10 × Miner!", "You've successfully purchased 3 × Miner!"]
+    assert (balance, count, per_min) == (1, 13, 13)
+
+
+def test_give_xp_replies_with_usage_on_a_malformed_amount(bot, monkeypatch):
+    monkeypatch.setattr(methods, "ADMINS", [1])
+
+    async def run():
+        await bot.text_handler(message_update(2), context())
+        replies = []
+        for args in (["--5"], ["-"], ["5x"], ["-30"]):
+            update = message_update(1, "/give_xp")
+            update.message.reply_to_message = FakeMessage(2)
+            ctx = context()
+            ctx.args = args
+            await bot.give_xp_handler(update, ctx)
+            replies += update.message.replies
+        return replies
+
+    replies = asyncio.run(run())
+    assert replies[:3] == ["Reply to a message with /give_xp <amount>"] * 3
+    assert replies[3].startswith("User 2: -30 XP")
+
+
+def test_give_xp_rejects_an_out_of_range_amount(bot, monkeypatch):
+    monkeypatch.setattr(methods, "ADMINS", [1])
+
+    async def run():
+        await bot.text_handler(message_update(2), context())
+        replies = []
+        for amount in (MAX_XP_GRANT + 1, -MAX_XP_GRANT - 1, 2 ** 63):
+            update = message_update(1, "/give_xp")
+            update.message.reply_to_message = FakeMessage(2)
+            ctx = context()
+            ctx.args = [str(amount)]
+            await bot.give_xp_handler(update, ctx)
+            replies += update.message.replies
+        return replies, await repo.levels.get_total_xp()
+
+    replies, totals = asyncio.run(run())
+    assert replies == [f"The amount must be between -{MAX_XP_GRANT} and {MAX_XP_GRANT}"] * 3
+    assert all(total_xp < MAX_XP_GRANT for _, total_xp in totals)
+
+
+def test_unknown_chat_is_ignored(bot):
+    update = message_update(1)
+    update.message.chat_id = 12345
+    asyncio.run(bot.balance_handler(update, context()))
+    assert update.message.replies == []
+    assert 1 not in members
+
+
+def test_rank_and_coin_rating_follow_rewards(bot):
+    async def run():
+        for user_id in (1, 2, 3):
+            await bot.text_handler(message_update(user_id), context())
+        await bot.rewards.flush()
+        await repo.users.add_coins(2, 500, ledger.GIVEAWAY)
+        rank, rating = message_update(3), message_update(1, "/rating coins")
+        await bot.rank_handler(rank, context())
+        ctx = context()
+        ctx.args = ["coins"]
+        await bot.rating_handler(rating, ctx)
+        return rank.message.replies[0], rating.message.replies[0]
+
+    rank_reply, rating_reply = asyncio.run(run())
+    assert "Week: \\#" in rank_reply and "of 3" in rank_reply
+    lines = rating_reply.splitlines()
+    assert len(lines) == 3
+    assert "tg://user?id=2" in lines[0]
+
+
+def test_overdue_giveaways_are_announced_on_startup(bot, monkeypatch):
+    sent = []
+
+    async def send_message(text, reply_message=None, parse_mode=None):
+        sent.append((reply_message, text))
+
+    async def edit_caption(chat_id, message_id, text, parse_mode=None):
+        sent.append((message_id, text))
+
+    monkeypatch.setattr(bot, "bot_send_message", send_message)
+    monkeypatch.setattr(bot, "bot_edit_message_caption", edit_caption)
+
+    async def run():
+        await repo.users.create_user(1, "user1", "User 1")
+        ended = await repo.giveaways.create_giveaway("COINS", "ended", datetime.datetime.now() - HOUR,
+                                                     [{"name": "coins", "amount": 10}], message_id=7)
+        upcoming = await repo.giveaways.create_giveaway("COINS", "upcoming", datetime.datetime.now() + HOUR,
+                                                        [{"name": "coins", "amount": 10}], message_id=8)
+        await repo.giveaways.add_participant(1, ended)
+        await main.schedule_giveaways(bot)
+        bot.giveaway_timers.start()
+        await bot.giveaway_timers.stop()
+        active = [giveaway.id for giveaway in await repo.giveaways.get_all_giveaways()]
+        return ended not in bot.giveaway_timers, upcoming in bot.giveaway_timers, active == [upcoming], \
+            await repo.users.get_user_balance(1)
+
+    assert asyncio.run(run()) == (True, True, True, 1000)
+    assert [message_id for message_id, _ in sent] == [7, 7]
+    assert "tg://user?id=1" in sent[1][1] and "wins 10x coins" in sent[1][1]
+
+
+def test_participation_rush_is_counted_in_coalesced_edits(bot, monkeypatch):
+    monkeypatch.setattr(participation, "edit_interval", 0.05)
+
+    async def run():
+        giveaway_id = await repo.giveaways.create_giveaway("COINS", "rush", datetime.datetime.now() + HOUR,
+                                                           [{"name": "coins", "amount": 10}], message_id=7)
+        ended = await repo.giveaways.create_giveaway("COINS", "ended", datetime.datetime.now() - HOUR,
+                                                     [{"name": "coins", "amount": 10}], message_id=8)
+        taps = [callback_update(user_id, f"GIVEAWAY_PARTICIPATE_{giveaway_id}") for user_id in (1, 2, 3, 1, 4)]
+        taps.append(callback_update(5, f"GIVEAWAY_PARTICIPATE_{ended}"))
+        for rush in (taps[:4], taps[4:]):
+            for tap in rush:
+                await bot.participate_callback(tap, context())
+            await asyncio.sleep(0.1)
+        edits = [reply for tap in taps for reply in tap.callback_query.message.replies]
+        return [tap.callback_query.answers[0] for tap in taps], edits, \
+            await repo.giveaways.get_participant_count(giveaway_id)
+
+    answers, edits, count = asyncio.run(run())
+    assert answers[3] == "You have already participated in this giveaway."
+    assert answers[5] == "Sorry, the giveaway has ended."
+    assert answers.count("You have successfully participated in the giveaway") == 4
+    assert edits == ["Participate (3)", "Participate (4)"]
+    assert count == 4
@@ -0,0 +1,35 @@
+import asyncio
+
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+
+from config import ACTION_COOLDOWNS
+from db import ledger
+from db.async_crud import AsyncUserCRUD, AsyncUserActionCRUD, AsyncUserLevelCRUD
+from db.crud import ActionCooldownCRUD
+from db.hot_queries import USER_PROFILE, USER_BALANCE, LEVEL_BY_USER, LAST_ACTION, ACTION_COOLDOWN
+
+
+def test_prebuilt_lookups_are_compiled_once_and_bind_their_parameters(database):
+    test_engine, _ = database
+    ActionCooldownCRUD.add_actions()
+
+    async def run():
+        for user_id in (1, 2):
+            await AsyncUserCRUD.create_user(user_id, f"user{user_id}", f"User {user_id}")
+        await AsyncUserCRUD.add_coins(2, 40, ledger.GIVEAWAY)
+        await AsyncUserLevelCRUD.grant_xp({1: 10, 2: 20})
+        await AsyncUserActionCRUD.save_last_actions({(1, 1): 1000, (2, 1): 2000})
+
+    asyncio.run(run())
+    with test_engine.connect() as connection:
+        for statement, params in ((USER_PROFILE, {}), (USER_BALANCE, {}), (LEVEL_BY_USER, {}),
+                                  (LAST_ACTION, {'action_id': 1})):
+            results = [connection.execute(statement, {'user_id': user_id, **params}) for user_id in (1, 2, 1)]
+            assert [result.context.cache_hit for result in results] == [CACHE_MISS, CACHE_HIT, CACHE_HIT]
+            first, second, again = (result.all() for result in results)
+            assert first == again != second
+        assert connection.execute(USER_PROFILE, {'user_id': 2}).one() == (2, "user2", "User 2")
+        assert connection.execute(USER_BALANCE, {'user_id': 2}).one()[:2] == (40, 0)
+        assert connection.execute(LAST_ACTION, {'user_id': 2, 'action_id': 1}).scalar() == 2000
+        for action_id, cooldown in ACTION_COOLDOWNS.items():
+            assert connection.execute(ACTION_COOLDOWN, {'action_id': action_id}).scalar() == cooldown
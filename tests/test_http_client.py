@@ -0,0 +1,101 @@
+import datetime
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from modules import epic_games, steam_events
+from modules.epic_games import EGSFreeGames
+from modules.http_client import HttpClient
+from modules.steam_events import SteamEvents
+
+
+class FeedServer(ThreadingHTTPServer):
+    """Local feed that answers 304 to a request carrying the ETag of its current body."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FeedHandler)
+        self.body = b"<rss><channel></channel></rss>"
+        self.etag = '"v1"'
+        self.requests = []  # (status, client port)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/events.xml"
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        status = 304 if self.headers.get("If-None-Match") == server.etag else 200
+        server.requests.append((status, self.client_address[1]))
+        self.send_response(status)
+        self.send_header("ETag", server.etag)
+        self.send_header("Content-Length", str(len(server.body) if status == 200 else 0))
+        self.end_headers()
+        if status == 200:
+            self.wfile.write(server.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def feed():
+    server = FeedServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_unchanged_feed_is_revalidated_over_one_connection(feed, tmp_path):
+    client = HttpClient(cache_dir=str(tmp_path), timeout=5)
+    first = client.get(feed.url)
+    second = client.get(feed.url)
+    assert (first.status_code, first.changed, first.content) == (200, True, feed.body)
+    assert (second.status_code, second.changed, second.content) == (304, False, feed.body)
+
+    feed.body, feed.etag = b"<rss><channel><item/></channel></rss>", '"v2"'
+    third = client.get(feed.url)
+    assert (third.changed, third.content) == (True, feed.body)
+    client.close()
+
+    assert [status for status, _ in feed.requests] == [200, 304, 200]
+    assert len({port for _, port in feed.requests}) == 1
+
+
+def test_cache_survives_a_restart(feed, tmp_path):
+    HttpClient(cache_dir=str(tmp_path), timeout=5).get(feed.url)
+    restarted = HttpClient(cache_dir=str(tmp_path), timeout=5).get(feed.url)
+    assert (restarted.status_code, restarted.changed, restarted.content) == (304, False, feed.body)
+
+
+def test_steam_events_skip_an_unchanged_feed(feed, tmp_path, monkeypatch):
+    monkeypatch.setattr(steam_events, "http_client", HttpClient(cache_dir=str(tmp_path), timeout=5))
+    monkeypatch.setattr(steam_events, "STEAM_EVENTS_URL", feed.url)
+    assert SteamEvents.get_last_events() == feed.body
+    assert SteamEvents.get_last_events() is None
+
+
+def test_free_games_are_filtered_again_on_an_unchanged_feed(feed, tmp_path, monkeypatch):
+    promotion = {"title": "Game", "productSlug": "game", "promotions": {"promotionalOffers": []},
+                 "effectiveDate": "2030-09-05T15:00:00.000Z", "expiryDate": "2030-09-12T15:00:00.000Z",
+                 "price": {"totalPrice": {"discountPrice": 0}},
+                 "keyImages": [{"type": "DieselStoreFrontWide", "url": "https://example.com/game.jpg"}]}
+    feed.body = json.dumps({"data": {"Catalog": {"searchStore": {"elements": [promotion]}}}}).encode()
+    monkeypatch.setattr(epic_games, "http_client", HttpClient(cache_dir=str(tmp_path), timeout=5))
+    monkeypatch.setattr(epic_games, "FREE_GAMES_URL", feed.url)
+    egs = EGSFreeGames()
+
+    fetched, cached = egs.get_free_games(), egs.get_free_games()
+    assert [status for status, _ in feed.requests] == [200, 304]
+    assert cached is fetched
+    before = egs.format_response(cached, datetime.datetime(2030, 9, 1))
+    after = egs.format_response(cached, datetime.datetime(2030, 9, 6))
+    assert before["current"] == []
+    assert [game["title"] for game in after["current"]] == ["Game"]
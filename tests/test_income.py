@@ -0,0 +1,36 @@
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from db import ledger
+from db.async_crud import AsyncUserCRUD
+from db.models import User
+
+
+def test_income_accrues_by_whole_minutes_and_settles_the_closed_ones():
+    user = User(user_id=1, user_coins=10, coins_per_min_bonus=5, income_settled_at=1000)
+    assert [user.balance(now) for now in (999, 1000, 1059, 1060, 1119, 1120)] == [10, 10, 10, 15, 15, 20]
+
+    assert user.settle_income(1090) == 5
+    assert user.income_settled_at == 1060
+    assert user.accrued_coins(1119) == 0
+    assert user.accrued_coins(1120) == 5
+    assert user.settle_income(1100) == 0
+    assert user.income_settled_at == 1060
+
+
+def test_accrued_income_is_read_and_spent_without_being_settled(database):
+    test_engine, _ = database
+
+    async def run():
+        await AsyncUserCRUD.create_user(1, "user1", "User 1")
+        with test_engine.begin() as connection:
+            connection.execute(text("UPDATE users SET coins_per_min_bonus = 5, income_settled_at = :settled_at"),
+                               {'settled_at': int(time.time()) - 150})
+        return await AsyncUserCRUD.get_user_balance(1), await AsyncUserCRUD.debit_coins(1, 11, ledger.SHOP), \
+            await AsyncUserCRUD.debit_coins(1, 10, ledger.SHOP)
+
+    assert asyncio.run(run()) == (10, None, 0)
+    with test_engine.connect() as connection:
+        assert connection.execute(text("SELECT amount, reason FROM coin_ledger")).all() == [(-10, ledger.SHOP)]
@@ -0,0 +1,47 @@
+import random
+
+from db.leaderboards import Board, Leaderboards, epoch_day
+
+DAY = 86400
+
+
+def test_board_matches_sorted_scores():
+    rng = random.Random(7)
+    board, scores = Board(), {}
+    for _ in range(3000):
+        user_id = rng.randrange(300)
+        if rng.random() < 0.1:
+            board.remove(user_id)
+            scores.pop(user_id, None)
+        else:
+            score = rng.randrange(1000)
+            board.set(user_id, score)
+            scores[user_id] = score
+
+    expected = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    assert board.page(len(expected) + 5) == expected
+    assert board.page(10, offset=20) == expected[20:30]
+    for position, (user_id, _) in enumerate(expected, start=1):
+        assert board.rank(user_id) == position
+    assert board.rank(10 ** 6) is None
+
+
+def test_weekly_board_drops_days_outside_the_window():
+    now = 100 * DAY + 10
+    leaderboards = Leaderboards()
+    leaderboards.load([], [], [(1, epoch_day(now) - 6, 5), (2, epoch_day(now) - 7, 9)], now)
+    leaderboards.count_messages([(2, now), (3, now), (3, now)])
+
+    assert leaderboards.board('week', now).page(10) == [(1, 5), (3, 2), (2, 1)]
+    assert leaderboards.board('week', now + DAY).page(10) == [(3, 2), (2, 1)]
+
+
+def test_coin_board_follows_passive_income():
+    now = 1_000_000
+    leaderboards = Leaderboards()
+    leaderboards.load([], [(1, 500, 0, now), (2, 100, 10, now)], [], now)
+
+    assert leaderboards.board('coins', now).page(2) == [(1, 500), (2, 100)]
+    assert leaderboards.board('coins', now + 60 * 41).page(2) == [(2, 510), (1, 500)]
+    leaderboards.remove(2)
+    assert leaderboards.board('coins', now + 60 * 42).page(2) == [(1, 500)]
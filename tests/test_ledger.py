@@ -0,0 +1,70 @@
+import asyncio
+import datetime
+
+from sqlalchemy import text
+
+from db import ledger
+from db.async_crud import AsyncUserCRUD, AsyncGiveawayCRUD
+
+
+def test_balances_are_snapshots_plus_appended_entries(database):
+    test_engine, _ = database
+
+    async def run():
+        await AsyncUserCRUD.create_user(1, "user1", "User 1")
+        await AsyncUserCRUD.create_user(2, "user2", "User 2")
+        await AsyncUserCRUD.add_coins(1, 100, ledger.GIVEAWAY)
+        assert await AsyncUserCRUD.debit_coins(1, 30, ledger.ANIME) == 70
+        assert await AsyncUserCRUD.debit_coins(1, 71, ledger.ANIME) is None
+        await AsyncUserCRUD.add_coins(2, 5, ledger.BET_PAYOUT)
+        assert await AsyncUserCRUD.get_user_balance(1) == 70
+
+        assert await AsyncUserCRUD.compact_ledger() == 2
+        assert await AsyncUserCRUD.compact_ledger() == 0
+        await AsyncUserCRUD.add_coins(1, 1, ledger.MESSAGE)
+        assert await AsyncUserCRUD.get_user_balance(1) == 71
+        assert await AsyncUserCRUD.get_user_balance(2) == 5
+
+        history = await AsyncUserCRUD.get_coin_history(1, limit=2)
+        assert [(entry.amount, entry.reason) for entry in history] == [(1, ledger.MESSAGE), (-30, ledger.ANIME)]
+        older = await AsyncUserCRUD.get_coin_history(1, before_id=history[-1].id)
+        assert [(entry.amount, entry.reason) for entry in older] == [(100, ledger.GIVEAWAY)]
+        assert len(await AsyncUserCRUD.get_coin_ledger(0, 2 ** 31)) == 4
+
+    asyncio.run(run())
+    with test_engine.connect() as connection:
+        assert connection.execute(text("SELECT user_id, user_coins FROM users ORDER BY user_id")).all() == \
+               [(1, 70), (2, 5)]
+
+
+def test_concurrent_debits_never_overdraw(database):
+    async def run():
+        await AsyncUserCRUD.create_user(1, "user1", "User 1")
+        await AsyncUserCRUD.add_coins(1, 100, ledger.GIVEAWAY)
+        balances = await asyncio.gather(*(AsyncUserCRUD.debit_coins(1, 30, ledger.BET) for _ in range(8)))
+        return sorted(balance for balance in balances if balance is not None), await AsyncUserCRUD.get_user_balance(1)
+
+    assert asyncio.run(run()) == ([10, 40, 70], 10)
+
+
+def test_coin_giveaway_credits_winners_and_is_archived_once(database):
+    test_engine, _ = database
+
+    async def run():
+        for user_id in (1, 2, 3):
+            await AsyncUserCRUD.create_user(user_id, f"user{user_id}", f"User {user_id}")
+        giveaway_id = await AsyncGiveawayCRUD.create_giveaway("COINS", "coins", datetime.datetime.now(),
+                                                              [{"name": "coins", "amount": 50}] * 2)
+        for user_id in (1, 2, 3):
+            await AsyncGiveawayCRUD.add_participant(user_id, giveaway_id)
+        result = await AsyncGiveawayCRUD.end_giveaway(giveaway_id)
+        balances = [await AsyncUserCRUD.get_user_balance(user_id) for user_id in (1, 2, 3)]
+        return result, balances, await AsyncGiveawayCRUD.end_giveaway(giveaway_id), \
+            await AsyncGiveawayCRUD.get_all_giveaways()
+
+    result, balances, again, active = asyncio.run(run())
+    assert (result.participant_count, len(result.winners), again, active) == (3, 2, None, [])
+    assert sorted(balances) == [0, 5000, 5000]
+    with test_engine.connect() as connection:
+        assert sorted(connection.execute(text("SELECT winner_id FROM giveaway_gifts")).scalars()) == \
+               sorted(winner["winner"] for winner in result.winners)
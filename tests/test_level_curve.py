@@ -0,0 +1,48 @@
+import asyncio
+
+from db.async_crud import AsyncUserCRUD, AsyncUserLevelCRUD
+from modules.level_curve import level_for, total_xp_for, xp_needed, THRESHOLDS
+
+
+def test_level_for_matches_step_by_step_levelling():
+    level, xp, needed = 0, 0, 100
+    for total_xp in range(7, 50000, 7):
+        xp += 7
+        while xp >= needed:
+            xp -= needed
+            level += 1
+            needed = xp_needed(level)
+        assert level_for(total_xp) == (level, xp, needed)
+        assert total_xp_for(level, xp) == total_xp
+
+
+def test_level_for_beyond_precomputed_levels():
+    level, xp, needed = level_for(total_xp_for(5000, 1))
+    assert (level, xp, needed) == (5000, 1, xp_needed(5000))
+
+
+def test_huge_totals_leave_the_thresholds_alone():
+    precomputed = len(THRESHOLDS)
+    level, xp, needed = level_for(10 ** 30)
+    assert total_xp_for(level, xp) == 10 ** 30 and 0 <= xp < needed == xp_needed(level)
+    assert len(THRESHOLDS) == precomputed
+
+
+def test_grant_xp_applies_several_level_ups_atomically(database):
+    async def run():
+        await AsyncUserCRUD.create_user(1, "user1", "User 1")
+        await AsyncUserLevelCRUD.create_level(1)
+        big = await AsyncUserLevelCRUD.grant_xp({1: total_xp_for(3, 20), 2: 50})
+        taken = await AsyncUserLevelCRUD.grant_xp({1: -100})
+        cleared = await AsyncUserLevelCRUD.grant_xp({2: -1000})
+        level = await AsyncUserLevelCRUD.get_level(1)
+        top = await AsyncUserLevelCRUD.get_top_users()
+        return big, taken, cleared, (level.level, level.xp, level.xp_needed), top
+
+    big, taken, cleared, stored, top = asyncio.run(run())
+
+    assert big == {1: (3, 20, xp_needed(3)), 2: (0, 50, 100)}
+    assert taken == {1: level_for(total_xp_for(3, 20) - 100)}
+    assert cleared == {2: (0, 0, 100)}
+    assert stored == taken[1]
+    assert [entry.user_id for entry in top] == [1]
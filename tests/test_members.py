@@ -0,0 +1,27 @@
+import random
+
+from db.members import MembershipIndex
+
+
+def test_removal_moves_the_last_member_into_the_gap():
+    index = MembershipIndex()
+    index.load([1, 2, 3, 4, 2])
+    index.remove(2)
+    index.remove(5)
+    index.add(3)
+    assert index.ids() == [1, 4, 3]
+    assert (2 in index, 4 in index, len(index)) == (False, True, 3)
+    index.remove(3)
+    index.remove(1)
+    assert index.ids() == [4]
+    assert index._positions == {4: 0}
+
+
+def test_random_member_is_drawn_from_the_current_members():
+    index = MembershipIndex()
+    assert index.random_member() is None
+    index.load(range(10))
+    for user_id in range(0, 10, 2):
+        index.remove(user_id)
+    random.seed(1)
+    assert {index.random_member() for _ in range(200)} == {1, 3, 5, 7, 9}
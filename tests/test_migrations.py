@@ -0,0 +1,141 @@
+import asyncio
+import datetime
+
+from sqlalchemy import event, text
+
+from db import ledger
+from db.async_crud import AsyncUserCRUD, AsyncUserActionCRUD, AsyncUserLevelCRUD, AsyncUsersBoostersCRUD, \
+    AsyncGiveawayCRUD
+from db.database import Session, create_engines
+from db.migrations import migrate, load_migrations, get_version
+from db.models import Booster
+from modules.shop import ShopItemBoosterMSG
+
+UNVERSIONED_SCHEMA = [
+    "CREATE TABLE users (user_id INTEGER PRIMARY KEY, user_name VARCHAR UNIQUE, "
+    "user_nickname VARCHAR NOT NULL UNIQUE, user_coins INTEGER)",
+    "CREATE TABLE boosters (id INTEGER PRIMARY KEY, booster_name VARCHAR NOT NULL UNIQUE, booster_type INTEGER, "
+    "bonus_amount INTEGER, base_price INTEGER)",
+    "CREATE TABLE users_boosters (id INTEGER PRIMARY KEY, user_id INTEGER, booster_id INTEGER, amount INTEGER)",
+    "CREATE TABLE users_level (id INTEGER PRIMARY KEY, user_id INTEGER, level INTEGER, xp INTEGER, "
+    "xp_needed INTEGER)",
+    "CREATE TABLE giveaway_participants (id INTEGER PRIMARY KEY, user_id INTEGER, giveaway_id INTEGER)",
+    "CREATE TABLE user_action (id INTEGER PRIMARY KEY, action INTEGER, user INTEGER, last_time DATETIME NOT NULL, "
+    "UNIQUE (action, user))",
+    "INSERT INTO users VALUES (1, 'user1', 'User 1', 100)",
+    "INSERT INTO boosters VALUES (1, 'msg', 1, 2, 100), (2, 'min', 2, 3, 100)",
+    "INSERT INTO users_boosters (user_id, booster_id, amount) VALUES (1, 1, 1), (1, 1, 2), (1, 2, 1)",
+    "INSERT INTO users_level (user_id, level, xp, xp_needed) VALUES (1, 2, 10, 220), (1, 0, 0, 100)",
+    "INSERT INTO giveaway_participants (user_id, giveaway_id) VALUES (1, 1), (1, 1)",
+    "INSERT INTO user_action (action, user, last_time) VALUES (1, 1, '2023-08-29 15:00:01.500000')",
+]
+
+# whole-table reads by design, all made once at startup
+FULL_SCANS = ["SELECT users.user_id FROM users",
+              "SELECT users.user_id, users.user_coins + (SELECT coalesce(sum(coin_ledger.amount)",
+              "SELECT users_level.user_id, users_level.total_xp \nFROM users_level",
+              "SELECT user_message_days.user_id, user_message_days.day, user_message_days.messages \n"
+              "FROM user_message_days",
+              "DELETE FROM user_message_days"]
+
+
+def test_migrate_unversioned_database(tmp_path):
+    test_engine, _ = create_engines(str(tmp_path / "old.db"))
+    with test_engine.begin() as connection:
+        for statement in UNVERSIONED_SCHEMA:
+            connection.execute(text(statement))
+
+    head = load_migrations()[-1][0]
+    assert migrate(test_engine) == head
+    assert migrate(test_engine) == head
+
+    with test_engine.connect() as connection:
+        assert get_version(connection) == head
+        assert connection.execute(text(
+            "SELECT coins_per_msg_bonus, coins_per_min_bonus FROM users WHERE user_id = 1")).one() == (6, 3)
+        assert connection.execute(text("SELECT user_id, amount, reason FROM coin_ledger")).all() == \
+               [(1, 100, ledger.OPENING)]
+        assert connection.execute(text(
+            "SELECT booster_id, amount FROM users_boosters ORDER BY booster_id")).all() == [(1, 3), (2, 1)]
+        assert connection.execute(text("SELECT level, xp, total_xp FROM users_level")).all() == [(2, 10, 265)]
+        assert connection.execute(text("SELECT COUNT(*) FROM giveaway_participants")).scalar() == 1
+        assert connection.execute(text("SELECT last_time FROM user_action")).scalar() == \
+               int(datetime.datetime(2023, 8, 29, 15, 0, 1).timestamp())
+        for table in ("user_action", "users_boosters", "giveaway_participants"):
+            assert "WITHOUT ROWID" in connection.execute(text(
+                "SELECT sql FROM sqlite_master WHERE name = :table"), {"table": table}).scalar()
+
+
+def test_crud_queries_use_indexes(database):
+    test_engine, test_async_engine = database
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements.append((statement, parameters))
+
+    event.listen(test_engine, "before_cursor_execute", record)
+    event.listen(test_async_engine.sync_engine, "before_cursor_execute", record)
+
+    async def run_crud():
+        await AsyncUserCRUD.create_user(1, "user1", "User 1")
+        await AsyncUserCRUD.create_user(2, "user2", "User 2")
+        await AsyncUserLevelCRUD.create_level(1)
+        await AsyncUserCRUD.get_user_by_id(1)
+        await AsyncUserCRUD.get_user_id_by_username("user1")
+        await AsyncUserCRUD.get_all_user_ids()
+        await AsyncUserCRUD.apply_message_rewards([(1, 0), (2, 0)])
+        await AsyncUserCRUD.add_coins(1, 100, ledger.GIVEAWAY)
+        await AsyncUserCRUD.debit_coins(1, 10, ledger.SHOP)
+        await AsyncUserCRUD.compact_ledger()
+        await AsyncUserCRUD.add_coins(2, 5, ledger.GIVEAWAY)
+        await AsyncUserCRUD.get_user_balance(1)
+        await AsyncUserCRUD.get_coin_history(1, before_id=10)
+        await AsyncUserCRUD.get_coin_ledger(0, 2 ** 31)
+        await AsyncUserActionCRUD.update_action_time(1, 1)
+        await AsyncUserActionCRUD.get_last_action(1, 1)
+        await AsyncUserLevelCRUD.get_level(1)
+        await AsyncUserLevelCRUD.update_level(1, 1, 0, 155)
+        await AsyncUserLevelCRUD.grant_xp({1: 500, 2: 10})
+        await AsyncUserLevelCRUD.get_total_xp()
+        await AsyncUserCRUD.get_profiles([1, 2])
+        await AsyncUserCRUD.update_user_names(2, "user2", "User Two")
+        await AsyncUserCRUD.get_balances()
+        await AsyncUserCRUD.get_message_counts(0)
+        await AsyncUserCRUD.delete_message_counts_before(0)
+        await AsyncUserLevelCRUD.get_top_users()
+        await AsyncUsersBoostersCRUD.increment_or_create(1, 1)
+        await AsyncUsersBoostersCRUD.get_booster_count(1, 1)
+        await AsyncUsersBoostersCRUD.get_shop_view(1)
+        await AsyncUsersBoostersCRUD.buy_boosters(1, ShopItemBoosterMSG(1, "msg", 100, 1, 1), None)
+        giveaway_id = await AsyncGiveawayCRUD.create_giveaway("coins", "test", datetime.datetime.now(),
+                                                              [{"name": "coins", "amount": 10}])
+        await AsyncGiveawayCRUD.set_message_id(giveaway_id, 1)
+        await AsyncGiveawayCRUD.add_participant(1, giveaway_id)
+        await AsyncGiveawayCRUD.has_user_participated(1, giveaway_id)
+        await AsyncGiveawayCRUD.get_participant_count(giveaway_id)
+        await AsyncGiveawayCRUD.get_giveaway_end_datetime(giveaway_id)
+        await AsyncGiveawayCRUD.get_giveaway_message_id(giveaway_id)
+        await AsyncGiveawayCRUD.select_giveaway_winners(giveaway_id, weighted=True)
+        await AsyncGiveawayCRUD.end_giveaway(giveaway_id)
+        await AsyncGiveawayCRUD.get_all_giveaways()
+        return giveaway_id
+
+    with Session() as session, session.begin():
+        session.add(Booster(id=1, booster_name="msg", booster_type=1, bonus_amount=1, base_price=100))
+    giveaway_id = asyncio.run(run_crud())
+    asyncio.run(AsyncGiveawayCRUD.delete_giveaway(giveaway_id))
+
+    unindexed = []
+    with test_engine.connect() as connection:
+        for statement, parameters in statements:
+            if any(statement.startswith(query) for query in FULL_SCANS):
+                continue
+            plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            for row in plan:
+                detail = row[-1]
+                if detail.startswith("SCAN") and "USING" not in detail:
+                    unindexed.append((statement, detail))
+    assert statements
+    assert unindexed == []
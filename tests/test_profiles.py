@@ -0,0 +1,40 @@
+import asyncio
+
+from db.profiles import ProfileCache
+from db.repository import repo
+
+
+def test_profiles_are_cached_with_rendered_mentions(store):
+    cache = ProfileCache(max_entries=2)
+
+    async def run():
+        for user_id in (1, 2, 3):
+            await repo.users.create_user(user_id, f"user{user_id}", f"User_{user_id}")
+        first = await cache.get(1)
+        store.users[1].user_nickname = "changed behind the cache"
+        again = await cache.get(1)
+        await cache.get_many([2, 3])
+        return first, again
+
+    first, again = asyncio.run(run())
+    assert again is first
+    assert first.mention_html == '<a href="tg://user?id=1">User_1</a>'
+    assert first.mention_markdown == "[User\\_1](tg://user?id=1)"
+    assert 1 not in cache and len(cache) == 2
+
+
+def test_username_lookup_and_name_refresh(store):
+    cache = ProfileCache()
+
+    async def run():
+        await repo.users.create_user(1, "user1", "User 1")
+        await repo.users.create_user(2, "user2", "User 2")
+        user_id = await cache.get_user_id_by_username("user1")
+        await cache.refresh(1, "renamed", "User One")
+        await cache.refresh(2, "renamed", "User 2")
+        return user_id, await cache.get_user_id_by_username("renamed"), await cache.get(1), await cache.get(2)
+
+    user_id, renamed_id, first, second = asyncio.run(run())
+    assert user_id == renamed_id == 1
+    assert (first.user_name, first.user_nickname) == ("renamed", "User One")
+    assert (second.user_name, second.user_nickname) == ("user2", "User 2")
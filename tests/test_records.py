@@ -0,0 +1,30 @@
+import asyncio
+
+from db.memory import MemoryStore
+from db.records import UserProfile, LeaderboardEntry
+from db.repository import repo
+
+
+async def read_models():
+    for user_id in (1, 2):
+        await repo.users.create_user(user_id, f"user{user_id}", f"User {user_id}")
+    await repo.levels.grant_xp({1: 250, 2: 40})
+    return await repo.users.get_user_by_id(1), await repo.users.get_profiles([1, 2]), \
+        await repo.levels.get_top_users()
+
+
+def test_both_backends_return_the_same_slotted_records(database):
+    try:
+        repo.use_sqlalchemy()
+        sqlalchemy_records = asyncio.run(read_models())
+        repo.use_memory(MemoryStore())
+        memory_records = asyncio.run(read_models())
+    finally:
+        repo.use_sqlalchemy()
+
+    profile, profiles, top = sqlalchemy_records
+    assert (profile, profiles, top) == memory_records
+    assert profile == UserProfile(1, "user1", "User 1")
+    assert [entry.user_id for entry in top] == [1, 2]
+    assert all(type(entry) is LeaderboardEntry for entry in top)
+    assert not any(hasattr(record, '__dict__') for record in (profile, *profiles, *top))
@@ -0,0 +1,59 @@
+import asyncio
+
+from config import COINS_PER_MSG
+from db.repository import repo
+from db.rewards import RewardPipeline
+
+
+def test_full_buffer_is_flushed_in_one_batch(store):
+    pipeline = RewardPipeline(flush_interval_ms=60000, flush_size=3)
+    batches = []
+    apply_message_rewards = repo.users.apply_message_rewards
+
+    async def record(events):
+        batches.append(list(events))
+        return await apply_message_rewards(events)
+
+    repo.users.apply_message_rewards = record
+
+    async def run():
+        for user_id in (1, 2):
+            await repo.users.create_user(user_id, f"user{user_id}", f"User {user_id}")
+        pipeline.start()
+        pipeline.put(1, 100.0)
+        pipeline.put(2, 101.0)
+        await asyncio.sleep(0.01)
+        buffered = pipeline.pending()
+        pipeline.put(1, 102.0)
+        for _ in range(100):
+            if not pipeline.pending():
+                break
+            await asyncio.sleep(0.01)
+        await pipeline.stop()
+        return buffered
+
+    assert asyncio.run(run()) == 2
+    assert batches == [[(1, 100.0), (2, 101.0), (1, 102.0)]]
+    assert store.users[1].user_coins == 2 * 2 * COINS_PER_MSG
+    assert store.users[2].user_coins == 2 * COINS_PER_MSG
+
+
+def test_failed_flush_puts_the_events_back(store):
+    pipeline = RewardPipeline(flush_size=100)
+    apply_message_rewards = repo.users.apply_message_rewards
+
+    async def fail(events):
+        raise RuntimeError("database is locked")
+
+    async def run():
+        await repo.users.create_user(1, "user1", "User 1")
+        pipeline.put(1, 100.0)
+        repo.users.apply_message_rewards = fail
+        failed = await pipeline.flush()
+        pipeline.put(1, 101.0)
+        pending = pipeline.pending()
+        repo.users.apply_message_rewards = apply_message_rewards
+        return failed, pending, await pipeline.flush(), pipeline.pending()
+
+    assert asyncio.run(run()) == (0, 2, 2, 0)
+    assert store.users[1].user_coins == 2 * 2 * COINS_PER_MSG
@@ -0,0 +1,62 @@
+import asyncio
+
+from modules.scheduler import TimerScheduler
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_due_timers_fire_in_deadline_order_after_cancel_and_reschedule():
+    clock, fired = FakeClock(), []
+
+    async def callback(key):
+        fired.append(key)
+
+    async def run():
+        timers = TimerScheduler(callback, clock)
+        timers.schedule('a', 1010)
+        timers.schedule('b', 1005)
+        timers.schedule('c', 1020)
+        timers.schedule('d', 1030)
+        timers.schedule('c', 1001)
+        assert timers.cancel('b')
+        assert not timers.cancel('b')
+        assert (len(timers), timers.next_deadline(), timers.deadline('c')) == (3, 1001, 1001)
+
+        assert await timers.run_due() == []
+        clock.now = 1010
+        assert await timers.run_due() == ['c', 'a']
+        timers.schedule('d', 1015)
+        clock.now = 1040
+        assert await timers.run_due() == ['d']
+        assert await timers.run_due() == []
+        return len(timers), timers.next_deadline()
+
+    assert asyncio.run(run()) == (0, None)
+    assert fired == ['c', 'a', 'd']
+
+
+def test_overdue_timers_fire_as_soon_as_started_and_failures_are_isolated():
+    clock, fired = FakeClock(), []
+
+    async def callback(key):
+        if key == 'broken':
+            raise RuntimeError(key)
+        fired.append(key)
+
+    async def run():
+        timers = TimerScheduler(callback, clock)
+        timers.schedule('broken', 900)
+        timers.schedule('overdue', 990)
+        timers.schedule('later', 5000)
+        timers.start()
+        await timers.stop()
+        return 'later' in timers
+
+    assert asyncio.run(run())
+    assert fired == ['overdue']
@@ -0,0 +1,29 @@
+from modules.shop import ShopItemBoosterMSG, ShopItemBoosterPerMin
+
+
+def loop_price(base_price: int, step: int, owned: int) -> int:
+    price, increment = base_price, 20
+    for _ in range(owned):
+        price += increment
+        increment += step
+    return price
+
+
+def test_closed_form_prices_match_the_progression():
+    for item, step in ((ShopItemBoosterMSG(1, "Keyboard", 100, 1, 1), 10),
+                       (ShopItemBoosterPerMin(2, "Miner", 500, 2, 1), 25)):
+        for owned in range(200):
+            assert item.calculate_price(owned) == loop_price(item.base_price, step, owned)
+        for owned in range(0, 60, 7):
+            for quantity in range(12):
+                assert item.total_price(owned, quantity) == sum(item.calculate_price(owned + i)
+                                                                for i in range(quantity))
+
+
+def test_max_affordable_is_the_largest_quantity_within_the_balance():
+    item = ShopItemBoosterPerMin(2, "Miner", 500, 2, 1)
+    assert item.max_affordable(3, item.calculate_price(3) - 1) == 0
+    for owned in (0, 5, 40):
+        for balance in range(0, 200000, 997):
+            quantity = item.max_affordable(owned, balance)
+            assert item.total_price(owned, quantity) <= balance < item.total_price(owned, quantity + 1)
@@ -0,0 +1,142 @@
+import asyncio
+import datetime
+import sqlite3
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+from telegram.ext import AIORateLimiter, ExtBot, TypeHandler
+
+import main
+from db import ledger
+from db.async_crud import AsyncUserCRUD, AsyncGiveawayCRUD
+from db.members import members
+from db.participation import participation
+from db.unit_of_work import unit_of_work, after_commit
+
+
+def test_failed_update_rolls_back_and_drops_its_callbacks(database):
+    events = []
+
+    async def run():
+        await AsyncUserCRUD.create_user(1, "user1", "User 1")
+        with pytest.raises(RuntimeError):
+            async with unit_of_work():
+                await AsyncUserCRUD.add_coins(1, 100, ledger.GIVEAWAY)
+                after_commit(lambda: events.append("after_commit"))
+                raise RuntimeError("handler failed")
+        return await AsyncUserCRUD.get_user_balance(1)
+
+    assert asyncio.run(run()) == 0
+    assert events == []
+
+
+def test_failing_handler_of_an_application_persists_nothing(database, monkeypatch):
+    events = []
+
+    async def get_me(self, *args, **kwargs):
+        return None
+
+    async def failing_handler(update, context):
+        await AsyncUserCRUD.create_user(1, "user1", "User 1")
+        after_commit(lambda: events.append("after_commit"))
+        raise RuntimeError("handler failed")
+
+    async def next_group(update, context):
+        await AsyncUserCRUD.create_user(2, "user2", "User 2")
+
+    monkeypatch.setattr(ExtBot, "get_me", get_me)
+    application = main.Application.builder().application_class(main.UnitOfWorkApplication).token("123:abc").build()
+    application.add_handler(TypeHandler(object, failing_handler))
+    application.add_handler(TypeHandler(object, next_group), group=1)
+
+    async def run():
+        await application.initialize()
+        try:
+            await application.process_update(object())
+        finally:
+            await application.shutdown()
+        return await AsyncUserCRUD.get_all_user_ids()
+
+    assert list(asyncio.run(run())) == [2]
+    assert events == []
+
+
+def test_bot_api_calls_commit_before_waiting_on_the_rate_limiter(database, monkeypatch):
+    test_engine, _ = database
+    events = []
+
+    def other_writer(event):
+        # another writer gets the lock at once, and sees what the update has committed
+        with sqlite3.connect(test_engine.url.database, timeout=0, isolation_level=None) as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            events.append((event, connection.execute("SELECT user_id FROM users").fetchall()))
+            connection.execute("ROLLBACK")
+
+    async def run_request(self, chat, group, callback, args, kwargs):
+        other_writer("throttle")
+        return await callback(*args, **kwargs)
+
+    async def send(*args, **kwargs):
+        other_writer("request")
+        return True
+
+    monkeypatch.setattr(AIORateLimiter, "_run_request", run_request)
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            async with unit_of_work():
+                await AsyncUserCRUD.create_user(1, "user1", "User 1")
+                after_commit(lambda: events.append("after_commit"))
+                await main.UnitOfWorkRateLimiter().process_request(
+                    callback=send, args=(), kwargs={}, endpoint="sendMessage", data={"chat_id": -100},
+                    rate_limit_args=None)
+                await AsyncUserCRUD.create_user(2, "user2", "User 2")
+                raise RuntimeError("handler failed after replying")
+        return await AsyncUserCRUD.get_all_user_ids()
+
+    assert list(asyncio.run(run())) == [1]
+    assert events == ["after_commit", ("throttle", [(1,)]), ("request", [(1,)])]
+
+
+def test_rolled_back_participation_is_not_remembered(database):
+    participation.clear()
+
+    async def run():
+        end = datetime.datetime.now() + datetime.timedelta(hours=1)
+        gifts = [{"name": "coins", "amount": 10}]
+        giveaway_id = await AsyncGiveawayCRUD.create_giveaway("COINS", "rollback", end, gifts)
+        with pytest.raises(RuntimeError):
+            async with unit_of_work():
+                assert await participation.join(1, giveaway_id)
+                raise RuntimeError("Query is too old")
+        rolled_back = await AsyncGiveawayCRUD.get_participants(giveaway_id), participation.count(giveaway_id)
+        async with unit_of_work():
+            joined = await participation.join(1, giveaway_id)
+        return rolled_back, joined, await AsyncGiveawayCRUD.get_participants(giveaway_id), \
+            participation.count(giveaway_id)
+
+    try:
+        assert asyncio.run(run()) == (([], 0), True, [1], 1)
+    finally:
+        participation.clear()
+
+
+def test_failed_user_insert_is_not_a_member(database):
+    members.load([])
+
+    async def run():
+        await AsyncUserCRUD.create_user(1, "user1", "Same name")
+        with pytest.raises(IntegrityError):
+            async with unit_of_work():
+                await AsyncUserCRUD.create_user(2, "user2", "Same name")
+        failed = members.ids()
+        async with unit_of_work():
+            await AsyncUserCRUD.create_user(2, "user2", "User 2")
+            await AsyncUserCRUD.delete_user(1)
+            pending = members.ids()
+        return failed, pending, members.ids()
+
+    try:
+        assert asyncio.run(run()) == ([1], [1], [2])
+    finally:
+        members.load([])
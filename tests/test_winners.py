@@ -0,0 +1,35 @@
+import random
+from collections import Counter
+
+from modules.winners import Reservoir, WeightedReservoir, draw, pair_gifts
+
+
+def test_reservoir_samples_uniformly_across_chunks():
+    rng, counts = random.Random(1), Counter()
+    for _ in range(20000):
+        reservoir = Reservoir(3, rng)
+        for chunk in ([0, 1], [2, 3, 4, 5], [6], [], [7, 8, 9]):
+            reservoir.extend(chunk)
+        assert len(set(reservoir.items)) == 3
+        counts.update(reservoir.items)
+    assert reservoir.seen == 10
+    assert all(abs(count / 20000 - 0.3) < 0.02 for count in counts.values())
+
+
+def test_weighted_reservoir_draws_proportionally_to_weight():
+    rng, counts = random.Random(2), Counter()
+    for _ in range(20000):
+        reservoir = WeightedReservoir(1, rng)
+        reservoir.extend([('a', 1), ('b', 2), ('c', 7), ('d', 0)])
+        counts.update(reservoir.items)
+    assert counts['d'] == 0
+    assert [round(counts[item] / 20000, 1) for item in 'abc'] == [0.1, 0.2, 0.7]
+
+
+def test_every_gift_goes_to_a_distinct_winner():
+    gifts = [f"gift {i}" for i in range(5)]
+    for participants in (range(3), range(5), range(1000)):
+        pairs = pair_gifts(draw(participants, len(gifts)), gifts)
+        assert len(pairs) == min(len(gifts), len(participants))
+        assert len({winner for winner, _ in pairs}) == len({gift for _, gift in pairs}) == len(pairs)
+    assert draw(range(10), 0) == [] and draw([], 3) == []